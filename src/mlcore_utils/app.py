@@ -2,7 +2,7 @@ import logging
 import os
 import pytest
 
-from mlcore_utils.model.common import Http_Method, MLCore_Secret
+from mlcore_utils.model.common import Caching_Secret_Getter, Http_Method, MLCore_Secret
 from mlcore_utils.model.blacklodge import (
     Blacklodge_BusinessUnit,
     Blacklodge_Model,
@@ -294,15 +294,19 @@ def _init_reqd_objects(token):
 
     creds: AWS_Credentials = AWS_Credentials.inject_aws_credentials(logger)
     ssm_util = AWS_System_Manager(creds, logger)
+    # one SSM call for everything below, the getters then read from the cache
+    ssm_util.get_parameters([GH_SERVICE_ACCOUNT_PARAM_NAME, USER_POOL_ID_PARAM_NAME])
     gh_service_account = get_gh_service_account(ssm_util, GH_SERVICE_ACCOUNT_PARAM_NAME)
     gh_secrets_getter = AWS_SecretsManager_Secret_Getter(
         creds, AWS_SECMGR_GH_SECRET_ID, AWS_SECMGR_GH_SECRET_KEY, logger
     )
-    stratos_secret_getter = AWS_SecretsManager_Secret_Getter(
-        credentials=creds,
-        secret_name=STRATOS_SECRET_NAME_PARAM_NAME,
-        secret_key=STRATOS_SECRET_KEY_PARAM_NAME,
-        logger=logger,
+    stratos_secret_getter = Caching_Secret_Getter(
+        AWS_SecretsManager_Secret_Getter(
+            credentials=creds,
+            secret_name=STRATOS_SECRET_NAME_PARAM_NAME,
+            secret_key=STRATOS_SECRET_KEY_PARAM_NAME,
+            logger=logger,
+        )
     )
     github_auth = GitHub_Auth.get_from_username_and_secret_getter(
         gh_service_account, gh_secrets_getter
@@ -334,7 +338,7 @@ def _init_reqd_objects(token):
     )
     blacklodge_image_for_stratos.initialize_latent_values()
 
-    requests_wrapper = Requests_Wrapper()
+    requests_wrapper = Requests_Wrapper.get_shared_instance()
     stratos_api_caller = Stratos_Api_Caller(
         secret_getter=stratos_secret_getter, requests_wrapper=requests_wrapper
     )
@@ -400,10 +404,7 @@ def deploy_blacklodge_pipeline(
         blacklodge_image_for_stratos=blacklodge_image_for_stratos,
         helmchart_version_getter=helm_chart_version_getter,
     )
-    pipeline_deploy_request_data = (
-        pipeline_deploy_data_builder.get_stratos_containerhelm_deployrequest_v1()
-    )
-    stratos_util.deploy_pipeline(pipeline_deploy_data_builder)
+    deploy_data_builders = [pipeline_deploy_data_builder]
     #pipeline_deploy_request_data.pretty_print()
 
     for alias in blacklodge_image_for_stratos.blacklodge_model.aliases:
@@ -412,21 +413,16 @@ def deploy_blacklodge_pipeline(
             pipeline_alias=alias,
             helmchart_version_getter=helm_chart_version_getter,
         )
-        alias_deploy_request_data = (
-            alias_deploy_data_builder.get_stratos_containerhelm_deployrequest_v1()
-        )
         #alias_deploy_request_data.pretty_print()
-        stratos_util.deploy_alias(alias_deploy_data_builder)
+        deploy_data_builders.append(alias_deploy_data_builder)
 
     namespace_deploy_data_builder = Blacklodge_Namespace_Deployer_Data(
         blacklodge_image_for_stratos=blacklodge_image_for_stratos,
         helmchart_version_getter=helm_chart_version_getter,
     )
-    namespace_deploy_request_data = (
-        namespace_deploy_data_builder.get_stratos_containerhelm_deployrequest_v1()
-    )
     #namespace_deploy_request_data.pretty_print()
-    stratos_util.deploy_namespace(namespace_deploy_data_builder)
+    deploy_data_builders.append(namespace_deploy_data_builder)
+    return stratos_util.deploy_applications(deploy_data_builders)
 
 
 def register_blacklodge_pipeline(
@@ -436,18 +432,33 @@ def register_blacklodge_pipeline(
 ):
     s3_util = AWS_S3_Util(aws_credentials=creds, logger=logger)
 
-    blacklodge_image_for_stratos.blacklodge_model.git_repo.clone_repo_and_checkout()
-    blacklodge_image_for_stratos.blacklodge_model.git_repo.get_dvc_files()
-    tarfile_result = (
-        blacklodge_image_for_stratos.blacklodge_model.git_repo.produce_tar_ball()
-    )
+    git_repo = blacklodge_image_for_stratos.blacklodge_model.git_repo
+    file_name = "pipeline.tar.gz"
+    bucket = f"{blacklodge_image_for_stratos.aws_accounts_for_blacklodge.aws_account_num}-registry"
+    s3_key = f"pipeline_registry/{blacklodge_image_for_stratos.blacklodge_model.name}/{blacklodge_image_for_stratos.blacklodge_model.version}/{file_name}"
+    dvc_result = git_repo.has_dvc_config()
+    if is_ok(dvc_result) and not dvc_result.ok_value:
+        # without dvc data there is nothing to clone for, the GitHub archive
+        # is re-packed straight into the upload. An unchanged commit is not
+        # uploaded again
+        archive_tarball = git_repo.get_archive_tar_ball()
+        digest_result = archive_tarball.get_digest()
+        tarfile_result = s3_util.upload_tarball_of_folder(
+            tarball=archive_tarball,
+            bucket=bucket,
+            key=s3_key,
+            content_digest=digest_result.ok_value if is_ok(digest_result) else None,
+        )
+    else:
+        git_repo.clone_repo_and_checkout()
+        git_repo.get_dvc_files()
+        # the tarball is streamed into the upload without a staging file. Its
+        # compressed chunks are cached under /tmp, so only files that changed
+        # since the last registration are compressed
+        tarfile_result = s3_util.upload_incremental_tarball(
+            tarball=git_repo.get_incremental_tar_ball(), bucket=bucket, key=s3_key
+        )
     if is_ok(tarfile_result):
-        file_path = tarfile_result.ok_value.name
-        file_name = str(file_path).split(os.sep)[-1]
-        bucket = f"{blacklodge_image_for_stratos.aws_accounts_for_blacklodge.aws_account_num}-registry"
-        s3_key = f"pipeline_registry/{blacklodge_image_for_stratos.blacklodge_model.name}/{blacklodge_image_for_stratos.blacklodge_model.version}/{file_name}"
-        s3_util.upload_file(bucket=bucket, key=s3_key, filename=str(file_path))
-
         container_build_data_builder = (
             Stratos_ContainerBuild_V1_Data_Builder_From_Blacklodge_Image(
                 blacklodge_image_for_stratos
@@ -458,7 +469,7 @@ def register_blacklodge_pipeline(
         stratos_util = Stratos_Util(stratos_api_caller)
         stratos_util.build_container(build_data)
     elif is_err(tarfile_result):
-        print("Could not get tarfile " + tarfile_result.err_value)
+        print("Could not upload tarfile " + tarfile_result.err_value)
     else:
         print("Unknonw")
 
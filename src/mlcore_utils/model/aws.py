@@ -1,14 +1,13 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from attrs import define, field
-import math
 import os
 import threading
-import s3transfer as s3t
 from pgraws import pgraws
 from datetime import datetime
 from dateutil import tz
-from typing import Any, Optional, Dict
+from typing import TYPE_CHECKING, Any, Callable, Optional, Dict, List, Tuple, Union
+from mlcore_utils.model.cache import TTL_Cache
 from mlcore_utils.model.common import (
     Runtime_Environment,
     Runtime_Environment_Detector,
@@ -19,8 +18,33 @@ from result import Result, Err, Ok, is_err, is_ok
 import json
 import boto3
 from boto3.session import Session
+from botocore.config import Config
+from botocore.credentials import (
+    CredentialProvider,
+    CredentialResolver,
+    RefreshableCredentials,
+)
+from botocore.session import get_session as get_botocore_session
 
-from mlcore_utils.model.file import Generator_To_FileLike
+from mlcore_utils.model.file import Tarball
+from mlcore_utils.model.incremental_tarball import (
+    TARBALL_DIGEST_METADATA_KEY,
+    Incremental_Tarball,
+)
+from mlcore_utils.model.progress import Progress_Reporter, Progress_Snapshot
+from mlcore_utils.model.s3_upload import (
+    MiB,
+    S3_MIN_PART_SIZE,
+    S3_UPLOAD_CLIENT_CONFIG,
+    S3_UPLOAD_MAX_CONCURRENCY,
+    S3_Generator_Uploader,
+    S3_Multipart_Uploader,
+    S3_Streaming_Multipart_Writer,
+    S3_Upload_Plan,
+)
+
+if TYPE_CHECKING:
+    from mlcore_utils.model.gh import GitHub_Archive_Tarball
 
 AWS_CONSTANTS = {
     "prod": {
@@ -38,11 +62,23 @@ AWS_CONSTANTS = {
 }
 
 
+def _get_config_fingerprint(config: Optional[Config]) -> Optional[str]:
+    # by value, an id() grows the cache per new Config and can be reused after gc
+    if config is None:
+        return None
+    return json.dumps(vars(config), sort_keys=True, default=repr)
+
+
 class AWS_Credentials(ABC):
     def __init__(self, logger, region: str = "us-east-1") -> None:
         self.region = region
         self._session: Optional[Session] = None
         self.logger = logger
+        # (service, region, config fingerprint) -> (session, client)
+        self._clients: Dict[
+            Tuple[str, Optional[str], Optional[str]], Tuple[Session, Any]
+        ] = {}
+        self._clients_lock = threading.Lock()
 
     @abstractmethod
     def _get_sess(self) -> Session:
@@ -58,6 +94,35 @@ class AWS_Credentials(ABC):
             except Exception as e:
                 return Err(str(e))
 
+    def get_client(
+        self,
+        service: str,
+        region: Optional[str] = None,
+        config: Optional[Config] = None,
+    ) -> Result[Any, str]:
+        """
+        boto3 clients are thread safe but slow to build, so one is kept per
+        service, region and config. Configs with the same options share a
+        client, so building a new Config per call does not grow the cache. It
+        is rebuilt when the session changes.
+        """
+        session_res = self.get_aws_session()
+        if is_err(session_res):
+            return session_res
+        session = session_res.ok_value
+        key = (service, region, _get_config_fingerprint(config))
+        # sessions are not thread safe, so clients are also created under the lock
+        with self._clients_lock:
+            cached = self._clients.get(key)
+            if cached and cached[0] is session:
+                return Ok(cached[1])
+            try:
+                client = session.client(service, region_name=region, config=config)
+            except Exception as e:
+                return Err(f"Error creating boto3 client for {service}: {str(e)}")
+            self._clients[key] = (session, client)
+            return Ok(client)
+
     @classmethod
     def inject_aws_credentials(cls, logger, region: str = "us-east-1"):
         # cloud 9
@@ -124,7 +189,48 @@ class AWS_STS_Credentials(AWS_Credentials):
         )
 
 
+class PGR_STS_Credential_Provider(CredentialProvider):
+    """
+    botocore credential provider handing out the RefreshableCredentials of a
+    PGR_STS_Credentials.
+    """
+
+    METHOD = "pgr-sts"
+    # providers outside botocore must be prefixed with custom
+    CANONICAL_NAME = "custom-pgr-sts"
+
+    def __init__(self, credentials: "PGR_STS_Credentials") -> None:
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self) -> RefreshableCredentials:
+        credentials = self.credentials
+        return RefreshableCredentials.create_from_metadata(
+            metadata=credentials._get_credentials_metadata(),
+            refresh_using=credentials._get_credentials_metadata,
+            method=self.METHOD,
+            advisory_timeout=credentials._get_botocore_advisory_seconds(),
+            mandatory_timeout=min(60, credentials._get_botocore_advisory_seconds()),
+        )
+
+
 class PGR_STS_Credentials(AWS_Credentials):
+    """
+    Credentials from the PGR SAML/STS exchange.
+
+    The session is built once on top of botocore RefreshableCredentials, so
+    clients made from it keep working across renewals. A background timer
+    fetches new credentials refresh_ahead_seconds before they expire; by the
+    time botocore asks for a refresh the new ones are already there and no
+    request waits on STS. Concurrent refreshes share one exchange.
+
+    For sessions shorter than twice refresh_ahead_seconds the lead is half the
+    duration, and the timer never fires sooner than MIN_REFRESH_DELAY_SECONDS,
+    so short lived credentials do not call STS in a loop.
+    """
+
+    MIN_REFRESH_DELAY_SECONDS = 10
+
     def __init__(
         self,
         aws_account,
@@ -134,6 +240,7 @@ class PGR_STS_Credentials(AWS_Credentials):
         duration=900,
         logger=None,
         region: str = "us-east-1",
+        refresh_ahead_seconds: int = 300,
     ) -> None:
         self.aws_account = aws_account
         self.role = role
@@ -148,20 +255,24 @@ class PGR_STS_Credentials(AWS_Credentials):
             "principal": f"arn:aws:iam::{self.aws_account}:saml-provider/PGRSTS",
             "role": f"arn:aws:iam::{self.aws_account}:role/{self.role}",
         }
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self._refresh_lock = threading.Lock()
+        self._session_lock = threading.Lock()
+        self._refresh_timer: Optional[threading.Timer] = None
+        self._stopped = False
         super().__init__(logger, region)
 
-    def should_get_credentials(self):
-        condition_to_get_creds_1 = not self._session
-        condition_to_get_creds_2 = not self._credentials
-        condition_to_get_creds_3 = (
-            self._credentials
-            and (self._credentials["Expiration"] - datetime.now(tz.UTC)).seconds < 120
-        )
-        return (
-            condition_to_get_creds_1
-            or condition_to_get_creds_2
-            or condition_to_get_creds_3
+    def _get_seconds_till_expiry(self) -> float:
+        return (self._credentials["Expiration"] - datetime.now(tz.UTC)).total_seconds()
+
+    def should_get_credentials(self, ahead_seconds: Optional[float] = None):
+        # total_seconds, not seconds: .seconds of an already expired (negative) delta is large
+        ahead_seconds = (
+            ahead_seconds
+            if ahead_seconds is not None
+            else self._get_refresh_ahead_seconds()
         )
+        return not self._credentials or self._get_seconds_till_expiry() < ahead_seconds
 
     def get_creds_from_pgraws(self) -> Dict[str, Any]:
         saml_assertion = pgraws.get_aws_saml_assertion(
@@ -171,65 +282,196 @@ class PGR_STS_Credentials(AWS_Credentials):
         )
         return pgraws.get_credentials(self._role, saml_assertion)
 
-    def _assign_creds(self):
-        self._credentials = self.get_creds_from_pgraws()
+    def _assign_creds(self, ahead_seconds: Optional[float] = None):
+        with self._refresh_lock:
+            # whoever waited on the lock gets the credentials the holder just fetched
+            if self.should_get_credentials(ahead_seconds):
+                self._credentials = self.get_creds_from_pgraws()
 
     def get_credentials(self):
         if self.should_get_credentials():
             self._assign_creds()
         return self._credentials
 
+    def _get_credentials_metadata(self) -> Dict[str, Any]:
+        # called by botocore; the timer has normally renewed the credentials already
+        self._assign_creds(ahead_seconds=self._get_botocore_advisory_seconds())
+        return {
+            "access_key": self._credentials["AccessKeyId"],
+            "secret_key": self._credentials["SecretAccessKey"],
+            "token": self._credentials["SessionToken"],
+            "expiry_time": self._credentials["Expiration"].isoformat(),
+        }
+
+    def _get_refresh_ahead_seconds(self) -> float:
+        return min(self.refresh_ahead_seconds, self._duration / 2)
+
+    def _get_botocore_advisory_seconds(self) -> float:
+        return self._get_refresh_ahead_seconds() / 2
+
+    def _schedule_refresh(self, delay: Optional[float] = None):
+        if self._stopped:
+            return
+        if delay is None:
+            delay = max(
+                self.MIN_REFRESH_DELAY_SECONDS,
+                self._get_seconds_till_expiry() - self._get_refresh_ahead_seconds(),
+            )
+        self._refresh_timer = threading.Timer(delay, self._refresh_in_background)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_in_background(self):
+        try:
+            # a little past the window, so a timer firing early still refreshes
+            self._assign_creds(ahead_seconds=self._get_refresh_ahead_seconds() + 5)
+            self._schedule_refresh()
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(
+                    f"Refreshing PGR STS credentials failed, retrying in 30 seconds: {str(e)}"
+                )
+            self._schedule_refresh(30)
+
+    def stop_refresh(self):
+        self._stopped = True
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+
     def _get_sess(self, region="us-east-1") -> Session:
-        sts_credentials_session_provider = AWS_STS_Credentials(
-            aws_access_key_id=self._credentials["AccessKeyId"],
-            aws_secret_access_key=self._credentials["SecretAccessKey"],
-            aws_session_token=self._credentials["SessionToken"],
-            logger=self.logger,
+        botocore_session = get_botocore_session()
+        # the only provider, so nothing from the environment or ~/.aws is picked up
+        botocore_session.register_component(
+            "credential_provider",
+            CredentialResolver([PGR_STS_Credential_Provider(self)]),
+        )
+        session = boto3.Session(
+            botocore_session=botocore_session, region_name=self.region
         )
-        return sts_credentials_session_provider._get_sess()
+        # loads the credentials now, so a failing exchange fails get_aws_session
+        if session.get_credentials() is None:
+            raise Exception("PGR STS returned no credentials")
+        return session
 
     def get_aws_session(self) -> Result[Session, str]:
         try:
-            if self.should_get_credentials():
-                self._assign_creds()
-                self._session = self._get_sess()
-                return Ok(self._session)
-            else:
-                return super().get_aws_session()
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._get_sess()
+                    self._schedule_refresh()
+            return Ok(self._session)
         except Exception as e:
             return Err(str(e))
 
 
 class AWS_Utils(object):
-    def __init__(self, aws_credentials: AWS_Credentials, service: str, logger) -> None:
+    def __init__(
+        self,
+        aws_credentials: AWS_Credentials,
+        service: str,
+        logger,
+        region: Optional[str] = None,
+        config: Optional[Config] = None,
+    ) -> None:
         self.aws_credentials = aws_credentials
         self.service = service
         self.logger = logger
+        self.region = region
+        self.config = config
 
     def get_client(self):
-        session_res = self.aws_credentials.get_aws_session()
-        if is_ok(session_res):
-            return session_res.ok_value.client(self.service)
-        elif is_err(session_res):
-            raise Exception(session_res.err_value)
+        client_res = self.aws_credentials.get_client(
+            self.service, self.region, self.config
+        )
+        if is_ok(client_res):
+            return client_res.ok_value
+        elif is_err(client_res):
+            raise Exception(client_res.err_value)
         else:
             raise Exception("Creating Boto3 Client failed with unknown error")
 
 
 class AWS_System_Manager(AWS_Utils):
-    def __init__(self, aws_credentials: AWS_Credentials, logger) -> None:
+    # GetParameters accepts at most 10 names per call
+    MAX_NAMES_PER_CALL = 10
+
+    def __init__(
+        self,
+        aws_credentials: AWS_Credentials,
+        logger,
+        cache: Optional[TTL_Cache] = None,
+    ) -> None:
         super().__init__(aws_credentials, "ssm", logger)
+        self.cache = cache if cache is not None else TTL_Cache(ttl_seconds=300)
+
+    def _get_cache_key(self, parameter_name: str, with_decryption: bool) -> str:
+        return f"{parameter_name}|{with_decryption}"
+
+    def get_parameters(
+        self, parameter_names: List[str], with_decryption: bool = False
+    ) -> Dict[str, Result[Any, str]]:
+        """
+        Returns a Result per name. Cached values are served from the cache and
+        the rest is fetched in as few GetParameters calls as possible.
+        """
+        results: Dict[str, Result[Any, str]] = {}
+        missing: List[str] = []
+        not_cached = object()
+        for name in dict.fromkeys(parameter_names):
+            # a single get, an entry can expire between a contains and a get
+            value = self.cache.get(
+                self._get_cache_key(name, with_decryption), not_cached
+            )
+            if value is not_cached:
+                missing.append(name)
+            else:
+                results[name] = Ok(value)
 
-    def get_parameter_value(self, parameter_name) -> Result[Any, str]:
+        for i in range(0, len(missing), self.MAX_NAMES_PER_CALL):
+            chunk = missing[i : i + self.MAX_NAMES_PER_CALL]
+            try:
+                response = self.get_client().get_parameters(
+                    Names=chunk, WithDecryption=with_decryption
+                )
+            except Exception as e:
+                for name in chunk:
+                    results[name] = Err(
+                        f"Error while getting value for parameter {name} : {str(e)}"
+                    )
+                continue
+            values = {p["Name"]: p["Value"] for p in response["Parameters"]}
+            self.cache.set_many(
+                {self._get_cache_key(n, with_decryption): v for n, v in values.items()}
+            )
+            for name in chunk:
+                if name in values:
+                    results[name] = Ok(values[name])
+                else:
+                    results[name] = Err(
+                        f"Error while getting value for parameter {name} : parameter not found"
+                    )
+        return results
+
+    def get_parameters_by_path(
+        self, path: str, recursive: bool = True, with_decryption: bool = False
+    ) -> Result[Dict[str, Any], str]:
         try:
-            param_val = self.get_client().get_parameter(Name=parameter_name)[
-                "Parameter"
-            ]["Value"]
-            return Ok(param_val)
+            paginator = self.get_client().get_paginator("get_parameters_by_path")
+            values: Dict[str, Any] = {}
+            for page in paginator.paginate(
+                Path=path, Recursive=recursive, WithDecryption=with_decryption
+            ):
+                for parameter in page["Parameters"]:
+                    values[parameter["Name"]] = parameter["Value"]
         except Exception as e:
-            return Err(
-                f"Error while getting value for parameter {parameter_name} : {str(e)}"
-            )
+            return Err(f"Error while getting parameters under path {path} : {str(e)}")
+        self.cache.set_many(
+            {self._get_cache_key(n, with_decryption): v for n, v in values.items()}
+        )
+        return Ok(values)
+
+    def get_parameter_value(self, parameter_name) -> Result[Any, str]:
+        return self.get_parameters([parameter_name])[parameter_name]
 
 
 class AWS_SecretsManager_Secret_Getter(Secret_Getter):
@@ -260,8 +502,25 @@ class AWS_Cognito_Util(AWS_Utils):
 
 
 class AWS_S3_Util(AWS_Utils):
-    def __init__(self, aws_credentials: AWS_Credentials, logger) -> None:
+    def __init__(
+        self,
+        aws_credentials: AWS_Credentials,
+        logger,
+        progress_metrics_sink: Optional[Callable[[Progress_Snapshot], None]] = None,
+    ) -> None:
         super().__init__(aws_credentials, "s3", logger)
+        # receives the throughput / eta reports of every upload, e.g. to push them as metrics
+        self.progress_metrics_sink = progress_metrics_sink
+
+    def get_progress_reporter(
+        self, tag: str, total_bytes: Optional[int] = None
+    ) -> Progress_Reporter:
+        return Progress_Reporter(
+            tag=tag,
+            total_bytes=total_bytes,
+            logger=self.logger,
+            metrics_sink=self.progress_metrics_sink,
+        )
 
     def _object_key_validator(self, bucket: str, key: str):
         if bucket.startswith("s3:"):
@@ -282,8 +541,48 @@ class AWS_S3_Util(AWS_Utils):
             )
 
     def upload_generator_to_s3(self, *, generator, bucket: str, key: str):
-        stream = Generator_To_FileLike(generator)
-        self.upload_stream(stream=stream, bucket=bucket, key=key)
+        result = self.upload_generator_in_parts(
+            generator=generator, bucket=bucket, key=key
+        )
+        if is_err(result):
+            raise Exception(result.err_value)
+
+    def upload_generator_in_parts(
+        self,
+        *,
+        generator,
+        bucket: str,
+        key: str,
+        part_size: int = 16 * MiB,
+        max_concurrency: int = 8,
+    ) -> Result[str, str]:
+        """
+        Uploads the chunks of generator as a multipart upload while it is
+        still producing them, at most max_concurrency parts at a time. The
+        generator is held back when all part buffers are in use. Returns the
+        ETag of the uploaded object.
+        """
+        target_bucket, target_key = self._object_key_validator(bucket, key)
+        client_res = self.aws_credentials.get_client(
+            self.service, self.region, S3_UPLOAD_CLIENT_CONFIG
+        )
+        if is_err(client_res):
+            return client_res
+        self.logger.debug(
+            "Generator Upload To: " + "s3://" + target_bucket + "/" + target_key
+        )
+        progress = self.get_progress_reporter(
+            f"s3://{target_bucket}/{target_key} Upload"
+        )
+        result = S3_Generator_Uploader(
+            client_res.ok_value,
+            part_size=part_size,
+            max_concurrency=max_concurrency,
+            progress_callback=progress,
+        ).upload(generator, target_bucket, target_key)
+        if is_ok(result):
+            progress.finish()
+        return result
 
     def upload_stream(
         self, *, stream, bucket: str, key: str
@@ -307,10 +606,25 @@ class AWS_S3_Util(AWS_Utils):
         filename: str,
         bucket: str,
         key: str,
-        chunk_size: int = 400000000,
-        max_concurrency: int = 10,
+        chunk_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        target_bytes_per_second: float = 400 * MiB,
+        resume: bool = False,
     ):  # force parameter names to be specified in the call.
+        """
+        Part size and concurrency come from the file size and
+        target_bytes_per_second unless chunk_size / max_concurrency are given.
+        A failed upload is aborted. With resume=True, for callers that retry,
+        it is left open and picked up by the next call with resume=True.
+        """
         target_bucket, target_key = self._object_key_validator(bucket, key)
+        plan = S3_Upload_Plan.create(
+            os.path.getsize(filename), target_bytes_per_second=target_bytes_per_second
+        )
+        if chunk_size:
+            plan.part_size = max(chunk_size, S3_MIN_PART_SIZE)
+        if max_concurrency:
+            plan.concurrency = max(1, min(max_concurrency, S3_UPLOAD_MAX_CONCURRENCY))
         self.logger.debug(
             "Upload Start  : "
             + filename
@@ -319,55 +633,197 @@ class AWS_S3_Util(AWS_Utils):
             + target_bucket
             + "/"
             + target_key
+            + f" ; {plan.number_of_parts} parts of {plan.part_size} bytes, {plan.concurrency} at a time"
         )
-        tc = s3t.TransferConfig(
-            multipart_threshold=chunk_size,
-            max_concurrency=max_concurrency,
-            num_download_attempts=10,
+        client_res = self.aws_credentials.get_client(
+            self.service, self.region, S3_UPLOAD_CLIENT_CONFIG
+        )
+        if is_err(client_res):
+            raise Exception(client_res.err_value)
+        progress = self.get_progress_reporter(filename + " Upload", plan.file_size)
+        upload_result = S3_Multipart_Uploader(client_res.ok_value).upload_file(
+            filename,
+            target_bucket,
+            target_key,
+            plan=plan,
+            resume=resume,
+            progress_callback=progress,
+        )
+        if is_err(upload_result):
+            self.logger.error(
+                "Upload Failed : " + filename + " ; Error: " + upload_result.err_value
+            )
+            raise Exception(upload_result.err_value)
+        progress.finish()
+        self.logger.debug(
+            "Upload Finish : "
+            + filename
+            + " ; To: "
+            + "s3://"
+            + target_bucket
+            + "/"
+            + target_key
+        )
+
+    def upload_tarball_of_folder(
+        self,
+        *,
+        tarball: Union[Tarball, GitHub_Archive_Tarball],
+        bucket: str,
+        key: str,
+        part_size: int = 16 * MiB,
+        max_in_flight_parts: int = 8,
+        content_digest: Optional[str] = None,
+    ) -> Result[str, str]:
+        """
+        tar.gz's the folder (or re-packs the GitHub archive) straight into a
+        multipart upload, no staging file.
+        Compression and upload overlap and at most
+        (max_in_flight_parts + 1) * part_size bytes are held in memory.
+        A content_digest is stored in the object metadata, and nothing is
+        uploaded when the object already there has the same one.
+        Returns the ETag of the uploaded object.
+        """
+        target_bucket, target_key = self._object_key_validator(bucket, key)
+        client_res = self.aws_credentials.get_client(
+            self.service, self.region, S3_UPLOAD_CLIENT_CONFIG
+        )
+        if is_err(client_res):
+            return client_res
+        extra_args = None
+        if content_digest:
+            head = self._get_object_head(client_res.ok_value, target_bucket, target_key)
+            if (
+                head.get("Metadata", {}).get(TARBALL_DIGEST_METADATA_KEY)
+                == content_digest
+            ):
+                self.logger.info(
+                    f"s3://{target_bucket}/{target_key} is up to date ({content_digest}), skipping upload"
+                )
+                return Ok(head.get("ETag"))
+            extra_args = {"Metadata": {TARBALL_DIGEST_METADATA_KEY: content_digest}}
+        self.logger.debug(
+            "Streaming Upload Start : "
+            + tarball.source_directory
+            + " ; To: s3://"
+            + target_bucket
+            + "/"
+            + target_key
+        )
+        progress = self.get_progress_reporter(
+            f"s3://{target_bucket}/{target_key} Upload"
+        )
+        writer = S3_Streaming_Multipart_Writer(
+            client_res.ok_value,
+            target_bucket,
+            target_key,
+            part_size=part_size,
+            max_in_flight_parts=max_in_flight_parts,
+            extra_args=extra_args,
+            progress_callback=progress,
         )
-        t = s3t.S3Transfer(self.get_client(), config=tc)
         try:
-            t.upload_file(
-                filename,
-                target_bucket,
-                target_key,
-                callback=ProgressPercentage(
-                    filename, self.logger, filename + " Upload"
-                ),
+            tar_result = tarball.write_to(writer)
+            if is_err(tar_result):
+                writer.abort()
+                return tar_result
+            writer.finish()
+            progress.finish()
+        except Exception as e:
+            if not writer.closed:
+                writer.abort()
+            return Err(
+                f"Streaming upload to s3://{target_bucket}/{target_key} failed: {str(e)}"
             )
-            self.logger.debug(
-                "Upload Finish : "
-                + filename
-                + " ; To: "
-                + "s3://"
-                + target_bucket
-                + "/"
-                + target_key
+        self.logger.debug(
+            f"Streaming Upload Finish : {writer.bytes_written} bytes to s3://{target_bucket}/{target_key}"
+        )
+        return Ok(writer.etag)
+
+    def _get_object_head(self, client, bucket: str, key: str) -> Dict[str, Any]:
+        try:
+            return client.head_object(Bucket=bucket, Key=key)
+        except Exception:
+            return {}
+
+    def _get_object_metadata(self, client, bucket: str, key: str) -> Dict[str, str]:
+        return self._get_object_head(client, bucket, key).get("Metadata", {})
+
+    def upload_incremental_tarball(
+        self,
+        *,
+        tarball: Incremental_Tarball,
+        bucket: str,
+        key: str,
+        part_size: int = 16 * MiB,
+        max_in_flight_parts: int = 8,
+    ) -> Result[bool, str]:
+        """
+        Streams the tarball into s3 with its content digest in the object
+        metadata. Nothing is built or uploaded when the object already there
+        has the same digest. Returns whether an upload happened.
+        """
+        target_bucket, target_key = self._object_key_validator(bucket, key)
+        client_res = self.aws_credentials.get_client(
+            self.service, self.region, S3_UPLOAD_CLIENT_CONFIG
+        )
+        if is_err(client_res):
+            return client_res
+        scan_res = tarball.scan()
+        if is_err(scan_res):
+            return scan_res
+        scan = scan_res.ok_value
+        metadata = self._get_object_metadata(
+            client_res.ok_value, target_bucket, target_key
+        )
+        if metadata.get(TARBALL_DIGEST_METADATA_KEY) == scan.digest:
+            self.logger.info(
+                f"s3://{target_bucket}/{target_key} is up to date ({scan.digest}), skipping upload"
             )
+            return Ok(False)
+        progress = self.get_progress_reporter(
+            f"s3://{target_bucket}/{target_key} Upload"
+        )
+        writer = S3_Streaming_Multipart_Writer(
+            client_res.ok_value,
+            target_bucket,
+            target_key,
+            part_size=part_size,
+            max_in_flight_parts=max_in_flight_parts,
+            extra_args={"Metadata": {TARBALL_DIGEST_METADATA_KEY: scan.digest}},
+            progress_callback=progress,
+        )
+        try:
+            build_res = tarball.write_to(writer, scan)
+            if is_err(build_res):
+                writer.abort()
+                return build_res
+            writer.finish()
+            progress.finish()
         except Exception as e:
-            self.logger.error("Upload Failed : " + filename + " ; Error: " + str(e))
-            raise e
+            if not writer.closed:
+                writer.abort()
+            return Err(
+                f"Streaming upload to s3://{target_bucket}/{target_key} failed: {str(e)}"
+            )
+        summary = build_res.ok_value
+        self.logger.debug(
+            f"Incremental Upload Finish : {summary.new_chunks} of {summary.number_of_entries} entries compressed, {summary.bytes_written} bytes to s3://{target_bucket}/{target_key}"
+        )
+        return Ok(True)
 
 
-class ProgressPercentage(object):
+class ProgressPercentage(Progress_Reporter):
+    """
+    Progress_Reporter with the old (filename, logger, tag, size) signature.
+    """
+
     def __init__(self, filename, logger, tag=None, size=None):
-        self._size = size if size != None else float(os.path.getsize(filename))
-        self._tag = "s3-operation for " + filename if tag == None else tag
-        self._seen_so_far = 0
-        self._lock = threading.Lock()
-        self._previous_seen = 0
-        self._current_seen = 0
-        self._logger = logger
-
-    def __call__(self, bytes_amount):
-        with self._lock:
-            self._seen_so_far += bytes_amount
-            percentage = (self._seen_so_far / self._size) * 100
-            if math.floor(percentage) % 5 == 0:
-                self._current_seen = math.floor(percentage)
-                if self._current_seen != self._previous_seen:
-                    self._previous_seen = self._current_seen
-                    self._logger.debug(self._tag + " Progress: " + str(percentage))
+        super().__init__(
+            tag="s3-operation for " + filename if tag == None else tag,
+            total_bytes=int(size if size != None else os.path.getsize(filename)),
+            logger=logger,
+        )
 
 
 @define
@@ -0,0 +1,142 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from attrs import define, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+@define
+class TTL_Cache(object):
+    """
+    Thread safe key/value cache whose entries expire ttl_seconds after they
+    were set. When store_path is given the entries are also written to (and
+    read back from) a json file, so they survive across processes. Keys must
+    be strings and values json serializable in that case.
+
+    Processes can share a store_path: every change is merged into the file
+    under an flock rather than overwriting it, and a miss re-reads the file
+    when another process changed it.
+    """
+
+    ttl_seconds: float = field(default=300)
+    store_path: Optional[str] = field(default=None)
+    # wall clock, not monotonic, so expiry times in the store mean the same thing to every process
+    clock: Callable[[], float] = field(default=time.time)
+    _entries: Dict[str, Tuple[Any, float]] = field(init=False, factory=dict)
+    _lock: threading.Lock = field(init=False, factory=threading.Lock)
+    _store_mtime_ns: Optional[int] = field(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        if self.store_path:
+            self._refresh_from_store()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.store_path:
+                self._refresh_from_store()
+                entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return default
+            return value
+
+    def contains(self, key: str) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        self.set_many({key: value}, ttl_seconds)
+
+    def set_many(self, values: Dict[str, Any], ttl_seconds: Optional[float] = None):
+        expires_at = self.clock() + (
+            ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        )
+        updates = {key: (value, expires_at) for key, value in values.items()}
+        with self._lock:
+            self._entries.update(updates)
+            self._update_store(updates=updates)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            # another process may have stored it
+            self._update_store(removed=[key])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._update_store(clear=True)
+
+    def _get_store_mtime_ns(self) -> Optional[int]:
+        try:
+            return os.stat(self.store_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh_from_store(self):
+        # caller holds self._lock
+        mtime_ns = self._get_store_mtime_ns()
+        if mtime_ns is None or mtime_ns == self._store_mtime_ns:
+            return
+        self._entries.update(self._read_store())
+        self._store_mtime_ns = mtime_ns
+
+    def _read_store(self) -> Dict[str, Tuple[Any, float]]:
+        try:
+            with open(self.store_path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = self.clock()
+        return {
+            key: (value, expires_at)
+            for key, (value, expires_at) in stored.items()
+            if expires_at > now
+        }
+
+    @contextmanager
+    def _store_lock(self) -> Iterator[None]:
+        fd = os.open(self.store_path + ".lock", os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # closing the descriptor releases the lock
+            os.close(fd)
+
+    def _update_store(
+        self,
+        updates: Optional[Dict[str, Tuple[Any, float]]] = None,
+        removed: Optional[List[str]] = None,
+        clear: bool = False,
+    ):
+        # caller holds self._lock
+        if not self.store_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.store_path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with self._store_lock():
+                # what other processes stored since is kept, only these keys change
+                stored = {} if clear else self._read_store()
+                stored.update(updates or {})
+                for key in removed or []:
+                    stored.pop(key, None)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump({k: list(v) for k, v in stored.items()}, f)
+                os.replace(tmp_path, self.store_path)
+                self._store_mtime_ns = self._get_store_mtime_ns()
+            self._entries.update(stored)
+        except OSError as e:
+            # the store is only an optimization, the in memory entries still work
+            print(f"Could not write cache store {self.store_path}: {str(e)}")
@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 import os
-from typing import Any
-from result import Result
+import threading
+import time
+from typing import Any, Callable, Optional
+from result import Err, Ok, Result, is_err, is_ok
 from enum import Enum
 import platform
 
@@ -58,6 +60,116 @@ class Secret_Getter(ABC):
     def get_secret(self) -> Result[MLCore_Secret, str]:
         pass
 
+    def invalidate(self) -> bool:
+        """
+        Drops any cached copy of the secret. Returns True if the next
+        get_secret could return a different value than the last one.
+        """
+        return False
+
+
+class _Secret_Fetch(object):
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.done = threading.Event()
+        self.result: Optional[Result[MLCore_Secret, str]] = None
+
+
+class Caching_Secret_Getter(Secret_Getter):
+    """
+    Wraps another Secret_Getter and keeps its secret for ttl_seconds.
+
+    For stale_seconds after that the cached secret is still returned while a
+    background thread fetches a new one. Concurrent callers that need a fetch
+    share a single call to the wrapped getter. Errors are never cached.
+
+    invalidate() fetches the secret again at most once per
+    min_invalidate_seconds, and only reports a change when the secret really
+    was rotated, so a request that keeps getting a 403 is not repeated.
+    """
+
+    def __init__(
+        self,
+        secret_getter: Secret_Getter,
+        ttl_seconds: float = 900,
+        stale_seconds: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+        min_invalidate_seconds: float = 60,
+    ):
+        self.secret_getter = secret_getter
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.clock = clock
+        self.min_invalidate_seconds = min_invalidate_seconds
+        self._invalidated_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._secret: Optional[MLCore_Secret] = None
+        self._fetched_at: float = 0.0
+        self._generation = 0
+        self._fetch: Optional[_Secret_Fetch] = None
+
+    def _run_fetch(self, fetch: _Secret_Fetch):
+        try:
+            result = self.secret_getter.get_secret()
+        except Exception as e:
+            result = Err(f"Error getting secret: {str(e)}")
+        with self._lock:
+            # an invalidate that happened while fetching must not be undone by this result
+            if is_ok(result) and fetch.generation == self._generation:
+                self._secret = result.ok_value
+                self._fetched_at = self.clock()
+            if self._fetch is fetch:
+                self._fetch = None
+        fetch.result = result
+        fetch.done.set()
+
+    def get_secret(self) -> Result[MLCore_Secret, str]:
+        with self._lock:
+            age = self.clock() - self._fetched_at
+            if self._secret is not None and age < self.ttl_seconds:
+                return Ok(self._secret)
+            fetch = self._fetch
+            start_fetch = fetch is None
+            if start_fetch:
+                fetch = _Secret_Fetch(self._generation)
+                self._fetch = fetch
+            if self._secret is not None and age < self.ttl_seconds + self.stale_seconds:
+                if start_fetch:
+                    threading.Thread(
+                        target=self._run_fetch,
+                        args=(fetch,),
+                        name="secret-refresh",
+                        daemon=True,
+                    ).start()
+                return Ok(self._secret)
+        if start_fetch:
+            self._run_fetch(fetch)
+        else:
+            fetch.done.wait()
+        return fetch.result
+
+    def invalidate(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            if (
+                self._invalidated_at is not None
+                and now - self._invalidated_at < self.min_invalidate_seconds
+            ):
+                return False
+            self._invalidated_at = now
+            discarded = self._secret
+            self._generation = self._generation + 1
+            self._secret = None
+            self._fetched_at = 0.0
+            self._fetch = None
+        result = self.get_secret()
+        if is_err(result):
+            return False
+        return (
+            discarded is None
+            or result.ok_value.get_secret_value() != discarded.get_secret_value()
+        )
+
 
 class Runtime_Environment(str, Enum):
     CLOUD9 = "cloud9"
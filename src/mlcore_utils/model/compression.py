@@ -0,0 +1,184 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+import io
+import os
+import struct
+import time
+import zlib
+from typing import Deque, Optional
+
+MiB = 1024 * 1024
+# deflate looks back at most 32KiB, so that is all a block needs from the one before it
+DEFLATE_WINDOW_SIZE = 32 * 1024
+
+
+class Compression_Format(str, Enum):
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+    def get_file_extension(self) -> str:
+        return ".tar.gz" if self == Compression_Format.GZIP else ".tar.zst"
+
+
+class Parallel_Gzip_Writer(io.RawIOBase):
+    """
+    Gzip compresses on several threads, the way pigz does, and writes a
+    single ordinary gzip member to fileobj.
+
+    The input is cut into blocks that are deflated independently (zlib
+    releases the GIL while compressing), each primed with the last 32KiB of
+    the block before it so the ratio stays close to single threaded gzip.
+    Every block but the last ends on a sync flush, which makes the
+    concatenated raw deflate streams one valid stream. Blocks are written in
+    order and at most 2 * threads blocks are in memory. Closing the writer
+    does not close fileobj.
+    """
+
+    def __init__(
+        self,
+        fileobj,
+        compression_level: int = 6,
+        threads: Optional[int] = None,
+        block_size: int = MiB,
+        mtime: Optional[float] = None,
+    ):
+        super().__init__()
+        self.fileobj = fileobj
+        self.name = getattr(fileobj, "name", None)
+        self.compression_level = compression_level
+        self.threads = threads if threads else (os.cpu_count() or 1)
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._previous_tail = b""
+        self._crc = 0
+        self._size = 0
+        self._pending: Deque[Future] = deque()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="gzip-block"
+        )
+        self._write_header(int(time.time() if mtime is None else mtime))
+
+    def _write_header(self, mtime: int):
+        extra_flags = (
+            2
+            if self.compression_level == 9
+            else (4 if self.compression_level == 1 else 0)
+        )
+        # magic, deflate, no flags, mtime, extra flags, os unknown
+        self.fileobj.write(
+            struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, mtime, extra_flags, 255)
+        )
+
+    def _compress_block(self, block: bytes, dictionary: bytes, is_last: bool) -> bytes:
+        if dictionary:
+            compressor = zlib.compressobj(
+                self.compression_level,
+                zlib.DEFLATED,
+                -zlib.MAX_WBITS,
+                zlib.DEF_MEM_LEVEL,
+                zlib.Z_DEFAULT_STRATEGY,
+                dictionary,
+            )
+        else:
+            compressor = zlib.compressobj(
+                self.compression_level, zlib.DEFLATED, -zlib.MAX_WBITS
+            )
+        return compressor.compress(block) + compressor.flush(
+            zlib.Z_FINISH if is_last else zlib.Z_SYNC_FLUSH
+        )
+
+    def _submit_block(self, block: bytes, is_last: bool):
+        self._crc = zlib.crc32(block, self._crc)
+        self._size = self._size + len(block)
+        self._pending.append(
+            self._pool.submit(self._compress_block, block, self._previous_tail, is_last)
+        )
+        self._previous_tail = block[-DEFLATE_WINDOW_SIZE:]
+        while len(self._pending) > 2 * self.threads:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed Parallel_Gzip_Writer")
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[: self.block_size])
+            del self._buffer[: self.block_size]
+            self._submit_block(block, is_last=False)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._submit_block(bytes(self._buffer), is_last=True)
+            self._buffer = bytearray()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+            self.fileobj.write(struct.pack("<II", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self._pool.shutdown(wait=True)
+            super().close()
+
+
+class Zstd_Writer(io.RawIOBase):
+    """
+    zstd output through the optional zstandard package, which does its own
+    multi threading. Closing the writer does not close fileobj.
+    """
+
+    def __init__(
+        self, fileobj, compression_level: int = 3, threads: Optional[int] = None
+    ):
+        super().__init__()
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "zstd compression needs the zstandard package, pip install zstandard"
+            )
+        self.name = getattr(fileobj, "name", None)
+        compressor = zstandard.ZstdCompressor(
+            level=compression_level, threads=threads if threads else -1
+        )
+        self._writer = compressor.stream_writer(fileobj, closefd=False)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self._writer.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._writer.close()
+        finally:
+            super().close()
+
+
+def open_compressed_writer(
+    fileobj,
+    compression: Compression_Format = Compression_Format.GZIP,
+    compression_level: Optional[int] = None,
+    threads: Optional[int] = None,
+    mtime: Optional[float] = None,
+) -> io.RawIOBase:
+    if compression == Compression_Format.ZSTD:
+        return Zstd_Writer(
+            fileobj,
+            compression_level if compression_level is not None else 3,
+            threads,
+        )
+    return Parallel_Gzip_Writer(
+        fileobj,
+        compression_level if compression_level is not None else 6,
+        threads,
+        mtime=mtime,
+    )
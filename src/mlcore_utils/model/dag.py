@@ -0,0 +1,131 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import threading
+from attrs import define, field
+from result import Err, Result, is_err
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+@define
+class Dag_Node(object):
+    key: Hashable = field()
+    # gets the ok values of its dependencies, keyed by dependency key
+    action: Callable[[Dict[Hashable, Any]], Result[Any, str]] = field()
+    dependencies: List[Hashable] = field(factory=list)
+    # only waited for: the node runs whether these succeed or fail
+    run_after: List[Hashable] = field(factory=list)
+
+
+@define
+class Dag_Executor(object):
+    """
+    Runs Dag_Nodes on a thread pool as soon as their dependencies succeed.
+
+    Nodes are identified by key. A key that shows up more than once in a run
+    is run once, and a run that meets a key another run has in flight waits
+    for that result instead of starting it again. Nothing is remembered
+    between runs: a key that succeeded earlier runs again, so an executor
+    can be reused for repeated deploys. A node whose dependency failed is
+    not run and gets an Err; a failed run_after node does not stop it.
+    """
+
+    max_workers: int = field(default=8)
+    _in_flight: Dict[Hashable, Future] = field(init=False, factory=dict)
+    _lock: threading.Lock = field(init=False, factory=threading.Lock)
+    _pool: Optional[ThreadPoolExecutor] = field(init=False, default=None)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def _run_node(
+        self, node: Dag_Node, dependency_values: Dict[Hashable, Any]
+    ) -> Result[Any, str]:
+        try:
+            result = node.action(dependency_values)
+        except Exception as e:
+            result = Err(f"{node.key} failed with error {str(e)}")
+        with self._lock:
+            self._in_flight.pop(node.key, None)
+        return result
+
+    def _try_to_start(
+        self,
+        node: Dag_Node,
+        results: Dict[Hashable, Result[Any, str]],
+        running: Dict[Future, Hashable],
+        max_running: Optional[int] = None,
+    ) -> bool:
+        """
+        Returns True once the node has either a result or a running future.
+        """
+        with self._lock:
+            if node.key in self._in_flight:
+                running[self._in_flight[node.key]] = node.key
+                return True
+        if any(d not in results for d in node.dependencies + node.run_after):
+            return False
+        failed = [d for d in node.dependencies if is_err(results[d])]
+        if failed:
+            results[node.key] = Err(
+                f"{node.key} was not run because {failed[0]} failed: {results[failed[0]].err_value}"
+            )
+            return True
+        if max_running is not None and len(running) >= max_running:
+            return False
+        dependency_values = {d: results[d].ok_value for d in node.dependencies}
+        with self._lock:
+            # another run may have started it since the check above
+            future = self._in_flight.get(node.key)
+            if future is None:
+                future = self._get_pool().submit(
+                    self._run_node, node, dependency_values
+                )
+                self._in_flight[node.key] = future
+        running[future] = node.key
+        return True
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        # caller holds self._lock
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="dag-executor"
+            )
+        return self._pool
+
+    def run(
+        self, nodes: List[Dag_Node], max_running: Optional[int] = None
+    ) -> Dict[Hashable, Result[Any, str]]:
+        """
+        max_running caps how many nodes of this run are in flight at once, on
+        top of the executor wide max_workers.
+        """
+        pending: Dict[Hashable, Dag_Node] = {}
+        for node in nodes:
+            pending.setdefault(node.key, node)
+
+        results: Dict[Hashable, Result[Any, str]] = {}
+        for node in pending.values():
+            for dependency in node.dependencies + node.run_after:
+                if dependency not in pending:
+                    results[dependency] = Err(f"{dependency} is not part of the graph")
+
+        running: Dict[Future, Hashable] = {}
+        while pending or running:
+            started_something = True
+            while started_something:
+                started_something = False
+                for key, node in list(pending.items()):
+                    if self._try_to_start(node, results, running, max_running):
+                        del pending[key]
+                        started_something = True
+            if not running:
+                for key in pending:
+                    results[key] = Err(f"{key} is part of a dependency cycle")
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+        return results
@@ -27,6 +27,7 @@ from mlcore_utils.model.blacklodge import (
     Blacklodge_User,
     Pipeline_Alias,
 )
+from mlcore_utils.model.gh import Commit_Sha_Resolver, GitHub_Repo
 from mlcore_utils.model.stratos_interface import (
     Stratos_AppOwnersMetadata_V1,
     Stratos_AppSyncArgoRequest_V1,
@@ -204,11 +205,25 @@ class Blacklodge_Image_For_Stratos(object):
     splunk_constants: Splunk_Constants = field()
     # helm_repo_deployer: Helm_Repo_Deployer = field()
     image_tag: Optional[str] = field(default=None)
+    # every commit sha of this deploy is asked of GitHub once
+    sha_resolver: Commit_Sha_Resolver = field(factory=Commit_Sha_Resolver)
 
 
     def initialize_latent_values(self):
+        repos = self._get_github_repos()
+        for repo in repos:
+            repo.sha_resolver = self.sha_resolver
+        # the repos are independent, resolve them at the same time
+        self.sha_resolver.resolve_many(repos)
         self._assign_git_image_tag()
 
+    def _get_github_repos(self) -> List[GitHub_Repo]:
+        return [
+            self.blacklodge_model.runtime_config.blacklodge_container.github_repo,
+            self.blacklodge_model.git_repo,
+            self.blacklodge_model.blacklodge_helm_charts_git_repo,
+        ]
+
     def print_me(self):
         print(asdict(self))
 
@@ -218,7 +233,7 @@ class Blacklodge_Image_For_Stratos(object):
         
 
     def _get_value_from_result(self, input_result: Result[str, str], msg_tag: str):
-        if input_result.is_ok:
+        if is_ok(input_result):
             blacklodge_container_repo_hash = input_result.ok_value
             return blacklodge_container_repo_hash
         elif input_result.err_value:
@@ -0,0 +1,309 @@
+from __future__ import annotations
+import json
+import os
+from attrs import define, field
+from dvc.repo import Repo
+from result import Err, Ok, Result, is_err
+from typing import Any, Dict, Iterator, List, Optional
+import yaml
+
+# tried in order, reflink needs a filesystem that supports it (xfs, btrfs, apfs)
+DEFAULT_DVC_LINK_TYPES = ["reflink", "hardlink", "copy"]
+
+
+# folders that never hold dvc files of the repo
+SKIPPED_FOLDERS = {".git", ".dvc", "node_modules", "__pycache__"}
+
+
+def is_dvc_file_name(name: str) -> bool:
+    # .dvc files and dvc.lock, a ".dvc" folder matches too
+    return name.endswith(".dvc") or name == "dvc.lock"
+
+
+def _iter_entries(folder: str) -> Iterator[os.DirEntry]:
+    # os.scandir, so nothing but directory entries is read
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    yield entry
+                    if (
+                        entry.is_dir(follow_symlinks=False)
+                        and entry.name not in SKIPPED_FOLDERS
+                    ):
+                        pending.append(entry.path)
+        except OSError:
+            continue
+
+
+def iter_dvc_files(folder: str) -> Iterator[str]:
+    """
+    Paths of the .dvc and dvc.lock files under folder.
+    """
+    for entry in _iter_entries(folder):
+        if not entry.is_dir(follow_symlinks=False) and is_dvc_file_name(entry.name):
+            yield entry.path
+
+
+def find_dvc_roots(folder: str) -> List[str]:
+    """
+    The folders with a .dvc folder: folder itself, or the ones below it that
+    dvc init --subdir set up.
+    """
+    if os.path.isdir(os.path.join(folder, ".dvc")):
+        return [folder]
+    return [
+        os.path.dirname(entry.path)
+        for entry in _iter_entries(folder)
+        if entry.name == ".dvc" and entry.is_dir(follow_symlinks=False)
+    ]
+
+
+def find_dvc_marker(folder: str) -> Optional[str]:
+    """
+    The first file that makes folder a dvc repo with tracked data: the
+    .dvc/config at its root, or else any .dvc or dvc.lock file. Every dvc
+    check of a local folder goes through here.
+    """
+    config = os.path.join(folder, ".dvc", "config")
+    if os.path.isfile(config):
+        return config
+    return next(iter_dvc_files(folder), None)
+
+
+def is_dvc_repo(folder: str) -> bool:
+    return find_dvc_marker(folder) is not None
+
+
+@define
+class DVC_Output(object):
+    # relative to the repo root
+    path: str = field()
+    md5: str = field()
+    size: int = field(default=0)
+    # number of files for a tracked folder, 1 for a file
+    nfiles: int = field(default=1)
+    # dvc 3 keeps outputs under files/md5 in the cache, dvc 2 at the top
+    is_legacy: bool = field(default=False)
+
+    @property
+    def is_dir(self) -> bool:
+        return self.md5.endswith(".dir")
+
+    def get_cache_paths(self, cache_directory: str) -> List[str]:
+        relative = os.path.join(self.md5[:2], self.md5[2:])
+        if self.is_legacy:
+            return [os.path.join(cache_directory, relative)]
+        return [
+            os.path.join(cache_directory, "files", "md5", relative),
+            os.path.join(cache_directory, relative),
+        ]
+
+    def _get_cached_path(self, cache_directory: str) -> Optional[str]:
+        for path in self.get_cache_paths(cache_directory):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def is_cached(self, cache_directory: str) -> bool:
+        cached = self._get_cached_path(cache_directory)
+        if cached is None or not self.is_dir:
+            return cached is not None
+        # a folder is only complete when every file of its listing is there
+        try:
+            with open(cached, "r") as f:
+                listing = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return all(
+            DVC_Output(
+                entry["relpath"], entry["md5"], is_legacy=self.is_legacy
+            )._get_cached_path(cache_directory)
+            for entry in listing
+        )
+
+
+@define
+class DVC_Outputs_Index(object):
+    """
+    What the dvc files of a repo track, read straight from the .dvc and
+    dvc.lock files without opening a dvc Repo.
+    """
+
+    outputs: List[DVC_Output] = field(factory=list)
+
+    @classmethod
+    def from_folder(cls, folder: str) -> DVC_Outputs_Index:
+        outputs = []
+        for dvc_file in iter_dvc_files(folder):
+            with open(dvc_file, "r") as f:
+                try:
+                    content = yaml.safe_load(f) or {}
+                except yaml.YAMLError as e:
+                    raise Exception(f"{dvc_file} is not valid yaml: {str(e)}")
+            base = os.path.relpath(os.path.dirname(dvc_file), folder)
+            if os.path.basename(dvc_file) == "dvc.lock":
+                outs = [
+                    out
+                    for stage in (content.get("stages") or {}).values()
+                    for out in (stage.get("outs") or [])
+                ]
+            else:
+                outs = content.get("outs") or []
+            for out in outs:
+                if not out.get("md5"):
+                    continue
+                outputs.append(
+                    DVC_Output(
+                        path=os.path.normpath(os.path.join(base, out["path"])),
+                        md5=out["md5"],
+                        size=out.get("size", 0),
+                        nfiles=out.get("nfiles", 1),
+                        is_legacy=out.get("hash") != "md5",
+                    )
+                )
+        return DVC_Outputs_Index(outputs)
+
+    @property
+    def total_size(self) -> int:
+        return sum(o.size for o in self.outputs)
+
+    @property
+    def number_of_files(self) -> int:
+        return sum(o.nfiles for o in self.outputs)
+
+    def get_missing(self, cache_directory: Optional[str]) -> List[DVC_Output]:
+        if not cache_directory:
+            return list(self.outputs)
+        return [o for o in self.outputs if not o.is_cached(cache_directory)]
+
+    def get_bytes_to_fetch(self, cache_directory: Optional[str]) -> int:
+        """
+        Upper bound of what a pull downloads, a partly cached folder counts
+        in full.
+        """
+        return sum(o.size for o in self.get_missing(cache_directory))
+
+
+@define
+class DVC_Fetch_Options(object):
+    # parallel downloads per pull, None is dvc's default of 4 * cpu count
+    jobs: Optional[int] = field(default=None)
+    # shared by every registration, so an artifact is downloaded only once.
+    # None keeps the cache inside the cloned repo
+    cache_directory: Optional[str] = field(default="/tmp/mlcore_dvc_cache")
+    link_types: List[str] = field(factory=lambda: list(DEFAULT_DVC_LINK_TYPES))
+    remote: Optional[str] = field(default=None)
+
+
+@define
+class DVC_Fetcher(object):
+    """
+    Pulls the dvc tracked data of a cloned repo, through one dvc Repo per
+    folder holding a .dvc folder (the repo itself, or its dvc init --subdir
+    projects).
+
+    The cache is pointed at cache_directory through a config override, so
+    nothing is written to the repo's own .dvc/config. Files already in the
+    shared cache from an earlier registration are linked into the workspace
+    instead of being downloaded again. With hardlinks dvc makes the linked
+    files read only, which is fine for packaging.
+    """
+
+    repo_folder: str = field()
+    options: DVC_Fetch_Options = field(factory=DVC_Fetch_Options)
+    _repos: Dict[str, Repo] = field(init=False, factory=dict)
+    _index: Optional[DVC_Outputs_Index] = field(init=False, default=None)
+
+    def is_dvc_repo(self) -> bool:
+        return is_dvc_repo(self.repo_folder)
+
+    def get_outputs_index(self) -> Result[DVC_Outputs_Index, str]:
+        if self._index is None:
+            try:
+                self._index = DVC_Outputs_Index.from_folder(self.repo_folder)
+            except Exception as e:
+                return Err(
+                    f"Reading the dvc files of {self.repo_folder} failed with error {str(e)}"
+                )
+        return Ok(self._index)
+
+    def _get_config_override(self) -> Dict[str, Any]:
+        if not self.options.cache_directory:
+            return {}
+        return {
+            "cache": {
+                "dir": self.options.cache_directory,
+                "type": ",".join(self.options.link_types),
+                # lets other registrations (and users) reuse the files
+                "shared": "group",
+            }
+        }
+
+    def get_repos(self) -> List[Repo]:
+        if not self._repos:
+            if self.options.cache_directory:
+                os.makedirs(self.options.cache_directory, exist_ok=True)
+            for root in find_dvc_roots(self.repo_folder):
+                self._repos[root] = Repo(root, config=self._get_config_override())
+        return list(self._repos.values())
+
+    def has_tracked_outputs(self) -> bool:
+        if not self.is_dvc_repo():
+            return False
+        index_result = self.get_outputs_index()
+        # dvc files that cannot be read still track data, pull() reports the error
+        return is_err(index_result) or len(index_result.ok_value.outputs) > 0
+
+    def pull(self, jobs: Optional[int] = None) -> Result[Dict[str, Any], str]:
+        """
+        Returns dvc's pull stats, the number of files fetched from the remote
+        is under "fetched".
+        """
+        try:
+            if not self.has_tracked_outputs():
+                return Ok({"fetched": 0})
+            index_result = self.get_outputs_index()
+            if is_err(index_result):
+                return index_result
+            repos = self.get_repos()
+            if not repos:
+                return Err(
+                    f"{self.repo_folder} has dvc files but no .dvc folder to pull them with"
+                )
+            if not index_result.ok_value.get_missing(self.options.cache_directory):
+                # everything is in the shared cache, there is nothing to ask the remote
+                stats: Dict[str, Any] = {}
+                for repo in repos:
+                    stats = _merge_stats(stats, repo.checkout())
+                return Ok({**stats, "fetched": 0})
+            stats = {}
+            for repo in repos:
+                stats = _merge_stats(
+                    stats,
+                    repo.pull(
+                        jobs=jobs if jobs else self.options.jobs,
+                        remote=self.options.remote,
+                    ),
+                )
+            return Ok(stats)
+        except Exception as e:
+            return Err(f"dvc pull in {self.repo_folder} failed with error {str(e)}")
+
+    def close(self):
+        for repo in self._repos.values():
+            repo.close()
+        self._repos = {}
+
+
+def _merge_stats(stats: Dict[str, Any], more: Dict[str, Any]) -> Dict[str, Any]:
+    # counts add up, lists of changed paths are joined
+    merged = dict(stats)
+    for key, value in (more or {}).items():
+        if key in merged and isinstance(value, (int, list)):
+            merged[key] = merged[key] + value
+        else:
+            merged[key] = value
+    return merged
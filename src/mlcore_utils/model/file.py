@@ -1,5 +1,7 @@
 import os
-from typing import Optional
+from typing import Iterable, Optional, Union
+import gzip
+import hashlib
 import io
 import tarfile
 import glob
@@ -8,17 +10,198 @@ from tarfile import TarFile
 from attrs import define, field
 from result import Result
 
+from mlcore_utils.model.compression import Compression_Format, open_compressed_writer
+
+
+def normalize_tarinfo(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+    """
+    Drops everything from a tar header that depends on the machine or the
+    time the files were checked out rather than on their contents.
+    """
+    tarinfo.mtime = 0
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ""
+    if tarinfo.isdir() or tarinfo.mode & 0o100:
+        tarinfo.mode = 0o755
+    else:
+        tarinfo.mode = 0o644
+    return tarinfo
+
+
+def is_in_repo_path_scope(name: str, is_dir: bool, repo_path: Optional[str]) -> bool:
+    """
+    Whether name (relative to the repo root) is packaged for a pipeline at
+    repo_path: everything under repo_path, the folders leading to it and
+    the non hidden entries at the root of the repo. Without a repo_path the
+    whole repo is packaged.
+    """
+    # hidden entries at the top of the repo are left out, like Tarball does
+    if name.startswith("."):
+        return False
+    if not repo_path or "/" not in name:
+        return True
+    path = repo_path.strip("/")
+    return (
+        name == path
+        or name.startswith(path + "/")
+        or (is_dir and path.startswith(name + "/"))
+    )
+
+
+class _Digesting_Writer(io.RawIOBase):
+    def __init__(self, fileobj):
+        super().__init__()
+        self.fileobj = fileobj
+        self._sha256 = hashlib.sha256()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._sha256.update(data)
+        self.fileobj.write(data)
+        return len(data)
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
 
 @define
 class Tarball(object):
     source_directory: str = field()
     name: str = field()
     destination_directory: str = field(default="/tmp")
+    compression: Compression_Format = field(default=Compression_Format.GZIP)
+    # None means the default of the backend: 9 for tarfile's gzip, 6 for parallel gzip, 3 for zstd
+    compression_level: Optional[int] = field(default=None)
+    # 1 keeps tarfile's own single threaded gzip, 0 uses every core
+    compression_threads: int = field(default=1)
+    # sorted entries, normalized headers and a fixed gzip timestamp, so the same
+    # contents give the same bytes for the same compression settings
+    reproducible: bool = field(default=False)
+    # sha256 of the last tarball written, only set in reproducible mode
+    digest: Optional[str] = field(default=None, init=False)
+
+    def _is_plain_gzip(self, compression, compression_threads) -> bool:
+        return compression == Compression_Format.GZIP and compression_threads == 1
 
-    def create(self) -> Result[TarFile, str]:
-        return Tarball.tar_zip_a_folder(
-            self.source_directory, self.name, self.destination_directory
+    def create(
+        self,
+        compression: Optional[Compression_Format] = None,
+        compression_level: Optional[int] = None,
+        compression_threads: Optional[int] = None,
+    ) -> Result[TarFile, str]:
+        """
+        The arguments override the fields of the same name for this call.
+        """
+        compression = compression if compression else self.compression
+        compression_level = (
+            compression_level
+            if compression_level is not None
+            else self.compression_level
+        )
+        compression_threads = (
+            compression_threads
+            if compression_threads is not None
+            else self.compression_threads
         )
+        if (
+            self._is_plain_gzip(compression, compression_threads)
+            and compression_level is None
+            and not self.reproducible
+        ):
+            return Tarball.tar_zip_a_folder(
+                self.source_directory, self.name, self.destination_directory
+            )
+        try:
+            tarball_path = os.path.join(
+                self.destination_directory,
+                f"{self.name}{compression.get_file_extension()}",
+            )
+            with open(tarball_path, "wb") as f:
+                tar = self._write_compressed(
+                    f, compression, compression_level, compression_threads
+                )
+            return Ok(tar)
+        except Exception as e:
+            return Err("tarball creation failed with error " + str(e))
+
+    def write_to(self, fileobj) -> Result[TarFile, str]:
+        """
+        Streams the compressed tarball into fileobj (only write() is used)
+        instead of a file under destination_directory.
+        """
+        try:
+            return Ok(
+                self._write_compressed(
+                    fileobj,
+                    self.compression,
+                    self.compression_level,
+                    self.compression_threads,
+                )
+            )
+        except Exception as e:
+            return Err("tarball creation failed with error " + str(e))
+
+    def _write_compressed(
+        self,
+        fileobj,
+        compression: Compression_Format,
+        compression_level: Optional[int],
+        compression_threads: int,
+    ) -> TarFile:
+        digesting = _Digesting_Writer(fileobj) if self.reproducible else None
+        target = digesting if digesting else fileobj
+        if self._is_plain_gzip(compression, compression_threads):
+            if not self.reproducible:
+                tar = tarfile.open(
+                    fileobj=target,
+                    mode="w|gz",
+                    **(
+                        {"compresslevel": compression_level}
+                        if compression_level is not None
+                        else {}
+                    ),
+                )
+                Tarball._add_folder_contents(tar, self.source_directory)
+                tar.close()
+                return tar
+            # tarfile's own gzip stamps the current time and the file name
+            compressed = gzip.GzipFile(
+                filename="",
+                mode="wb",
+                fileobj=target,
+                compresslevel=compression_level if compression_level is not None else 9,
+                mtime=0,
+            )
+        else:
+            compressed = open_compressed_writer(
+                target,
+                compression,
+                compression_level,
+                compression_threads,
+                mtime=0 if self.reproducible else None,
+            )
+        tar = tarfile.open(fileobj=compressed, mode="w|")
+        Tarball._add_folder_contents(tar, self.source_directory, self.reproducible)
+        tar.close()
+        compressed.close()
+        if digesting:
+            self.digest = digesting.hexdigest()
+        return tar
+
+    @classmethod
+    def _add_folder_contents(
+        cls, tar: TarFile, source_dir: str, reproducible: bool = False
+    ):
+        file_names = glob.glob(os.path.join(source_dir, "*"))
+        if not reproducible:
+            for file_name in file_names:
+                tar.add(file_name, os.path.basename(file_name))
+            return
+        # tar.add already walks sub folders in sorted order
+        for file_name in sorted(file_names):
+            tar.add(file_name, os.path.basename(file_name), filter=normalize_tarinfo)
 
     @classmethod
     def tar_zip_a_folder(
@@ -29,63 +212,52 @@ class Tarball(object):
             if os.path.exists(tarball_path):
                 os.remove(tarball_path)
             tar = tarfile.open(tarball_path, "w:gz")
-            for file_name in glob.glob(os.path.join(source_dir, "*")):
-                tar.add(file_name, os.path.basename(file_name))
+            cls._add_folder_contents(tar, source_dir)
             tar.close()
             return Ok(tar)
         except Exception as e:
             return Err("tarball creation failed with error " + str(e))
 
 
-class Generator_To_FileLike(io.BytesIO):
-
-    def __init__(self, iter):
-        self._iter = iter
-        self._left = ""
+class _Generator_Reader(io.RawIOBase):
+    def __init__(self, chunks: Iterable[Union[bytes, str]], encoding: str):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._encoding = encoding
+        self._left = memoryview(b"")
 
-    def readable(self):
+    def readable(self) -> bool:
         return True
 
-    def _read1(self, n=None):
+    def readinto(self, buffer) -> int:
         while not self._left:
             try:
-                self._left = next(self._iter)
+                chunk = next(self._chunks)
             except StopIteration:
-                break
-        ret = self._left[:n]
-        self._left = self._left[len(ret) :]
-        return ret
-
-    def read(self, n=None):
-        l = []
-        if n is None or n < 0:
-            while True:
-                m = self._read1()
-                if not m:
-                    break
-                l.append(m)
-        else:
-            while n > 0:
-                m = self._read1(n)
-                if not m:
-                    break
-                n -= len(m)
-                l.append(m)
-        return bytes("".join(l), "utf-8")
-
-    def readline(self, size: Optional[int] = None):
-        l = []
-        while True:
-            i = self._left.find("\n")
-            if i == -1:
-                l.append(self._left)
-                try:
-                    self._left = next(self._iter)
-                except StopIteration:
-                    self._left = ""
-                    break
-            else:
-                l.append(self._left[: i + 1])
-                self._left = self._left[i + 1 :]
-                break
-        return bytes("".join(l), "utf-8")
+                return 0
+            if isinstance(chunk, str):
+                chunk = chunk.encode(self._encoding)
+            self._left = memoryview(chunk).cast("B")
+        target = memoryview(buffer).cast("B")
+        size = min(len(target), len(self._left))
+        target[:size] = self._left[:size]
+        # slicing a memoryview does not copy the rest of the chunk
+        self._left = self._left[size:]
+        return size
+
+
+class Generator_To_FileLike(io.BufferedReader):
+    """
+    Read only file object over a generator of bytes or str chunks (str is
+    encoded with encoding), e.g. for boto3's upload_fileobj. Chunks are
+    copied once, straight into the caller's buffer, and read(n) returns
+    exactly n bytes until the generator runs out.
+    """
+
+    def __init__(
+        self,
+        iter: Iterable[Union[bytes, str]],
+        buffer_size: int = 1024 * 1024,
+        encoding: str = "utf-8",
+    ):
+        super().__init__(_Generator_Reader(iter, encoding), buffer_size)
@@ -1,11 +1,15 @@
 from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
 import json
+import tarfile
 from tarfile import TarFile
 from requests.auth import HTTPBasicAuth
 import shutil
+import threading
 from tempfile import TemporaryDirectory
 import requests
-from typing import Any, List
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 import os
 from result import Result, Err, Ok, is_err, is_ok
 from attrs import define, field
@@ -13,12 +17,36 @@ from enum import Enum
 from typing import Optional
 import git
 from git import Repo
-from dvc.api import DVCFileSystem
-from dvc import repo as dvc_repo
 
+from mlcore_utils.model.cache import TTL_Cache
 from mlcore_utils.model.common import MLCore_Secret, Secret_Getter
-from mlcore_utils.model.file import Tarball
+from mlcore_utils.model.compression import Compression_Format, open_compressed_writer
+from mlcore_utils.model.dvc_utils import (
+    DVC_Fetch_Options,
+    DVC_Fetcher,
+    is_dvc_file_name,
+    is_dvc_repo,
+)
+from mlcore_utils.model.file import (
+    Tarball,
+    is_in_repo_path_scope,
+    normalize_tarinfo,
+)
+from mlcore_utils.model.git_mirror_cache import (
+    Git_Mirror_Cache,
+    get_shared_git_mirror_cache,
+)
+from mlcore_utils.model.incremental_tarball import Incremental_Tarball
 from mlcore_utils.model.common import Http_Method
+from mlcore_utils.model.stratos_api import Requests_Wrapper
+
+
+GITHUB_CA_BUNDLE = "/etc/pki/tls/certs/ca-bundle.crt"
+ARCHIVE_BUFFER_SIZE = 1024 * 1024
+GITHUB_ETAG_STORE_PATH = "/tmp/mlcore_github_etags.json"
+
+_shared_etag_cache: Optional[TTL_Cache] = None
+_shared_etag_cache_lock = threading.Lock()
 
 
 class GitHub_Organization(str, Enum):
@@ -55,6 +83,121 @@ class GitHub_Auth(object):
             )
 
 
+class Git_Partial_Clone_Filter(str, Enum):
+    # history without file contents, blobs are fetched when checked out
+    BLOBLESS = "blob:none"
+    # only the commits, trees and blobs are fetched when checked out
+    TREELESS = "tree:0"
+
+
+@define
+class Git_Clone_Options(object):
+    """
+    How much of the remote a clone fetches. The default is a depth 1 clone of
+    just the branch, tag or commit being packaged. sparse_checkout limits the
+    working tree to git_repo_path (plus the files at the root of the repo)
+    and is best combined with a BLOBLESS filter so the other blobs are never
+    downloaded.
+    """
+
+    depth: Optional[int] = field(default=1)
+    single_branch: bool = field(default=True)
+    filter: Optional[Git_Partial_Clone_Filter] = field(default=None)
+    sparse_checkout: bool = field(default=False)
+
+    @classmethod
+    def full(cls) -> Git_Clone_Options:
+        return Git_Clone_Options(depth=None, single_branch=False)
+
+    def is_full_clone(self) -> bool:
+        return (
+            self.depth is None
+            and not self.single_branch
+            and self.filter is None
+            and not self.sparse_checkout
+        )
+
+    def get_fetch_args(self) -> List[str]:
+        args = []
+        if self.depth:
+            args.append(f"--depth={self.depth}")
+        if self.filter:
+            args.append(f"--filter={self.filter.value}")
+        return args
+
+    def get_clone_args(self, ref: str) -> List[str]:
+        args = self.get_fetch_args() + [f"--branch={ref}"]
+        if self.single_branch:
+            args.append("--single-branch")
+        elif self.depth:
+            args.append("--no-single-branch")
+        if self.sparse_checkout:
+            args.append("--no-checkout")
+        return args
+
+
+def get_shared_github_etag_cache() -> TTL_Cache:
+    """
+    ETags and shas of GitHub api responses, kept on disk so that later
+    processes can make conditional requests. A 304 does not count against
+    the rate limit.
+    """
+    global _shared_etag_cache
+    with _shared_etag_cache_lock:
+        if _shared_etag_cache is None:
+            _shared_etag_cache = TTL_Cache(
+                ttl_seconds=7 * 24 * 3600, store_path=GITHUB_ETAG_STORE_PATH
+            )
+        return _shared_etag_cache
+
+
+@define
+class Commit_Sha_Resolver(object):
+    """
+    Resolves the commit shas of the repos that take part in one deploy. Each
+    (org, repo, ref) is asked of GitHub once per resolver, callers asking for
+    the same one at the same time share the request, and failures are not
+    remembered. Create one per deploy, a branch can move between deploys.
+    """
+
+    etag_cache: TTL_Cache = field(factory=get_shared_github_etag_cache)
+    max_workers: int = field(default=4)
+    _resolved: Dict[Tuple[str, str, str], Future] = field(init=False, factory=dict)
+    _lock: threading.Lock = field(init=False, factory=threading.Lock)
+
+    def _get_key(self, repo: GitHub_Repo) -> Tuple[str, str, str]:
+        ref = f"tags/{repo.tag}" if repo.tag else f"heads/{repo.git_repo_branch}"
+        return (repo.github_organization.value, repo.git_repo_name.lower(), ref)
+
+    def resolve(self, repo: GitHub_Repo) -> Result[str, str]:
+        if repo.commit_sha:
+            return Ok(repo.commit_sha)
+        key = self._get_key(repo)
+        with self._lock:
+            future = self._resolved.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._resolved[key] = future
+        if is_owner:
+            try:
+                result = repo.resolve_commit_sha(self.etag_cache)
+            except Exception as e:
+                result = Err(f"error getting commit sha for repo {key[1]}: {str(e)}")
+            if is_err(result):
+                with self._lock:
+                    del self._resolved[key]
+            future.set_result(result)
+        return future.result()
+
+    def resolve_many(self, repos: List[GitHub_Repo]) -> List[Result[str, str]]:
+        """
+        Resolves the repos concurrently, results are in the order of repos.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(self.resolve, repos))
+
+
 @define
 class GitHub_Repo(object):
     git_repo_url: str = field()
@@ -68,6 +211,13 @@ class GitHub_Repo(object):
     local_path_to_clone_into: str = field(default="/tmp")
     repo_url_with_auth: Result[MLCore_Secret, str] = field(init=False)
     obtained_repo: Optional[Repo] = field(default=None)
+    clone_options: Git_Clone_Options = field(factory=Git_Clone_Options)
+    # clones go through a local bare mirror when set, see Git_Mirror_Cache
+    mirror_cache: Optional[Git_Mirror_Cache] = field(default=None)
+    # memoizes get_commit_sha for the duration of a deploy when set
+    sha_resolver: Optional[Commit_Sha_Resolver] = field(default=None)
+    dvc_fetch_options: DVC_Fetch_Options = field(factory=DVC_Fetch_Options)
+    _dvc_fetcher: Optional[DVC_Fetcher] = field(init=False, default=None)
 
     def __attrs_post_init__(self):
         if self.tag and self.commit_sha:
@@ -93,28 +243,86 @@ class GitHub_Repo(object):
         else:
             raise Exception("No Auth Values are Supplied to GitHub_Repo")
 
-    def clone_repo(self) -> Result[Repo, str]:
-        to_path = os.path.join(self.get_local_repo_folder())
+    def _get_mirror_key(self) -> str:
+        return f"{self.github_organization.value}_{self.git_repo_name}"
+
+    def _get_mirror_refspecs(self, branch: Optional[str]) -> Optional[List[str]]:
+        # only what the clone needs, a full clone takes every branch and tag
+        if self.clone_options.is_full_clone():
+            return None
+        if self.commit_sha:
+            # kept under a ref so gc does not drop it from the mirror
+            return [f"+{self.commit_sha}:refs/mlcore/commits/{self.commit_sha}"]
+        if self.tag:
+            return [f"+refs/tags/{self.tag}:refs/tags/{self.tag}"]
+        ref = branch or self.git_repo_branch
+        return [f"+refs/heads/{ref}:refs/heads/{ref}"]
+
+    def _get_mirror_fetch_args(self) -> List[str]:
+        if self.clone_options.depth:
+            return [f"--depth={self.clone_options.depth}"]
+        return []
+
+    def clone_repo(self, branch: Optional[str] = None) -> Result[Repo, str]:
         if is_ok(self.repo_url_with_auth):
-            try:
-                return Ok(
-                    Repo.clone_from(
-                        (self.repo_url_with_auth.ok_value.get_secret_value()),
-                        to_path,
-                    )
-                )
-            except Exception as e:
-                return Err("Repo Clone action failed with error " + str(e))
+            url = self.repo_url_with_auth.ok_value.get_secret_value()
+            if not self.mirror_cache:
+                return self._clone_from(url, branch)
+            with self.mirror_cache.open_mirror(
+                self._get_mirror_key(),
+                url,
+                self._get_mirror_refspecs(branch),
+                self._get_mirror_fetch_args(),
+            ) as mirror_result:
+                if is_ok(mirror_result):
+                    return self._clone_from(f"file://{mirror_result.ok_value}", branch)
+                print(mirror_result.err_value + ", cloning without the mirror")
+            return self._clone_from(url, branch)
         elif is_err(self.repo_url_with_auth):
             return Err(self.repo_url_with_auth.err_value)
         else:
             return Err("Repo Clone action failed with unknown error")
 
+    def _clone_from(self, url: str, branch: Optional[str]) -> Result[Repo, str]:
+        to_path = os.path.join(self.get_local_repo_folder())
+        try:
+            if self.clone_options.is_full_clone():
+                return Ok(Repo.clone_from(url, to_path))
+            if self.commit_sha:
+                return Ok(self._fetch_commit(url, to_path))
+            ref = self.tag if self.tag else (branch or self.git_repo_branch)
+            repo = Repo.clone_from(
+                url, to_path, multi_options=self.clone_options.get_clone_args(ref)
+            )
+            if self.clone_options.sparse_checkout:
+                self._set_sparse_checkout(repo)
+                repo.git.checkout(ref)
+            return Ok(repo)
+        except Exception as e:
+            return Err("Repo Clone action failed with error " + str(e))
+
+    def _fetch_commit(self, url: str, to_path: str) -> Repo:
+        # clone --branch only takes branches and tags, a bare sha has to be fetched
+        repo = Repo.init(to_path)
+        repo.create_remote("origin", url)
+        repo.git.fetch("origin", self.commit_sha, *self.clone_options.get_fetch_args())
+        if self.clone_options.sparse_checkout:
+            self._set_sparse_checkout(repo)
+        repo.git.checkout("FETCH_HEAD")
+        return repo
+
+    def _set_sparse_checkout(self, repo: Repo):
+        if self.git_repo_path:
+            repo.git.sparse_checkout("set", "--cone", self.git_repo_path.strip("/"))
+
     def clone_repo_and_checkout(self, branch: Optional[str] = None):
         br = branch if branch else self.git_repo_branch
-        clone_result = self.clone_repo()
+        clone_result = self.clone_repo(br)
         if is_ok(clone_result):
             repo = clone_result.ok_value
+            # a limited clone already checked out the requested ref
+            if not self.clone_options.is_full_clone():
+                return
             if br.lower() != repo.active_branch.name.lower():
                 try:
                     repo.git.fetch("--all")
@@ -131,46 +339,225 @@ class GitHub_Repo(object):
         else:
             raise Exception("Cloning repo failed with unknown error")
 
+    def get_dvc_fetcher(self) -> DVC_Fetcher:
+        # one dvc Repo for the detection and the pull
+        if self._dvc_fetcher is None:
+            self._dvc_fetcher = DVC_Fetcher(
+                self.get_local_repo_folder(), self.dvc_fetch_options
+            )
+        return self._dvc_fetcher
+
     def check_if_repo_is_dvc_repo(self) -> bool:
-        fs = DVCFileSystem(self.get_local_repo_folder())
-        return len(fs.find("/", detail=False, dvc_only=True)) > 0
+        return self.get_dvc_fetcher().has_tracked_outputs()
+
+    def get_dvc_files(self, jobs: Optional[int] = None):
+        fetcher = self.get_dvc_fetcher()
+        if not fetcher.has_tracked_outputs():
+            return
+        index_result = fetcher.get_outputs_index()
+        if is_err(index_result):
+            raise Exception(index_result.err_value)
+        index = index_result.ok_value
+        print(
+            f"dvc tracks {index.number_of_files} files ({index.total_size} bytes), "
+            f"up to {index.get_bytes_to_fetch(self.dvc_fetch_options.cache_directory)} bytes to fetch"
+        )
+        pull_result = fetcher.pull(jobs)
+        fetcher.close()
+        if is_err(pull_result):
+            raise Exception(pull_result.err_value)
+        print(f"dvc fetched {pull_result.ok_value.get('fetched', 0)} files")
 
-    def get_dvc_files(self):
-        fs = DVCFileSystem(self.get_local_repo_folder())
-        dvc_files = fs.find("/", detail=False, dvc_only=True)
-        if len(dvc_files) > 0:
-            r = dvc_repo.Repo(fs.repo.root_dir)
-            r.pull()
+    def get_tar_ball(self) -> Tarball:
+        repo_dir = self.get_local_repo_folder()
+        return Tarball(
+            source_directory=repo_dir,
+            name="pipeline",
+            destination_directory="/tmp",
+            compression_threads=0,
+            reproducible=True,
+        )
+
+    def get_incremental_tar_ball(self) -> Incremental_Tarball:
+        return Incremental_Tarball(
+            source_directory=self.get_local_repo_folder(),
+            name="pipeline",
+            cache_key=f"{self.github_organization.value}_{self.git_repo_name}",
+            repo_path=self.git_repo_path,
+        )
 
     def produce_tar_ball(self) -> Result[TarFile, str]:
-        repo_dir = self.get_local_repo_folder()
-        tarball = Tarball(
-            source_directory=repo_dir, name="pipeline", destination_directory="/tmp"
+        return self.get_tar_ball().create()
+
+    def get_archive_tar_ball(self) -> GitHub_Archive_Tarball:
+        return GitHub_Archive_Tarball(git_repo=self, name="pipeline")
+
+    def _get_api_base(self) -> str:
+        return f"https://api.github.com/repos/{self.github_organization.value}/{self.git_repo_name}"
+
+    def open_archive(self, ref: str) -> requests.Response:
+        """
+        Streams the tar.gz GitHub builds of the repo at ref over the shared
+        keep-alive session. The archive has a single top level folder.
+        """
+        if not self.github_auth:
+            raise Exception(
+                f"No Github Auth is provided to download the archive of {self.git_repo_name}"
+            )
+        endpoint = f"{self._get_api_base()}/tarball/{ref}"
+        response = (
+            Requests_Wrapper.get_shared_instance()
+            .get_session(endpoint)
+            .get(
+                endpoint,
+                auth=HTTPBasicAuth(
+                    self.github_auth.username,
+                    self.github_auth.secret.get_secret_value(),
+                ),
+                verify=GITHUB_CA_BUNDLE if os.path.exists(GITHUB_CA_BUNDLE) else True,
+                stream=True,
+                timeout=(10, 300),
+            )
+        )
+        if response.status_code != 200:
+            response.close()
+            raise Exception(
+                f"error downloading the archive of {self.git_repo_name} at {ref}. Status: {response.status_code}"
+            )
+        return response
+
+    def _is_in_archive_scope(self, name: str, is_dir: bool) -> bool:
+        return is_in_repo_path_scope(name, is_dir, self.git_repo_path)
+
+    def _is_dvc_path_in_scope(self, path: str) -> bool:
+        # a .dvc folder, .dvc file or dvc.lock in a packaged folder, or in a
+        # folder above git_repo_path (dvc init --subdir)
+        if not self.git_repo_path:
+            return True
+        folder = os.path.dirname(path)
+        repo_path = self.git_repo_path.strip("/")
+        return (
+            folder == ""
+            or folder == repo_path
+            or folder.startswith(repo_path + "/")
+            or repo_path.startswith(folder + "/")
         )
-        return tarball.create()
+
+    def iter_archive_members(
+        self, archive: TarFile
+    ) -> Iterator[Tuple[tarfile.TarInfo, Optional[Any]]]:
+        """
+        Members of a GitHub archive opened in stream mode, renamed relative
+        to the repo root and limited to git_repo_path (and the files at the
+        root of the repo) when one is set. File contents have to be read
+        before moving on to the next member.
+        """
+        for member in archive:
+            parts = member.name.split("/", 1)
+            if len(parts) < 2 or not parts[1].strip("/"):
+                continue
+            member.name = parts[1].rstrip("/")
+            # a pax path header would win over the new name when re-packed
+            member.pax_headers = {}
+            if not (member.isfile() or member.isdir() or member.issym()):
+                continue
+            if not self._is_in_archive_scope(member.name, member.isdir()):
+                continue
+            yield member, archive.extractfile(member) if member.isfile() else None
+
+    def download_archive(self) -> Result[str, str]:
+        """
+        Fills the local repo folder from the GitHub archive of the resolved
+        commit instead of cloning. There is no .git folder afterwards, so this
+        is only an option for repos without dvc data.
+        """
+        sha_result = self.get_commit_sha()
+        if is_err(sha_result):
+            return sha_result
+        folder = self.get_local_repo_folder()
+        try:
+            with self.open_archive(sha_result.ok_value) as response:
+                with tarfile.open(
+                    fileobj=response.raw, mode="r|gz", bufsize=ARCHIVE_BUFFER_SIZE
+                ) as archive:
+                    for member, _ in self.iter_archive_members(archive):
+                        archive.extract(
+                            member,
+                            folder,
+                            set_attrs=False,
+                            # refuses links and paths that leave the folder
+                            **(
+                                {"filter": "data"}
+                                if hasattr(tarfile, "data_filter")
+                                else {}
+                            ),
+                        )
+            return Ok(folder)
+        except Exception as e:
+            return Err(
+                f"Downloading the archive of {self.git_repo_name} failed with error {str(e)}"
+            )
+
+    def has_dvc_config(self) -> Result[bool, str]:
+        """
+        Whether dvc tracks anything the registration packages at the resolved
+        commit: a .dvc folder, .dvc file or dvc.lock at the root, under
+        git_repo_path or in a folder between them. Asked of the git trees api
+        in one call, so nothing has to be cloned. The entries are matched with
+        is_dvc_file_name, like find_dvc_marker does for a cloned folder. A
+        truncated listing counts as dvc, which only costs a clone.
+        """
+        sha_result = self.get_commit_sha()
+        if is_err(sha_result):
+            return sha_result
+        response = self._call_github_api(
+            Http_Method.GET,
+            f"{self._get_api_base()}/git/trees/{sha_result.ok_value}?recursive=1",
+        )
+        if response.status_code == 200:
+            body = response.json()
+            if body.get("truncated"):
+                return Ok(True)
+            return Ok(
+                any(
+                    is_dvc_file_name(os.path.basename(entry["path"]))
+                    and self._is_dvc_path_in_scope(entry["path"])
+                    for entry in body.get("tree", [])
+                )
+            )
+        else:
+            return Err(
+                f"error checking {self.git_repo_name} for dvc. Status: {response.status_code}"
+            )
 
     def _call_github_api(
-        self, http_method: Http_Method, endpoint: str
+        self,
+        http_method: Http_Method,
+        endpoint: str,
+        headers: Optional[Dict[str, str]] = None,
     ) -> requests.Response:
         if http_method == Http_Method.GET:
             if self.github_auth:
+                session = Requests_Wrapper.get_shared_instance().get_session(endpoint)
                 try:
-                    r = requests.get(
+                    r = session.get(
                         endpoint,
                         auth=HTTPBasicAuth(
                             self.github_auth.username,
                             self.github_auth.secret.get_secret_value(),
                         ),
-                        verify="/etc/pki/tls/certs/ca-bundle.crt",
+                        headers=headers,
+                        verify=GITHUB_CA_BUNDLE,
                         timeout=2,
                     )
                 except OSError:
-                    r = requests.get(
+                    r = session.get(
                         endpoint,
                         auth=HTTPBasicAuth(
                             self.github_auth.username,
                             self.github_auth.secret.get_secret_value(),
                         ),
+                        headers=headers,
                         timeout=2,
                     )
                 return r
@@ -184,38 +571,73 @@ class GitHub_Repo(object):
                 f"{http_method.value} is Not yet implemented for Git Http actions"
             )
 
-    def _get_commit_sha_from_tag(self) -> Result[str, str]:
-        endpoint = f"https://api.github.com/repos/{self.github_organization.value}/{self.git_repo_name}/commits/tags/{self.tag}"
-        response = self._call_github_api(Http_Method.GET, endpoint)
-        print(response.json())
-        if response.status_code == 200:
-            return Ok(response.json()["sha"])
+    def _get_commit_sha_from_endpoint(
+        self,
+        endpoint: str,
+        ref_description: str,
+        get_sha: Callable[[Dict[str, Any]], str],
+        etag_cache: Optional[TTL_Cache],
+    ) -> Result[str, str]:
+        cached = etag_cache.get(endpoint) if etag_cache else None
+        response = self._call_github_api(
+            Http_Method.GET,
+            endpoint,
+            headers={"If-None-Match": cached["etag"]} if cached else None,
+        )
+        if response.status_code == 304 and cached:
+            return Ok(cached["sha"])
+        elif response.status_code == 200:
+            sha = get_sha(response.json())
+            if etag_cache and response.headers.get("ETag"):
+                etag_cache.set(endpoint, {"etag": response.headers["ETag"], "sha": sha})
+            return Ok(sha)
         else:
             return Err(
-                f"error getting commit sha for repo {self.git_repo_name} and tag {self.tag}. Error: {response.json()['message']}"
+                f"error getting commit sha for repo {self.git_repo_name} and {ref_description}. Error: {response.json()['message']}"
             )
 
-    def _get_commit_sha_from_branch(self) -> Result[str, str]:
+    def _get_commit_sha_from_tag(
+        self, etag_cache: Optional[TTL_Cache] = None
+    ) -> Result[str, str]:
+        endpoint = f"https://api.github.com/repos/{self.github_organization.value}/{self.git_repo_name}/commits/tags/{self.tag}"
+        return self._get_commit_sha_from_endpoint(
+            endpoint, f"tag {self.tag}", lambda body: body["sha"], etag_cache
+        )
+
+    def _get_commit_sha_from_branch(
+        self, etag_cache: Optional[TTL_Cache] = None
+    ) -> Result[str, str]:
         owner = self.github_organization.value
         repo = self.git_repo_name
         branch = self.git_repo_branch
 
         endpoint = f"https://api.github.com/repos/{owner}/{repo}/branches/{branch}"
-        response = self._call_github_api(Http_Method.GET, endpoint)
-        if response.status_code == 200:
-            return Ok(response.json()["commit"]["sha"])
+        return self._get_commit_sha_from_endpoint(
+            endpoint,
+            f"branch {self.git_repo_branch}",
+            lambda body: body["commit"]["sha"],
+            etag_cache,
+        )
+
+    def resolve_commit_sha(
+        self, etag_cache: Optional[TTL_Cache] = None
+    ) -> Result[str, str]:
+        """
+        Asks GitHub for the sha of the tag or branch, conditionally when
+        etag_cache has seen the same request before.
+        """
+        if self.tag:
+            return self._get_commit_sha_from_tag(etag_cache)
         else:
-            return Err(
-                f"error getting commit sha for repo {self.git_repo_name} and branch {self.git_repo_branch}. Error: {response.json()['message']}"
-            )
+            return self._get_commit_sha_from_branch(etag_cache)
 
     def get_commit_sha(self) -> Result[str, str]:
         if self.commit_sha:
             return Ok(self.commit_sha)
-        elif self.tag:
-            return self._get_commit_sha_from_tag()
+        elif self.sha_resolver:
+            return self.sha_resolver.resolve(self)
         else:
-            return self._get_commit_sha_from_branch()
+            return self.resolve_commit_sha(get_shared_github_etag_cache())
 
     @classmethod
     def get_from_inputs(
@@ -226,6 +648,8 @@ class GitHub_Repo(object):
         commit_sha: Optional[str] = None,
         tag: Optional[str] = None,
         github_auth: Optional[GitHub_Auth] = None,
+        clone_options: Optional[Git_Clone_Options] = None,
+        mirror_cache: Optional[Git_Mirror_Cache] = None,
     ) -> GitHub_Repo:
         url_components = git_repo_url.split("/")
         org = url_components[3].lower()
@@ -252,10 +676,79 @@ class GitHub_Repo(object):
             tag=tag,
             github_auth=github_auth,
             github_organization=GitHub_Organization(org),
+            clone_options=clone_options if clone_options else Git_Clone_Options(),
+            mirror_cache=(
+                mirror_cache if mirror_cache else get_shared_git_mirror_cache()
+            ),
         )
         return instance
 
 
+@define
+class GitHub_Archive_Tarball(object):
+    """
+    The pipeline tarball built from the GitHub archive of the resolved commit
+    rather than from a clone. Members are re-packed on the fly (renamed
+    relative to the repo root, normalized like a reproducible Tarball), so
+    the archive can be streamed into s3 without touching the disk.
+    """
+
+    git_repo: GitHub_Repo = field()
+    name: str = field(default="pipeline")
+    compression_level: int = field(default=6)
+    # 0 uses every core
+    compression_threads: int = field(default=0)
+
+    @property
+    def source_directory(self) -> str:
+        return self.git_repo._get_api_base() + "/tarball"
+
+    def get_digest(self) -> Result[str, str]:
+        """
+        The archive of a commit never changes, so the commit and the packaged
+        path identify the contents without downloading anything.
+        """
+        sha_result = self.git_repo.get_commit_sha()
+        if is_err(sha_result):
+            return sha_result
+        return Ok(
+            hashlib.sha256(
+                f"github-archive:{sha_result.ok_value}:{self.git_repo.git_repo_path or ''}".encode()
+            ).hexdigest()
+        )
+
+    def write_to(self, fileobj) -> Result[str, str]:
+        """
+        Writes the re-packed tar.gz to fileobj (only write() is used) and
+        returns the commit it was built from.
+        """
+        sha_result = self.git_repo.get_commit_sha()
+        if is_err(sha_result):
+            return sha_result
+        try:
+            with self.git_repo.open_archive(sha_result.ok_value) as response:
+                with tarfile.open(
+                    fileobj=response.raw, mode="r|gz", bufsize=ARCHIVE_BUFFER_SIZE
+                ) as archive:
+                    compressed = open_compressed_writer(
+                        fileobj,
+                        Compression_Format.GZIP,
+                        self.compression_level,
+                        self.compression_threads,
+                        mtime=0,
+                    )
+                    tar = tarfile.open(
+                        fileobj=compressed, mode="w|", bufsize=ARCHIVE_BUFFER_SIZE
+                    )
+                    for member, contents in self.git_repo.iter_archive_members(archive):
+                        tar.addfile(normalize_tarinfo(member), contents)
+                    tar.close()
+                    compressed.close()
+            return Ok(sha_result.ok_value)
+        except Exception as e:
+            return Err("tarball creation failed with error " + str(e))
+
+
 @define
 class GitHub_Interactor(object):
     # github_client_credential: Any = field()
@@ -274,10 +767,7 @@ class GitHub_Interactor(object):
         boolean
             if the repo is a DVC repo. This result is later used to do post processing.
         """
-        for file in os.listdir(repo_dir):
-            if file.endswith(".dvc"):
-                return True
-        return False
+        return is_dvc_repo(repo_dir)
 
     def clone_repo(
         self, git_repo: GitHub_Repo, parent_folder: str
@@ -300,23 +790,10 @@ class GitHub_Interactor(object):
 
     def get_tarball(
         self, local_folder: str, git_repo: GitHub_Repo, branch: Optional[str] = None
-    ):
-        if branch:
-            br = branch
-        else:
-            br = git_repo.git_repo_branch
-
-        if is_ok(git_repo.repo_url_with_auth):
-            url = f"{git_repo.repo_url_with_auth.ok_value.get_secret_value()}/archive/{br}.tar.gz"
-        else:
-            raise Exception("error")
-
-        local_path = os.path.join(
-            local_folder, f"{git_repo.git_repo_name}-{git_repo.git_repo_branch}.tar.gz"
-        )
-        with requests.get(url=url) as response:
-            response.raise_for_status()
-            print(response.status_code)
+    ) -> str:
+        br = branch if branch else git_repo.git_repo_branch
+        local_path = os.path.join(local_folder, f"{git_repo.git_repo_name}-{br}.tar.gz")
+        with git_repo.open_archive(br) as response:
             with open(local_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                shutil.copyfileobj(response.raw, f, ARCHIVE_BUFFER_SIZE)
+        return local_path
@@ -0,0 +1,172 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import fcntl
+import os
+import shutil
+from attrs import define, field
+from git import Repo
+from result import Err, Ok, Result
+from typing import Iterator, List, Optional
+
+GiB = 1024 * 1024 * 1024
+ALL_BRANCHES_AND_TAGS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+@define
+class Git_Mirror_Cache(object):
+    """
+    Bare mirrors of remote repos kept under cache_directory. Each clone
+    first fetches into the mirror, which only downloads what changed since
+    the last fetch, and then clones from the local mirror.
+
+    By default a mirror fetches every branch and tag with their full
+    history. Callers that only need one ref pass its refspec and a --depth,
+    so the first registration of a large repo costs about what a shallow
+    clone does. A --filter is not used: the mirror keeps no remote to fetch
+    missing blobs from later.
+    The remote url (which carries the github credentials) is only passed to
+    fetch and is never written into a mirror's config. Mirrors are locked
+    with flock, so several processes can share the directory. When the
+    mirrors outgrow max_size_bytes the least recently used ones are removed.
+    """
+
+    cache_directory: str = field(default="/tmp/mlcore_git_mirrors")
+    max_size_bytes: int = field(default=10 * GiB)
+
+    def get_mirror_path(self, key: str) -> str:
+        return os.path.join(self.cache_directory, f"{key}.git")
+
+    def _get_lock_path(self, key: str) -> str:
+        return os.path.join(self.cache_directory, f"{key}.lock")
+
+    @contextmanager
+    def _lock(
+        self, key: str, exclusive: bool = True, blocking: bool = True
+    ) -> Iterator[None]:
+        fd = os.open(self._get_lock_path(key), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(
+                fd,
+                (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                | (0 if blocking else fcntl.LOCK_NB),
+            )
+            yield
+        finally:
+            # closing the descriptor releases the lock
+            os.close(fd)
+
+    def _fetch(
+        self,
+        key: str,
+        url: str,
+        refspecs: Optional[List[str]] = None,
+        fetch_args: Optional[List[str]] = None,
+    ):
+        path = self.get_mirror_path(key)
+        if os.path.exists(path):
+            mirror = Repo(path)
+        else:
+            mirror = Repo.init(path, bare=True)
+            # lets clones from the mirror be shallow, partial or of a bare sha
+            mirror.git.config("uploadpack.allowFilter", "true")
+            mirror.git.config("uploadpack.allowAnySHA1InWant", "true")
+        fetch_args = list(fetch_args or [])
+        if os.path.exists(os.path.join(path, "shallow")) and not any(
+            arg.startswith("--depth") for arg in fetch_args
+        ):
+            # an earlier shallow fetch would otherwise cap the history of this one
+            fetch_args.append("--unshallow")
+        mirror.git.fetch(
+            url, "--prune", "--force", *fetch_args, *(refspecs or ALL_BRANCHES_AND_TAGS)
+        )
+        if refspecs:
+            return
+        # point HEAD at the default branch, so plain clones of the mirror check it out
+        for line in mirror.git.ls_remote("--symref", url, "HEAD").splitlines():
+            if line.startswith("ref: "):
+                mirror.git.symbolic_ref("HEAD", line[len("ref: ") :].split("\t")[0])
+
+    @contextmanager
+    def open_mirror(
+        self,
+        key: str,
+        url: str,
+        refspecs: Optional[List[str]] = None,
+        fetch_args: Optional[List[str]] = None,
+    ) -> Iterator[Result[str, str]]:
+        """
+        Brings the refspecs (all branches and tags by default) of the mirror
+        of url up to date and yields its path. The mirror is not evicted
+        while the with block runs.
+        """
+        os.makedirs(self.cache_directory, exist_ok=True)
+        try:
+            with self._lock(key):
+                self._fetch(key, url, refspecs, fetch_args)
+                os.utime(self._get_lock_path(key))
+        except Exception as e:
+            # git's error messages contain the command line, and with it the url
+            yield Err(
+                f"Updating the mirror of {key} failed with error "
+                + str(e).replace(url, "<repo url>")
+            )
+            return
+        self.evict(keep=[key])
+        with self._lock(key, exclusive=False):
+            yield Ok(self.get_mirror_path(key))
+
+    def _get_keys(self) -> List[str]:
+        if not os.path.isdir(self.cache_directory):
+            return []
+        return [
+            file_name[: -len(".git")]
+            for file_name in os.listdir(self.cache_directory)
+            if file_name.endswith(".git")
+        ]
+
+    def _get_size(self, key: str) -> int:
+        size = 0
+        for root, _, files in os.walk(self.get_mirror_path(key)):
+            for file_name in files:
+                try:
+                    size = size + os.lstat(os.path.join(root, file_name)).st_size
+                except OSError:
+                    pass
+        return size
+
+    def _get_last_used(self, key: str) -> float:
+        try:
+            return os.path.getmtime(self._get_lock_path(key))
+        except OSError:
+            return 0
+
+    def evict(self, keep: Optional[List[str]] = None) -> List[str]:
+        """
+        Removes least recently used mirrors until the cache fits in
+        max_size_bytes. Mirrors in keep or in use are skipped.
+        """
+        keep = keep or []
+        keys = sorted(self._get_keys(), key=self._get_last_used)
+        sizes = {key: self._get_size(key) for key in keys}
+        total = sum(sizes.values())
+        evicted = []
+        for key in keys:
+            if total <= self.max_size_bytes:
+                break
+            if key in keep:
+                continue
+            try:
+                with self._lock(key, blocking=False):
+                    shutil.rmtree(self.get_mirror_path(key), ignore_errors=True)
+            except BlockingIOError:
+                continue
+            total = total - sizes[key]
+            evicted.append(key)
+        return evicted
+
+
+_shared_mirror_cache = Git_Mirror_Cache()
+
+
+def get_shared_git_mirror_cache() -> Git_Mirror_Cache:
+    return _shared_mirror_cache
@@ -0,0 +1,453 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import stat
+import struct
+import tarfile
+import tempfile
+import time
+import zlib
+from attrs import define, field
+from result import Err, Ok, Result, is_err
+from typing import Callable, Dict, Iterator, List, Optional
+
+from mlcore_utils.model.file import is_in_repo_path_scope, normalize_tarinfo
+
+# two zero blocks end a tar archive
+END_OF_ARCHIVE = b"\0" * (2 * tarfile.BLOCKSIZE)
+COPY_BUFFER_SIZE = 1024 * 1024
+# s3 object metadata that holds the digest of the uploaded tarball
+TARBALL_DIGEST_METADATA_KEY = "content-digest"
+# deflate, no flags, mtime 0, no extra flags, unknown os
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# uncompressed length and crc32 in front of the raw deflate data of a chunk
+CHUNK_HEADER = struct.Struct("<QI")
+CRC32_POLYNOMIAL = 0xEDB88320
+
+
+def _gf2_matrix_times(matrix: List[int], vector: int) -> int:
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i = i + 1
+    return result
+
+
+def _gf2_matrix_square(matrix: List[int]) -> List[int]:
+    return [_gf2_matrix_times(matrix, row) for row in matrix]
+
+
+def _get_crc32_zero_operators() -> List[List[int]]:
+    # operator k appends 2**k zero bytes to a crc, as in zlib's crc32_combine
+    operator = [CRC32_POLYNOMIAL] + [1 << n for n in range(31)]
+    for _ in range(3):
+        operator = _gf2_matrix_square(operator)
+    operators = [operator]
+    for _ in range(63):
+        operators.append(_gf2_matrix_square(operators[-1]))
+    return operators
+
+
+_crc32_zero_operators: List[List[int]] = []
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """
+    crc32 of a + b from crc32(a), crc32(b) and len(b).
+    """
+    if not _crc32_zero_operators:
+        _crc32_zero_operators.extend(_get_crc32_zero_operators())
+    k = 0
+    while length2:
+        if length2 & 1:
+            crc1 = _gf2_matrix_times(_crc32_zero_operators[k], crc1)
+        length2 >>= 1
+        k = k + 1
+    return crc1 ^ crc2
+
+
+@define
+class Tarball_Entry(object):
+    arcname: str = field()
+    path: str = field()
+    size: int = field()
+    mtime_ns: int = field()
+    # sha256 of the file contents, empty for directories and links
+    content_digest: str = field()
+    # sha256 of the tar header plus content, names the compressed chunk
+    chunk_digest: str = field(default="")
+
+
+@define
+class Tarball_Scan(object):
+    entries: List[Tarball_Entry] = field()
+    digest: str = field()
+
+
+@define
+class Tarball_Build_Summary(object):
+    digest: str = field()
+    number_of_entries: int = field()
+    reused_chunks: int = field()
+    new_chunks: int = field()
+    bytes_written: int = field()
+
+
+@define
+class Incremental_Tarball(object):
+    """
+    tar.gz of a folder that is built from one compressed chunk per file. The
+    chunks are kept in cache_directory, named by the digest of their tar
+    header and contents, so files that did not change since the last build
+    are neither re-read nor re-compressed (a size/mtime match against the
+    previous manifest skips the hashing too).
+
+    Like pigz, a chunk is raw deflate data ending in a sync flush, so the
+    chunks join into one deflate stream. The archive is a single gzip member:
+    one header, the chunks, a final block and a trailer whose crc32 is
+    combined from the crcs stored with the chunks.
+
+    Headers are normalized the way a reproducible Tarball's are, since a
+    fresh clone gives every file a new mtime and the chunks could never be
+    reused otherwise.
+    Like Tarball, only the non hidden top level entries of the folder are
+    included, and with a repo_path only the ones is_in_repo_path_scope
+    keeps, the same tree the GitHub archive path packages. The digest of a build only depends on the paths, modes and
+    contents of its files.
+
+    Builds of different branches or commits of a repo share its cache
+    folder. A build holds a shared flock on the folder, and chunks are only
+    pruned under an exclusive one (skipped while another build runs), once
+    no build has used them for max_unused_chunk_seconds.
+    """
+
+    source_directory: str = field()
+    name: str = field()
+    cache_directory: str = field(default="/tmp/mlcore_tarball_cache")
+    compression_level: int = field(default=6)
+    max_workers: int = field(default=4)
+    # separates the caches of different repos that all build a "pipeline"
+    cache_key: Optional[str] = field(default=None)
+    max_unused_chunk_seconds: float = field(default=7 * 24 * 60 * 60)
+    repo_path: Optional[str] = field(default=None)
+
+    def _get_cache_folder(self) -> str:
+        return os.path.join(self.cache_directory, self.cache_key or self.name)
+
+    @contextmanager
+    def _lock(self, exclusive: bool, blocking: bool = True) -> Iterator[None]:
+        os.makedirs(self._get_cache_folder(), exist_ok=True)
+        fd = os.open(
+            os.path.join(self._get_cache_folder(), "cache.lock"), os.O_CREAT | os.O_RDWR
+        )
+        try:
+            fcntl.flock(
+                fd,
+                (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                | (0 if blocking else fcntl.LOCK_NB),
+            )
+            yield
+        finally:
+            # closing the descriptor releases the lock
+            os.close(fd)
+
+    def _get_manifest_path(self) -> str:
+        return os.path.join(self._get_cache_folder(), "manifest.json")
+
+    def _get_chunk_path(self, chunk_digest: str) -> str:
+        return os.path.join(
+            self._get_cache_folder(), "chunks", f"{chunk_digest}.deflate"
+        )
+
+    def _read_previous_manifest(self) -> Dict[str, Tarball_Entry]:
+        try:
+            with open(self._get_manifest_path(), "r") as f:
+                return {e["arcname"]: Tarball_Entry(**e) for e in json.load(f)}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _write_manifest(self, entries: List[Tarball_Entry]):
+        path = self._get_manifest_path()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                [
+                    {
+                        "arcname": e.arcname,
+                        "path": e.path,
+                        "size": e.size,
+                        "mtime_ns": e.mtime_ns,
+                        "content_digest": e.content_digest,
+                        "chunk_digest": e.chunk_digest,
+                    }
+                    for e in entries
+                ],
+                f,
+            )
+        os.replace(tmp_path, path)
+
+    def _list_paths(self) -> List[tuple]:
+        paths = []
+        for top in sorted(glob.glob(os.path.join(self.source_directory, "*"))):
+            arc_top = os.path.basename(top)
+            paths.append((top, arc_top))
+            if os.path.isdir(top) and not os.path.islink(top):
+                for root, dirs, files in os.walk(top):
+                    relative_root = os.path.relpath(root, self.source_directory)
+                    # folders out of scope are not walked at all
+                    dirs[:] = sorted(
+                        d
+                        for d in dirs
+                        if is_in_repo_path_scope(
+                            os.path.join(relative_root, d), True, self.repo_path
+                        )
+                    )
+                    in_scope_files = [
+                        f
+                        for f in sorted(files)
+                        if is_in_repo_path_scope(
+                            os.path.join(relative_root, f), False, self.repo_path
+                        )
+                    ]
+                    for name in dirs + in_scope_files:
+                        paths.append(
+                            (
+                                os.path.join(root, name),
+                                os.path.join(relative_root, name),
+                            )
+                        )
+        return paths
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _get_tarinfo(entry: Tarball_Entry) -> tarfile.TarInfo:
+        # built by hand rather than with TarFile.gettarinfo, which would record
+        # owners, mtimes and hardlinks between files
+        file_stat = os.lstat(entry.path)
+        tarinfo = tarfile.TarInfo(entry.arcname)
+        tarinfo.mode = stat.S_IMODE(file_stat.st_mode)
+        if stat.S_ISLNK(file_stat.st_mode):
+            tarinfo.type = tarfile.SYMTYPE
+            tarinfo.linkname = os.readlink(entry.path)
+        elif stat.S_ISDIR(file_stat.st_mode):
+            tarinfo.type = tarfile.DIRTYPE
+        elif stat.S_ISREG(file_stat.st_mode):
+            tarinfo.size = entry.size
+        else:
+            raise Exception(f"{entry.path} is not a file, folder or link")
+        return normalize_tarinfo(tarinfo)
+
+    def _get_header(self, entry: Tarball_Entry) -> bytes:
+        return self._get_tarinfo(entry).tobuf(
+            tarfile.PAX_FORMAT, tarfile.ENCODING, "surrogateescape"
+        )
+
+    def _scan_entry(
+        self, path: str, arcname: str, previous: Optional[Tarball_Entry]
+    ) -> Tarball_Entry:
+        file_stat = os.lstat(path)
+        is_regular_file = stat.S_ISREG(file_stat.st_mode)
+        size = file_stat.st_size if is_regular_file else 0
+        if not is_regular_file:
+            content_digest = ""
+        elif (
+            previous
+            and previous.size == size
+            and previous.mtime_ns == file_stat.st_mtime_ns
+        ):
+            content_digest = previous.content_digest
+        else:
+            content_digest = self._hash_file(path)
+        entry = Tarball_Entry(
+            arcname=arcname,
+            path=path,
+            size=size,
+            mtime_ns=file_stat.st_mtime_ns,
+            content_digest=content_digest,
+        )
+        entry.chunk_digest = hashlib.sha256(
+            self._get_header(entry) + content_digest.encode()
+        ).hexdigest()
+        return entry
+
+    def scan(self) -> Result[Tarball_Scan, str]:
+        try:
+            previous = self._read_previous_manifest()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                entries = list(
+                    pool.map(
+                        lambda p: self._scan_entry(p[0], p[1], previous.get(p[1])),
+                        self._list_paths(),
+                    )
+                )
+            digest = hashlib.sha256()
+            for entry in entries:
+                digest.update(f"{entry.chunk_digest}\n".encode())
+            return Ok(Tarball_Scan(entries=entries, digest=digest.hexdigest()))
+        except Exception as e:
+            return Err(f"Scanning {self.source_directory} failed with error {str(e)}")
+
+    def _write_chunk(self, entry: Tarball_Entry):
+        chunk_path = self._get_chunk_path(entry.chunk_digest)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(chunk_path), suffix=".tmp")
+        compressor = zlib.compressobj(
+            self.compression_level, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        crc = 0
+        length = 0
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                raw.write(b"\0" * CHUNK_HEADER.size)
+
+                def _write(data: bytes):
+                    nonlocal crc, length
+                    crc = zlib.crc32(data, crc)
+                    length = length + len(data)
+                    raw.write(compressor.compress(data))
+
+                _write(self._get_header(entry))
+                if entry.content_digest:
+                    self._write_contents(entry, _write)
+                # byte aligned and not final, so the next chunk can follow it
+                raw.write(compressor.flush(zlib.Z_SYNC_FLUSH))
+                raw.seek(0)
+                raw.write(CHUNK_HEADER.pack(length, crc))
+            os.replace(tmp_path, chunk_path)
+        except BaseException:
+            # the chunk is named by the scanned contents, never cache other ones
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _write_contents(entry: Tarball_Entry, write: Callable[[bytes], None]):
+        digest = hashlib.sha256()
+        copied = 0
+        with open(entry.path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+                write(block[: max(0, entry.size - copied)])
+                digest.update(block)
+                copied = copied + len(block)
+        # the header already holds entry.size, and the chunk name content_digest
+        if copied != entry.size or digest.hexdigest() != entry.content_digest:
+            raise Exception(f"{entry.path} changed while it was archived")
+        remainder = entry.size % tarfile.BLOCKSIZE
+        if remainder:
+            write(b"\0" * (tarfile.BLOCKSIZE - remainder))
+
+    def write_to(
+        self, fileobj, scan: Optional[Tarball_Scan] = None
+    ) -> Result[Tarball_Build_Summary, str]:
+        """
+        Writes the tar.gz to fileobj (only write() is used), compressing only
+        the files that have no chunk in the cache yet.
+        """
+        if scan is None:
+            scan_result = self.scan()
+            if is_err(scan_result):
+                return scan_result
+            scan = scan_result.ok_value
+        try:
+            with self._lock(exclusive=False):
+                summary = self._write_chunks_to(fileobj, scan)
+            self._remove_unused_chunks(scan)
+            return Ok(summary)
+        except Exception as e:
+            return Err("tarball creation failed with error " + str(e))
+
+    def _write_chunks_to(self, fileobj, scan: Tarball_Scan) -> Tarball_Build_Summary:
+        os.makedirs(os.path.dirname(self._get_chunk_path("x")), exist_ok=True)
+        missing = {}
+        for entry in scan.entries:
+            chunk_path = self._get_chunk_path(entry.chunk_digest)
+            if os.path.exists(chunk_path):
+                # marks the chunk as used, pruning goes by its mtime
+                os.utime(chunk_path)
+            else:
+                missing[entry.chunk_digest] = entry
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(self._write_chunk, missing.values()))
+
+        fileobj.write(GZIP_HEADER)
+        bytes_written = len(GZIP_HEADER)
+        crc = 0
+        length = 0
+        for entry in scan.entries:
+            with open(self._get_chunk_path(entry.chunk_digest), "rb") as chunk:
+                chunk_length, chunk_crc = CHUNK_HEADER.unpack(
+                    chunk.read(CHUNK_HEADER.size)
+                )
+                crc = crc32_combine(crc, chunk_crc, chunk_length)
+                length = length + chunk_length
+                for block in iter(lambda: chunk.read(COPY_BUFFER_SIZE), b""):
+                    fileobj.write(block)
+                    bytes_written = bytes_written + len(block)
+        compressor = zlib.compressobj(
+            self.compression_level, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        # the final deflate block, then the gzip trailer of the whole stream
+        trailer = compressor.compress(END_OF_ARCHIVE) + compressor.flush()
+        trailer = trailer + struct.pack(
+            "<II",
+            zlib.crc32(END_OF_ARCHIVE, crc),
+            (length + len(END_OF_ARCHIVE)) & 0xFFFFFFFF,
+        )
+        fileobj.write(trailer)
+        bytes_written = bytes_written + len(trailer)
+
+        self._write_manifest(scan.entries)
+        return Tarball_Build_Summary(
+            digest=scan.digest,
+            number_of_entries=len(scan.entries),
+            reused_chunks=len(scan.entries) - len(missing),
+            new_chunks=len(missing),
+            bytes_written=bytes_written,
+        )
+
+    def _remove_unused_chunks(self, scan: Tarball_Scan):
+        chunk_folder = os.path.dirname(self._get_chunk_path("x"))
+        used = {
+            os.path.basename(self._get_chunk_path(e.chunk_digest)) for e in scan.entries
+        }
+        unused_since = time.time() - self.max_unused_chunk_seconds
+        try:
+            with self._lock(exclusive=True, blocking=False):
+                for file_name in os.listdir(chunk_folder):
+                    path = os.path.join(chunk_folder, file_name)
+                    try:
+                        if (
+                            file_name not in used
+                            and os.path.getmtime(path) < unused_since
+                        ):
+                            os.remove(path)
+                    except OSError:
+                        pass
+        except BlockingIOError:
+            # another build is reading chunks, the next build prunes
+            pass
+
+    def create(
+        self, destination_directory: str = "/tmp"
+    ) -> Result[Tarball_Build_Summary, str]:
+        tarball_path = os.path.join(destination_directory, f"{self.name}.tar.gz")
+        with open(tarball_path, "wb") as f:
+            return self.write_to(f)
+
+    def clear_cache(self):
+        shutil.rmtree(self._get_cache_folder(), ignore_errors=True)
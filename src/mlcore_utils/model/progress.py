@@ -0,0 +1,184 @@
+from __future__ import annotations
+import threading
+import time
+from attrs import define, field
+from typing import Any, Callable, List, Optional
+
+MiB = 1024 * 1024
+
+
+@define
+class Progress_Snapshot(object):
+    tag: str = field()
+    bytes_done: int = field()
+    total_bytes: Optional[int] = field()
+    elapsed_seconds: float = field()
+    # smoothed over the recent reports, so one slow part does not swing it
+    bytes_per_second: float = field()
+    eta_seconds: Optional[float] = field()
+    is_final: bool = field(default=False)
+
+    @property
+    def percentage(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(100.0, self.bytes_done * 100.0 / self.total_bytes)
+
+    def describe(self) -> str:
+        done = f"{self.bytes_done / MiB:.1f} MiB"
+        if self.percentage is not None:
+            done = (
+                f"{self.percentage:.1f}% ({done} of {self.total_bytes / MiB:.1f} MiB)"
+            )
+        message = (
+            f"{self.tag} Progress: {done} at {self.bytes_per_second / MiB:.1f} MiB/s"
+        )
+        if self.is_final:
+            return message + f" in {self.elapsed_seconds:.1f}s"
+        if self.eta_seconds is not None:
+            message = message + f", eta {self.eta_seconds:.0f}s"
+        return message
+
+
+@define
+class Progress_Reporter(object):
+    """
+    Byte count callback for s3 transfers (boto3 Callback= or the
+    progress_callback of the uploaders in s3_upload).
+
+    The callback runs on every upload thread for every chunk, so it only adds
+    to a counter owned by the calling thread, no lock is taken. The counters
+    are summed when a report is due: every report_interval_seconds, or when
+    about report_every_percent of total_bytes was counted since the last
+    report, estimated as the calling thread's count times the number of
+    threads. The estimate and the unlocked counters make threshold reports
+    approximate.
+    Reports go to the logger and, when given, to metrics_sink. Only
+    one thread builds a report at a time, the others skip it instead of
+    waiting. Call finish() once the transfer is done for the final report.
+    """
+
+    tag: str = field()
+    total_bytes: Optional[int] = field(default=None)
+    logger: Any = field(default=None)
+    metrics_sink: Optional[Callable[[Progress_Snapshot], None]] = field(default=None)
+    report_interval_seconds: float = field(default=5.0)
+    report_every_percent: float = field(default=5.0)
+    # weight of the latest interval in the smoothed throughput
+    smoothing: float = field(default=0.3)
+    clock: Callable[[], float] = field(default=time.monotonic)
+    _local: threading.local = field(init=False, factory=threading.local)
+    # one [total, since last report] cell per thread that reported bytes
+    _cells: List[List[int]] = field(init=False, factory=list)
+    _cells_lock: threading.Lock = field(init=False, factory=threading.Lock)
+    _report_lock: threading.Lock = field(init=False, factory=threading.Lock)
+    _threshold_bytes: Optional[int] = field(init=False, default=None)
+    _started_at: float = field(init=False, default=0.0)
+    _next_report_at: float = field(init=False, default=0.0)
+    _last_report_at: float = field(init=False, default=0.0)
+    _last_report_bytes: int = field(init=False, default=0)
+    _bytes_per_second: Optional[float] = field(init=False, default=None)
+    _finished: bool = field(init=False, default=False)
+
+    def __attrs_post_init__(self):
+        if self.total_bytes and self.report_every_percent:
+            self._threshold_bytes = max(
+                1, int(self.total_bytes * self.report_every_percent / 100)
+            )
+        self._started_at = self.clock()
+        self._last_report_at = self._started_at
+        self._next_report_at = self._started_at + self.report_interval_seconds
+
+    def _get_cell(self) -> List[int]:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = [0, 0]
+            self._local.cell = cell
+            with self._cells_lock:
+                self._cells.append(cell)
+        return cell
+
+    def __call__(self, bytes_amount: int):
+        cell = self._get_cell()
+        cell[0] += bytes_amount
+        cell[1] += bytes_amount
+        if (
+            self._threshold_bytes is not None
+            # every thread counted about as much since the last report
+            and cell[1] * len(self._cells) >= self._threshold_bytes
+        ) or self.clock() >= self._next_report_at:
+            self._report()
+
+    @property
+    def bytes_done(self) -> int:
+        with self._cells_lock:
+            cells = list(self._cells)
+        return sum(cell[0] for cell in cells)
+
+    def _take_snapshot(self, now: float, is_final: bool) -> Progress_Snapshot:
+        with self._cells_lock:
+            cells = list(self._cells)
+        bytes_done = 0
+        for cell in cells:
+            bytes_done = bytes_done + cell[0]
+            # not atomic with the owner's +=, bytes added meanwhile may be
+            # dropped from the count since the last report (never from cell[0])
+            cell[1] = 0
+        elapsed = now - self._started_at
+        interval = now - self._last_report_at
+        if is_final:
+            bytes_per_second = bytes_done / elapsed if elapsed > 0 else 0.0
+        else:
+            if interval > 0:
+                recent = (bytes_done - self._last_report_bytes) / interval
+                self._bytes_per_second = (
+                    recent
+                    if self._bytes_per_second is None
+                    else self.smoothing * recent
+                    + (1 - self.smoothing) * self._bytes_per_second
+                )
+            bytes_per_second = self._bytes_per_second or 0.0
+        eta = None
+        if self.total_bytes and bytes_per_second > 0 and not is_final:
+            eta = max(0.0, self.total_bytes - bytes_done) / bytes_per_second
+        self._last_report_at = now
+        self._last_report_bytes = bytes_done
+        self._next_report_at = now + self.report_interval_seconds
+        return Progress_Snapshot(
+            tag=self.tag,
+            bytes_done=bytes_done,
+            total_bytes=self.total_bytes,
+            elapsed_seconds=elapsed,
+            bytes_per_second=bytes_per_second,
+            eta_seconds=eta,
+            is_final=is_final,
+        )
+
+    def _emit(self, snapshot: Progress_Snapshot):
+        if self.logger is not None:
+            self.logger.debug(snapshot.describe())
+        if self.metrics_sink is not None:
+            try:
+                self.metrics_sink(snapshot)
+            except Exception as e:
+                # a broken sink must not fail the transfer
+                if self.logger is not None:
+                    self.logger.warning(f"{self.tag} progress sink failed: {str(e)}")
+
+    def _report(self):
+        if not self._report_lock.acquire(blocking=False):
+            return
+        try:
+            if self._finished:
+                return
+            snapshot = self._take_snapshot(self.clock(), is_final=False)
+        finally:
+            self._report_lock.release()
+        self._emit(snapshot)
+
+    def finish(self) -> Progress_Snapshot:
+        with self._report_lock:
+            self._finished = True
+            snapshot = self._take_snapshot(self.clock(), is_final=True)
+        self._emit(snapshot)
+        return snapshot
@@ -0,0 +1,613 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import hashlib
+import io
+import math
+import os
+import queue
+import threading
+import time
+from attrs import define, field
+from botocore.config import Config
+from s3transfer.utils import ReadFileChunk
+from result import Err, Ok, Result, is_err, is_ok
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from mlcore_utils.model.file import Generator_To_FileLike
+
+MiB = 1024 * 1024
+# S3 limits for multipart uploads
+S3_MIN_PART_SIZE = 5 * MiB
+S3_MAX_PART_SIZE = 5 * 1024 * MiB
+S3_MAX_NUMBER_OF_PARTS = 10000
+# bigger parts gain no throughput, they only make a retried part cost more
+S3_UPLOAD_MAX_PART_SIZE = 64 * MiB
+
+# the pool has to be at least as big as the concurrency, or parts queue on connections
+S3_UPLOAD_MAX_CONCURRENCY = 32
+S3_UPLOAD_CLIENT_CONFIG = Config(
+    max_pool_connections=S3_UPLOAD_MAX_CONCURRENCY,
+    retries={"max_attempts": 10, "mode": "adaptive"},
+)
+
+
+@define
+class S3_Upload_Plan(object):
+    file_size: int = field()
+    part_size: int = field()
+    concurrency: int = field()
+
+    @property
+    def number_of_parts(self) -> int:
+        return max(1, math.ceil(self.file_size / self.part_size))
+
+    @property
+    def is_multipart(self) -> bool:
+        return self.number_of_parts > 1
+
+    @classmethod
+    def create(
+        cls,
+        file_size: int,
+        target_bytes_per_second: float = 400 * MiB,
+        bytes_per_second_per_connection: float = 25 * MiB,
+        min_part_size: int = 8 * MiB,
+        parts_per_connection: int = 4,
+        max_concurrency: int = S3_UPLOAD_MAX_CONCURRENCY,
+        max_part_size: int = S3_UPLOAD_MAX_PART_SIZE,
+    ) -> S3_Upload_Plan:
+        """
+        One S3 connection tops out well below the bandwidth of the host, so
+        the concurrency is what it takes to reach target_bytes_per_second.
+        Parts are sized so every connection gets a few of them (a slow part
+        then does not hold up the whole upload), but never smaller than
+        min_part_size, no bigger than max_part_size unless S3's part count
+        limit forces it.
+        """
+        concurrency = max(
+            1,
+            min(
+                max_concurrency,
+                math.ceil(target_bytes_per_second / bytes_per_second_per_connection),
+            ),
+        )
+        part_size = min(
+            math.ceil(file_size / (concurrency * parts_per_connection)), max_part_size
+        )
+        part_size = max(
+            part_size,
+            min_part_size,
+            S3_MIN_PART_SIZE,
+            math.ceil(file_size / S3_MAX_NUMBER_OF_PARTS),
+        )
+        # whole MiBs keep part boundaries stable between a failed upload and its resume
+        part_size = min(math.ceil(part_size / MiB) * MiB, S3_MAX_PART_SIZE)
+        plan = cls(file_size=file_size, part_size=part_size, concurrency=concurrency)
+        plan.concurrency = min(concurrency, plan.number_of_parts)
+        return plan
+
+
+@define
+class S3_Multipart_Uploader(object):
+    """
+    Uploads a file as parallel multipart parts over one (pooled) boto3
+    client. Parts are streamed from slices of the file, so memory does not
+    grow with the part size. A failed part is retried on its own. If the
+    upload still fails it is aborted, unless resume=True: then it is left
+    open on S3, and a later upload of the same file to the same key with
+    resume=True only sends the parts that are missing. S3 keeps (and bills)
+    the parts of an open upload until it is aborted, so only callers that
+    retry should resume, and buckets should also have an
+    AbortIncompleteMultipartUpload lifecycle rule.
+    """
+
+    s3_client: Any = field()
+    max_part_attempts: int = field(default=3)
+    retry_wait_seconds: float = field(default=1.0)
+
+    def find_resumable_upload(self, bucket: str, key: str) -> Optional[str]:
+        paginator = self.s3_client.get_paginator("list_multipart_uploads")
+        uploads = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=key):
+            uploads.extend(u for u in page.get("Uploads", []) if u["Key"] == key)
+        if not uploads:
+            return None
+        return max(uploads, key=lambda u: u["Initiated"])["UploadId"]
+
+    def _get_uploaded_parts(
+        self, bucket: str, key: str, upload_id: str
+    ) -> Dict[int, Dict[str, Any]]:
+        paginator = self.s3_client.get_paginator("list_parts")
+        parts = {}
+        for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = part
+        return parts
+
+    @staticmethod
+    def _open_part(filename: str, offset: int, size: int) -> ReadFileChunk:
+        return ReadFileChunk.from_filename(
+            filename, offset, size, enable_callbacks=False
+        )
+
+    def _is_part_reusable(
+        self, filename: str, offset: int, size: int, uploaded_part: Optional[Dict]
+    ) -> bool:
+        # the ETag of a part is its md5 (except with SSE-KMS, where it is simply re-sent)
+        if not uploaded_part or uploaded_part["Size"] != size:
+            return False
+        md5 = hashlib.md5()
+        with self._open_part(filename, offset, size) as part:
+            for block in iter(lambda: part.read(MiB), b""):
+                md5.update(block)
+        return uploaded_part["ETag"].strip('"') == md5.hexdigest()
+
+    def _upload_part(
+        self,
+        filename: str,
+        bucket: str,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        offset: int,
+        size: int,
+        progress_callback: Optional[Callable[[int], None]],
+    ) -> Result[Dict[str, Any], str]:
+        with self._open_part(filename, offset, size) as body:
+            result = self._upload_part_bytes(bucket, key, upload_id, part_number, body)
+        if is_ok(result) and progress_callback:
+            progress_callback(size)
+        return result
+
+    def _upload_part_bytes(
+        self,
+        bucket: str,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        body: Union[bytes, ReadFileChunk],
+    ) -> Result[Dict[str, Any], str]:
+        last_error = ""
+        for attempt in range(1, self.max_part_attempts + 1):
+            try:
+                if not isinstance(body, (bytes, bytearray)):
+                    # a retry sends the part from its start again
+                    body.seek(0)
+                response = self.s3_client.upload_part(
+                    Bucket=bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body,
+                )
+                return Ok({"PartNumber": part_number, "ETag": response["ETag"]})
+            except Exception as e:
+                last_error = str(e)
+                if attempt < self.max_part_attempts:
+                    time.sleep(self.retry_wait_seconds * 2 ** (attempt - 1))
+        return Err(
+            f"Part {part_number} failed after {self.max_part_attempts} attempts: {last_error}"
+        )
+
+    def upload_file(
+        self,
+        filename: str,
+        bucket: str,
+        key: str,
+        plan: Optional[S3_Upload_Plan] = None,
+        resume: bool = False,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        extra_args: Optional[Dict[str, Any]] = None,
+        abort_on_failure: Optional[bool] = None,
+    ) -> Result[str, str]:
+        """
+        Returns the ETag of the uploaded object. abort_on_failure defaults to
+        not resume.
+        """
+        if abort_on_failure is None:
+            abort_on_failure = not resume
+        extra_args = extra_args or {}
+        file_size = os.path.getsize(filename)
+        plan = plan if plan else S3_Upload_Plan.create(file_size)
+        if not plan.is_multipart:
+            try:
+                with open(filename, "rb") as f:
+                    response = self.s3_client.put_object(
+                        Bucket=bucket, Key=key, Body=f, **extra_args
+                    )
+                if progress_callback:
+                    progress_callback(file_size)
+                return Ok(response["ETag"])
+            except Exception as e:
+                return Err(
+                    f"Upload of {filename} to s3://{bucket}/{key} failed: {str(e)}"
+                )
+
+        try:
+            upload_id = self.find_resumable_upload(bucket, key) if resume else None
+            uploaded_parts = (
+                self._get_uploaded_parts(bucket, key, upload_id) if upload_id else {}
+            )
+            if not upload_id:
+                upload_id = self.s3_client.create_multipart_upload(
+                    Bucket=bucket, Key=key, **extra_args
+                )["UploadId"]
+        except Exception as e:
+            return Err(
+                f"Could not start multipart upload to s3://{bucket}/{key}: {str(e)}"
+            )
+
+        completed: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        with ThreadPoolExecutor(
+            max_workers=plan.concurrency, thread_name_prefix="s3-upload-part"
+        ) as pool:
+            futures = []
+            for index in range(plan.number_of_parts):
+                part_number = index + 1
+                offset = index * plan.part_size
+                size = min(plan.part_size, file_size - offset)
+                existing = uploaded_parts.get(part_number)
+                if self._is_part_reusable(filename, offset, size, existing):
+                    completed.append(
+                        {"PartNumber": part_number, "ETag": existing["ETag"]}
+                    )
+                    if progress_callback:
+                        progress_callback(size)
+                    continue
+                futures.append(
+                    pool.submit(
+                        self._upload_part,
+                        filename,
+                        bucket,
+                        key,
+                        upload_id,
+                        part_number,
+                        offset,
+                        size,
+                        progress_callback,
+                    )
+                )
+            for future in as_completed(futures):
+                part_result = future.result()
+                if is_err(part_result):
+                    errors.append(part_result.err_value)
+                else:
+                    completed.append(part_result.ok_value)
+
+        if errors:
+            if abort_on_failure:
+                self._abort_quietly(bucket, key, upload_id)
+                return Err(
+                    f"Multipart upload {upload_id} to s3://{bucket}/{key} failed and was aborted. {errors[0]}"
+                )
+            return Err(
+                f"Multipart upload {upload_id} to s3://{bucket}/{key} is incomplete, "
+                f"upload again to resume it. {errors[0]}"
+            )
+        try:
+            response = self.s3_client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": sorted(completed, key=lambda p: p["PartNumber"])
+                },
+            )
+            return Ok(response["ETag"])
+        except Exception as e:
+            return Err(
+                f"Could not complete multipart upload {upload_id} to s3://{bucket}/{key}: {str(e)}"
+            )
+
+    def abort(self, bucket: str, key: str, upload_id: str):
+        self.s3_client.abort_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id
+        )
+
+    def _abort_quietly(self, bucket: str, key: str, upload_id: str):
+        # the upload error is what the caller needs to see, not this one
+        try:
+            self.abort(bucket, key, upload_id)
+        except Exception:
+            pass
+
+
+class S3_Streaming_Multipart_Writer(io.RawIOBase):
+    """
+    Writable file object that turns whatever is written to it into a
+    multipart upload while it is being written, e.g. the output of
+    tarfile.open(fileobj=writer, mode="w|gz"). Parts are uploaded from a
+    thread pool; the writer blocks once max_in_flight_parts are queued, so
+    memory stays below (max_in_flight_parts + 1) * part_size and nothing
+    touches the disk. finish() completes the upload, abort() cancels it.
+    Closing the writer without finish() (which is also what garbage
+    collection does) aborts, so a writer abandoned after an error never
+    turns into a truncated object.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        key: str,
+        part_size: int = 16 * MiB,
+        max_in_flight_parts: int = 8,
+        max_part_attempts: int = 3,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        extra_args: Optional[Dict[str, Any]] = None,
+    ):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.progress_callback = progress_callback
+        self.extra_args = extra_args or {}
+        self.bytes_written = 0
+        self.etag: Optional[str] = None
+        self._uploader = S3_Multipart_Uploader(
+            s3_client, max_part_attempts=max_part_attempts
+        )
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._next_part_number = 1
+        self._futures: List[Future] = []
+        self._slots = threading.BoundedSemaphore(max_in_flight_parts)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_in_flight_parts, thread_name_prefix="s3-stream-part"
+        )
+        self._failed = False
+        self._first_error: Optional[str] = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed S3_Streaming_Multipart_Writer")
+        self._raise_if_a_part_failed()
+        self._buffer.extend(data)
+        self.bytes_written = self.bytes_written + len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[: self.part_size])
+            del self._buffer[: self.part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def _submit_part(self, part: bytes):
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.extra_args
+            )["UploadId"]
+        self._slots.acquire()
+        part_number = self._next_part_number
+        self._next_part_number = part_number + 1
+        future = self._pool.submit(self._upload_part, part_number, part)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number: int, part: bytes) -> Result[Dict, str]:
+        result = self._uploader._upload_part_bytes(
+            self.bucket, self.key, self._upload_id, part_number, part
+        )
+        if is_err(result):
+            # the error is kept before the flag is raised, the future is not done yet
+            if self._first_error is None:
+                self._first_error = result.err_value
+            self._failed = True
+        elif self.progress_callback:
+            self.progress_callback(len(part))
+        return result
+
+    def _raise_if_a_part_failed(self):
+        if self._failed:
+            self.abort()
+            raise IOError(
+                f"Streaming upload to s3://{self.bucket}/{self.key} failed: {self._first_error}"
+            )
+
+    def abort(self):
+        self._pool.shutdown(wait=True)
+        if self._upload_id is not None:
+            self._uploader.abort(self.bucket, self.key, self._upload_id)
+            self._upload_id = None
+        super().close()
+
+    def close(self):
+        if not self.closed:
+            self.abort()
+
+    def finish(self) -> Optional[str]:
+        """
+        Uploads what is still buffered, completes the upload and closes the
+        writer. Returns the ETag of the object.
+        """
+        if self.closed:
+            raise ValueError("finish of closed S3_Streaming_Multipart_Writer")
+        try:
+            if self._upload_id is None:
+                # everything fit in one part, a plain put is cheaper
+                response = self.s3_client.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self._buffer),
+                    **self.extra_args,
+                )
+                if self.progress_callback:
+                    self.progress_callback(len(self._buffer))
+                self.etag = response["ETag"]
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                self._pool.shutdown(wait=True)
+                self._raise_if_a_part_failed()
+                parts = sorted(
+                    (f.result().ok_value for f in self._futures),
+                    key=lambda p: p["PartNumber"],
+                )
+                response = self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+                self.etag = response["ETag"]
+            self._buffer = bytearray()
+        except BaseException:
+            self.abort()
+            raise
+        self._pool.shutdown(wait=True)
+        super().close()
+        return self.etag
+
+
+class S3_Part_Buffer_Pool(object):
+    """
+    A fixed set of part sized buffers that are filled, uploaded and handed
+    back for the next part. acquire() blocks while every buffer is in use,
+    which is what holds back a producer that is faster than the uploads.
+    """
+
+    def __init__(self, part_size: int, number_of_buffers: int):
+        self.part_size = part_size
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(number_of_buffers):
+            self._free.put(bytearray(part_size))
+
+    def acquire(self) -> bytearray:
+        return self._free.get()
+
+    def release(self, buffer: bytearray):
+        self._free.put(buffer)
+
+
+class S3_Generator_Uploader(object):
+    """
+    Multipart upload of whatever a generator yields (bytes or str chunks),
+    with the generator running while earlier parts upload. Parts are read
+    into max_concurrency + 1 reusable buffers, so memory stays at that many
+    parts whatever the size of the payload, and every part is retried on
+    its own. A payload smaller than one part becomes a single put_object.
+    With the 10000 part limit of s3, part_size caps the payload at
+    10000 * part_size.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        part_size: int = 16 * MiB,
+        max_concurrency: int = 8,
+        max_part_attempts: int = 3,
+        retry_wait_seconds: float = 1.0,
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ):
+        self.s3_client = s3_client
+        self.part_size = min(max(part_size, S3_MIN_PART_SIZE), S3_MAX_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.progress_callback = progress_callback
+        self._uploader = S3_Multipart_Uploader(
+            s3_client,
+            max_part_attempts=max_part_attempts,
+            retry_wait_seconds=retry_wait_seconds,
+        )
+
+    def _upload_part(
+        self,
+        pool: S3_Part_Buffer_Pool,
+        bucket: str,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        buffer: bytearray,
+        size: int,
+    ) -> Result[Dict[str, Any], str]:
+        try:
+            body = buffer if size == len(buffer) else buffer[:size]
+            result = self._uploader._upload_part_bytes(
+                bucket, key, upload_id, part_number, body
+            )
+            if is_ok(result) and self.progress_callback:
+                self.progress_callback(size)
+            return result
+        finally:
+            pool.release(buffer)
+
+    def upload(
+        self,
+        chunks: Iterable[Union[bytes, str]],
+        bucket: str,
+        key: str,
+        extra_args: Optional[Dict[str, Any]] = None,
+    ) -> Result[str, str]:
+        """
+        Returns the ETag of the uploaded object. A failed upload is aborted,
+        a generator can not be resumed.
+        """
+        extra_args = extra_args or {}
+        stream = Generator_To_FileLike(chunks, buffer_size=MiB)
+        pool = S3_Part_Buffer_Pool(self.part_size, self.max_concurrency + 1)
+        futures: List[Future] = []
+        upload_id: Optional[str] = None
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="s3-generator-part"
+        )
+        try:
+            while True:
+                buffer = pool.acquire()
+                size = stream.readinto(buffer)
+                if size == 0:
+                    pool.release(buffer)
+                    break
+                if upload_id is None and size < self.part_size:
+                    # everything fit in one part, a plain put is cheaper
+                    response = self.s3_client.put_object(
+                        Bucket=bucket, Key=key, Body=bytes(buffer[:size]), **extra_args
+                    )
+                    if self.progress_callback:
+                        self.progress_callback(size)
+                    return Ok(response["ETag"])
+                if upload_id is None:
+                    upload_id = self.s3_client.create_multipart_upload(
+                        Bucket=bucket, Key=key, **extra_args
+                    )["UploadId"]
+                failed = [f for f in futures if f.done() and is_err(f.result())]
+                if failed:
+                    pool.release(buffer)
+                    break
+                futures.append(
+                    executor.submit(
+                        self._upload_part,
+                        pool,
+                        bucket,
+                        key,
+                        upload_id,
+                        len(futures) + 1,
+                        buffer,
+                        size,
+                    )
+                )
+            results = [f.result() for f in futures]
+            errors = [r.err_value for r in results if is_err(r)]
+            if errors:
+                raise Exception(errors[0])
+            if upload_id is None:
+                # the generator yielded nothing
+                response = self.s3_client.put_object(
+                    Bucket=bucket, Key=key, Body=b"", **extra_args
+                )
+                return Ok(response["ETag"])
+            response = self.s3_client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": [r.ok_value for r in results]},
+            )
+            return Ok(response["ETag"])
+        except Exception as e:
+            executor.shutdown(wait=True)
+            if upload_id is not None:
+                self._uploader.abort(bucket, key, upload_id)
+            return Err(f"Upload to s3://{bucket}/{key} failed: {str(e)}")
+        finally:
+            executor.shutdown(wait=True)
@@ -2,9 +2,12 @@ from __future__ import annotations
 from abc import ABC
 from logging import Logger
 from result import Err, Ok, Result, is_ok, is_err
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Callable, Optional, Tuple, Any, Dict
+from urllib.parse import urlsplit
 from attrs import define, field, asdict
 
 from mlcore_utils.model.common import (
@@ -12,18 +15,78 @@ from mlcore_utils.model.common import (
     Secret_Getter,
     Blacklodge_Action_Status,
 )
-from mlcore_utils.model.blacklodge import (
-    Blacklodge_Model,
-    Blacklodge_User,
-)
 
 from mlcore_utils.model.common import Secret_Getter
+from mlcore_utils.model.cache import TTL_Cache
+from mlcore_utils.model.wait_strategy import (
+    Condition_Waiter,
+    Exponential_Backoff_Wait_Strategy,
+    Wait_Strategy,
+)
 from mlcore_utils.model.stratos_interface import Stratos_AppOwnersMetadata_V1, Stratos_AppSyncArgoRequest_V1, Stratos_ContainerHelDeployRequest_V1, Stratos_NamespaceMetadata_V1, Stratos_ProjectMetadata_V1
 
 
+_shared_requests_wrapper: Optional[Requests_Wrapper] = None
+_shared_requests_wrapper_lock = threading.Lock()
+_shared_existence_cache: TTL_Cache = TTL_Cache(ttl_seconds=600)
+
+
 @define
 class Requests_Wrapper(object):
     # logger: Logger = field()
+    pool_connections: int = field(default=10)
+    pool_maxsize: int = field(default=20)
+    pool_block: bool = field(default=False)
+    keep_alive: bool = field(default=True)
+    wait_strategy: Wait_Strategy = field(factory=Exponential_Backoff_Wait_Strategy)
+    _sessions: Dict[str, requests.Session] = field(init=False, factory=dict)
+    _sessions_lock: threading.Lock = field(init=False, factory=threading.Lock)
+
+    @classmethod
+    def get_shared_instance(cls) -> Requests_Wrapper:
+        """
+        Process wide wrapper, so that every api caller that is not handed an
+        explicit Requests_Wrapper reuses the same pooled connections.
+        """
+        global _shared_requests_wrapper
+        with _shared_requests_wrapper_lock:
+            if _shared_requests_wrapper is None:
+                _shared_requests_wrapper = Requests_Wrapper()
+            return _shared_requests_wrapper
+
+    def _get_host_key(self, endpoint: str) -> str:
+        parsed = urlsplit(endpoint)
+        return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def get_session(self, endpoint: str) -> requests.Session:
+        host_key = self._get_host_key(endpoint)
+        session = self._sessions.get(host_key)
+        if session is None:
+            with self._sessions_lock:
+                session = self._sessions.get(host_key)
+                if session is None:
+                    session = self._create_session()
+                    self._sessions[host_key] = session
+        return session
+
+    def close(self):
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
 
     def call_end_point(
         self,
@@ -45,7 +108,7 @@ class Requests_Wrapper(object):
             )
         try:
             # self.logger.info("calling " + endpoint)
-            return requests.request(
+            return self.get_session(endpoint).request(
                 method=http_method.value,
                 url=endpoint,
                 params=params,
@@ -66,6 +129,7 @@ class Requests_Wrapper(object):
                 json,
                 timeout,
                 attempt_count + 1,
+                retries,
                 **kwargs,
             )
         except Exception as e:
@@ -75,45 +139,36 @@ class Requests_Wrapper(object):
     def call_url_till_condition_is_met(
         self,
         status_response_url: str,
-        action_to_perform,
+        action_to_perform: Callable[[], requests.Response],
         condition_to_meet: Callable[[requests.Response], bool],
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> Result[requests.Response, str]:
-        finished = False
-        seconds_to_wait = 60
-        num_attempt = 0
-        while not (finished or num_attempt > 30):
-            try:
-                # status_response = self.call_api(
-                #    http_method=Http_Method.GET,
-                #    endpoint=f"{status_response_url}",
-                # )
-                status_response = action_to_perform()
-                if status_response.status_code == 200:
-                    condition_is_met = condition_to_meet(status_response)
-                    if condition_is_met:
-                        finished = True
-                        return Ok(status_response)
-                    else:
-                        time.sleep(seconds_to_wait)
-                        num_attempt = num_attempt + 1
-                else:
-                    time.sleep(seconds_to_wait)
-                    num_attempt = num_attempt + 1
-            except Exception as e:
-                raise e
-                # return Err(f"Cound not get status from {status_response_url}. Error {str(e)}")
+        waiter = Condition_Waiter(
+            wait_strategy if wait_strategy else self.wait_strategy
+        )
+        return waiter.wait_till_condition_is_met(
+            action_to_perform,
+            condition_to_meet,
+            description=status_response_url,
+            cancel_event=cancel_event,
+        )
 
 
 class ArgoCD_Api_Caller(object):
     def __init__(
         self,
         secret_getter: Secret_Getter,
-        requests_wrapper: Requests_Wrapper,
+        requests_wrapper: Optional[Requests_Wrapper] = None,
     ):
         self.secret_getter = secret_getter
         self.version = 1
         self.argocd_url = f"https://argocd.mgmt.stratos.prci.com/api/v{self.version}"
-        self.requests_wrapper = requests_wrapper
+        self.requests_wrapper = (
+            requests_wrapper
+            if requests_wrapper
+            else Requests_Wrapper.get_shared_instance()
+        )
 
     def get_default_headers(self):
         secret_result = self.secret_getter.get_secret()
@@ -143,24 +198,34 @@ class ArgoCD_Api_Caller(object):
     ) -> requests.Response:
         try:
             url = f"{self.argocd_url}/{endpoint}"
-            response = self.requests_wrapper.call_end_point(
-                http_method=http_method,
-                endpoint=url,
-                params=params,
-                data=data,
-                headers=self.get_default_headers(),
-                json=json_data,
-                timeout=timeout,
-                attempt_count=current_attempt_count,
-                retries=max_number_of_attempts,
-                **kwargs,
-            )
+
+            def _call():
+                return self.requests_wrapper.call_end_point(
+                    http_method=http_method,
+                    endpoint=url,
+                    params=params,
+                    data=data,
+                    headers=self.get_default_headers(),
+                    json=json_data,
+                    timeout=timeout,
+                    attempt_count=current_attempt_count,
+                    retries=max_number_of_attempts,
+                    **kwargs,
+                )
+
+            response = _call()
+            # the secret may have been rotated since it was cached
+            if response.status_code in (401, 403) and self.secret_getter.invalidate():
+                response = _call()
             return response
         except Exception as e:
             raise e
 
     def call_status_url_and_await(
-        self, status_response_url
+        self,
+        status_response_url,
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> Result[requests.Response, str]:
         condition_to_meet = lambda status_response: status_response.json()["status"][
             "health"
@@ -172,7 +237,7 @@ class ArgoCD_Api_Caller(object):
             )
 
         return self.requests_wrapper.call_url_till_condition_is_met(
-            status_response_url, _a, condition_to_meet
+            status_response_url, _a, condition_to_meet, wait_strategy, cancel_event
         )
 
 
@@ -180,11 +245,15 @@ class Stratos_Api_Caller(object):
     def __init__(
         self,
         secret_getter: Secret_Getter,
-        requests_wrapper: Requests_Wrapper,
+        requests_wrapper: Optional[Requests_Wrapper] = None,
     ) -> None:
         self.secret_getter = secret_getter
         self.stratos_url = f"https://jetstreamapi.apps.stratos.prci.com/api/v1/stratos"
-        self.requests_wrapper = requests_wrapper
+        self.requests_wrapper = (
+            requests_wrapper
+            if requests_wrapper
+            else Requests_Wrapper.get_shared_instance()
+        )
 
     def get_default_stratos_headers(self):
         secret_result = self.secret_getter.get_secret()
@@ -215,29 +284,40 @@ class Stratos_Api_Caller(object):
     ) -> requests.Response:
         try:
             url = f"{self.stratos_url}/{endpoint}"
-            response = self.requests_wrapper.call_end_point(
-                http_method=http_method,
-                endpoint=url,
-                params=params,
-                data=data,
-                headers=self.get_default_stratos_headers(),
-                json=json_data,
-                timeout=timeout,
-                attempt_count=current_attempt_count,
-                retries=max_number_of_attempts,
-                **kwargs,
-            )
+
+            def _call():
+                return self.requests_wrapper.call_end_point(
+                    http_method=http_method,
+                    endpoint=url,
+                    params=params,
+                    data=data,
+                    headers=self.get_default_stratos_headers(),
+                    json=json_data,
+                    timeout=timeout,
+                    attempt_count=current_attempt_count,
+                    retries=max_number_of_attempts,
+                    **kwargs,
+                )
+
+            response = _call()
+            # the secret may have been rotated since it was cached
+            if response.status_code in (401, 403) and self.secret_getter.invalidate():
+                response = _call()
             return response
         except Exception as e:
             raise e
 
+    @staticmethod
+    def is_container_build_completed(status_response: requests.Response) -> bool:
+        return status_response.json()["build_status"] == "completed"
+
     def call_status_url_and_await(
-        self, status_response_url
+        self,
+        status_response_url,
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> Result[requests.Response, str]:
-        condition_to_meet = (
-            lambda status_response: status_response.json()["build_status"]
-            == "completed"
-        )
+        condition_to_meet = Stratos_Api_Caller.is_container_build_completed
 
         def _a():
             r = self.call_api(http_method=Http_Method.GET, endpoint=status_response_url)
@@ -246,7 +326,7 @@ class Stratos_Api_Caller(object):
             return r
 
         response = self.requests_wrapper.call_url_till_condition_is_met(
-            status_response_url, _a, condition_to_meet
+            status_response_url, _a, condition_to_meet, wait_strategy, cancel_event
         )
         if is_ok(response):
             print(response.ok_value.status_code)
@@ -369,9 +449,25 @@ class Stratos_Api_Caller(object):
 
 
 
+def get_shared_stratos_existence_cache() -> TTL_Cache:
+    return _shared_existence_cache
+
+
 @define
 class Stratos_Api_V1_Util(object):
     stratos_api_caller: Stratos_Api_Caller = field()
+    # remembers which projects, app-owners and namespaces exist, shared by every util in the process
+    existence_cache: TTL_Cache = field(factory=get_shared_stratos_existence_cache)
+
+    def _get_existence_key(self, kind: str, name: str) -> str:
+        return f"{self.stratos_api_caller.stratos_url}|{kind}|{name}"
+
+    def _remember_created(self, kind: str, name: str, create_result: Result[bool, str]):
+        key = self._get_existence_key(kind, name)
+        if is_ok(create_result) and create_result.ok_value:
+            self.existence_cache.set(key, True)
+        else:
+            self.existence_cache.invalidate(key)
 
     def deploy_helm_chart_and_values(
         self, helm_deploy_request: Stratos_ContainerHelDeployRequest_V1
@@ -400,17 +496,7 @@ class Stratos_Api_V1_Util(object):
         self, helm_deploy_request: Stratos_ContainerHelDeployRequest_V1
     ) -> Result[bool, str]:
         endpoint = "containerdeploy/helm/chart_yaml"
-        data = {
-            "platform": helm_deploy_request.platform,
-            "application_name": helm_deploy_request.application_name,
-            "environment_name": helm_deploy_request.environment_name,
-            "project_identifier": helm_deploy_request.project_identifier,
-            "is_dynamic_environment": False,
-            "dynamic_environment_name": "",
-            "base64_yaml_contents": helm_deploy_request.base64_chart_yaml_contents,
-            "namespace_identifier": helm_deploy_request.namespace_identifier,
-            "cluster_type": helm_deploy_request.cluster_type,
-        }
+        data = self._get_helm_chart_payload(helm_deploy_request)
         try:
             response = self.stratos_api_caller.call_api(
                 http_method=Http_Method.POST,
@@ -429,6 +515,30 @@ class Stratos_Api_V1_Util(object):
         except Exception as e:
             return Err(f"Error while trying to deploy helm data: " + str(e))
 
+    @staticmethod
+    def _get_helm_chart_payload(
+        helm_deploy_request: Stratos_ContainerHelDeployRequest_V1,
+    ) -> Dict[str, Any]:
+        return {
+            "platform": helm_deploy_request.platform,
+            "application_name": helm_deploy_request.application_name,
+            "environment_name": helm_deploy_request.environment_name,
+            "project_identifier": helm_deploy_request.project_identifier,
+            "is_dynamic_environment": False,
+            "dynamic_environment_name": "",
+            "base64_yaml_contents": helm_deploy_request.base64_chart_yaml_contents,
+            "namespace_identifier": helm_deploy_request.namespace_identifier,
+            "cluster_type": helm_deploy_request.cluster_type,
+        }
+
+    @staticmethod
+    def _is_argocd_app_not_yet_available(response) -> bool:
+        return (
+            response.status_code == 500
+            and "Could not find any ArgoCD Applications".lower()
+            in response.text.lower()
+        )
+
     def sync_argocd_application(
         self,
         app_sync_request: Stratos_AppSyncArgoRequest_V1,
@@ -447,10 +557,7 @@ class Stratos_Api_V1_Util(object):
                 print("isssued successful sync call")
                 return Ok(True)
             elif response.status_code == 500 and stratos_call_success and attempt <= 12:
-                if (
-                    "Could not find any ArgoCD Applications".lower()
-                    in response.text.lower()
-                ):
+                if self._is_argocd_app_not_yet_available(response):
                     print(
                         "app not yet available in argocd. will check again in 60 seconds..."
                     )
@@ -482,6 +589,15 @@ class Stratos_Api_V1_Util(object):
         self, project_metadata: Stratos_ProjectMetadata_V1
     ) -> Result[bool, str]:
         endpoint = f"argocd/projects"
+        project_key = self._get_existence_key(
+            "argocd_project", project_metadata.rendered_project_name
+        )
+        if self.existence_cache.get(project_key):
+            return Ok(True)
+        list_key = self._get_existence_key("argocd_project_list", endpoint)
+        if self.existence_cache.get(list_key):
+            # listed recently and not there, and it was not created through us since
+            return Ok(False)
         try:
             response = self.stratos_api_caller.call_api(
                 http_method=Http_Method.GET,
@@ -489,6 +605,13 @@ class Stratos_Api_V1_Util(object):
             )
             if response.status_code == 200:
                 available_projects = response.json()
+                existing = {
+                    self._get_existence_key("argocd_project", name): True
+                    for name in available_projects
+                }
+                self.existence_cache.set_many(existing)
+                # a project missing from the list is trusted for a shorter time than one in it
+                self.existence_cache.set(list_key, True, ttl_seconds=60)
                 return Ok(project_metadata.rendered_project_name in available_projects)
             else:
                 print(
@@ -508,6 +631,12 @@ class Stratos_Api_V1_Util(object):
             "platform": appowners_metadata.platform,
             "application_name": f"{appowners_metadata.application_name}",
         }
+        app_key = self._get_existence_key(
+            "app_owner",
+            f"{appowners_metadata.platform}/{appowners_metadata.application_name}",
+        )
+        if self.existence_cache.get(app_key):
+            return Ok(True)
         try:
             response = self.stratos_api_caller.call_api(
                 http_method=Http_Method.GET,
@@ -515,6 +644,7 @@ class Stratos_Api_V1_Util(object):
                 params=json_data,
             )
             if response.status_code == 200:
+                self.existence_cache.set(app_key, True)
                 return Ok(True)
             if response.status_code == 500:
                 return Ok(False)
@@ -614,13 +744,25 @@ class Stratos_Api_V1_Util(object):
     def create_k8s_namespace_using_stratos_sdk(
         self, namespace_metadata: Stratos_NamespaceMetadata_V1
     ) -> Result[bool, str]:
-        namepsace_exists_result = Ok(False)
+        # stratos has no lookup for namespaces, so only the ones created through us are known
+        namespace_name = f"{namespace_metadata.project_identifier}/{namespace_metadata.namespace_identifier}"
+        namepsace_exists_result = Ok(
+            bool(
+                self.existence_cache.get(
+                    self._get_existence_key("k8s_namespace", namespace_name)
+                )
+            )
+        )
         if is_ok(namepsace_exists_result):
             namespace_exists = namepsace_exists_result.ok_value
             if namespace_exists:
                 return Ok(True)
             else:
-                return self._create_k8s_namespace_using_stratos_sdk(namespace_metadata)
+                create_result = self._create_k8s_namespace_using_stratos_sdk(
+                    namespace_metadata
+                )
+                self._remember_created("k8s_namespace", namespace_name, create_result)
+                return create_result
 
     def create_argocd_project_using_stratos_sdk(
         self, project_metadata: Stratos_ProjectMetadata_V1
@@ -633,7 +775,19 @@ class Stratos_Api_V1_Util(object):
             if project_exists:
                 return Ok(True)
             else:
-                return self._create_argocd_project_using_stratos_sdk(project_metadata)
+                create_result = self._create_argocd_project_using_stratos_sdk(
+                    project_metadata
+                )
+                self._remember_created(
+                    "argocd_project", project_metadata.rendered_project_name, create_result
+                )
+                if is_err(create_result):
+                    self.existence_cache.invalidate(
+                        self._get_existence_key("argocd_project_list", "argocd/projects")
+                    )
+                return create_result
+        else:
+            return project_exists_result
 
     def create_stratos_application(
         self, appowners_metadata: Stratos_AppOwnersMetadata_V1
@@ -644,4 +798,12 @@ class Stratos_Api_V1_Util(object):
             if app_exists:
                 return Ok(True)
             else:
-                return self._create_stratos_application(appowners_metadata)
+                create_result = self._create_stratos_application(appowners_metadata)
+                self._remember_created(
+                    "app_owner",
+                    f"{appowners_metadata.platform}/{appowners_metadata.application_name}",
+                    create_result,
+                )
+                return create_result
+        else:
+            return app_exists_result
@@ -0,0 +1,533 @@
+from __future__ import annotations
+import asyncio
+import threading
+import weakref
+import httpx
+from result import Err, Ok, Result, is_ok, is_err
+from typing import AsyncIterator, Awaitable, Callable, Optional, Dict
+from attrs import define, field, asdict
+
+from mlcore_utils.model.common import Http_Method, Secret_Getter
+from mlcore_utils.model.stratos_api import Stratos_Api_V1_Util
+from mlcore_utils.model.wait_strategy import (
+    Condition_Waiter,
+    Exponential_Backoff_Wait_Strategy,
+    Wait_Strategy,
+)
+from mlcore_utils.model.stratos_interface import (
+    Stratos_AppOwnersMetadata_V1,
+    Stratos_AppSyncArgoRequest_V1,
+    Stratos_ContainerHelDeployRequest_V1,
+    Stratos_NamespaceMetadata_V1,
+    Stratos_ProjectMetadata_V1,
+)
+
+
+_shared_async_requests_wrapper: Optional[Async_Requests_Wrapper] = None
+_shared_async_requests_wrapper_lock = threading.Lock()
+
+
+async def _close_on_loop_shutdown(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+@define
+class Async_Requests_Wrapper(object):
+    """
+    asyncio counterpart of Requests_Wrapper. All callers sharing an instance
+    share one httpx connection pool, so a single event loop can drive many
+    concurrent deploy sequences without a thread per request.
+
+    An httpx pool only works on the event loop it was made on, so every loop
+    gets its own, and loops running on different threads never touch each
+    other's connections. A pool is closed when its loop shuts down its async
+    generators, which asyncio.run does. A loop that is closed without
+    loop.shutdown_asyncgens() must await aclose() first.
+    """
+
+    max_connections: int = field(default=100)
+    max_keepalive_connections: int = field(default=20)
+    keepalive_expiry: float = field(default=30.0)
+    wait_strategy: Wait_Strategy = field(factory=Exponential_Backoff_Wait_Strategy)
+    # None is httpx's network transport
+    transport: Optional[httpx.AsyncBaseTransport] = field(default=None)
+    # loop -> (client, the async generator that closes it with the loop)
+    _clients: weakref.WeakKeyDictionary = field(
+        init=False, factory=weakref.WeakKeyDictionary
+    )
+    _clients_lock: threading.Lock = field(init=False, factory=threading.Lock)
+
+    @classmethod
+    def get_shared_instance(cls) -> Async_Requests_Wrapper:
+        global _shared_async_requests_wrapper
+        with _shared_async_requests_wrapper_lock:
+            if _shared_async_requests_wrapper is None:
+                _shared_async_requests_wrapper = Async_Requests_Wrapper()
+            return _shared_async_requests_wrapper
+
+    async def get_client(self) -> httpx.AsyncClient:
+        running_loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            cached = self._clients.get(running_loop)
+        if cached is not None and not cached[0].is_closed:
+            return cached[0]
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            transport=self.transport,
+        )
+        closer = _close_on_loop_shutdown(client)
+        # started here, so this loop's shutdown_asyncgens() finishes it
+        await closer.__anext__()
+        with self._clients_lock:
+            # the closer refers back to its loop, so entries of closed loops
+            # would never leave the weak dict on their own
+            for loop in [loop for loop in self._clients if loop.is_closed()]:
+                del self._clients[loop]
+            self._clients[running_loop] = (client, closer)
+        return client
+
+    async def aclose(self):
+        """
+        Closes the pool of the running loop, the pools of other loops are left
+        to them.
+        """
+        with self._clients_lock:
+            cached = self._clients.pop(asyncio.get_running_loop(), None)
+        if cached is not None and not cached[0].is_closed:
+            await cached[0].aclose()
+
+    async def call_end_point(
+        self,
+        http_method: Http_Method,
+        endpoint: str,
+        params=None,
+        data=None,
+        headers=None,
+        json=None,
+        timeout: int = 15,
+        attempt_count: int = 1,
+        retries: int = 3,
+        **kwargs,
+    ) -> httpx.Response:
+        if attempt_count > retries:
+            raise Exception(
+                f"Could not reach endpoint {endpoint} after {retries} attempts"
+            )
+        try:
+            client = await self.get_client()
+            return await client.request(
+                method=http_method.value,
+                url=endpoint,
+                params=params,
+                data=data,
+                headers=headers,
+                json=json,
+                timeout=timeout,
+                **kwargs,
+            )
+        except httpx.ReadTimeout:
+            return await self.call_end_point(
+                http_method,
+                endpoint,
+                params,
+                data,
+                headers,
+                json,
+                timeout,
+                attempt_count + 1,
+                retries,
+                **kwargs,
+            )
+        except Exception as e:
+            raise e
+
+    async def call_url_till_condition_is_met(
+        self,
+        status_response_url: str,
+        action_to_perform: Callable[[], Awaitable[httpx.Response]],
+        condition_to_meet: Callable[[httpx.Response], bool],
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Result[httpx.Response, str]:
+        waiter = Condition_Waiter(
+            wait_strategy if wait_strategy else self.wait_strategy
+        )
+        return await waiter.wait_till_condition_is_met_async(
+            action_to_perform,
+            condition_to_meet,
+            description=status_response_url,
+            cancel_event=cancel_event,
+        )
+
+
+class Async_ArgoCD_Api_Caller(object):
+    def __init__(
+        self,
+        secret_getter: Secret_Getter,
+        requests_wrapper: Optional[Async_Requests_Wrapper] = None,
+    ):
+        self.secret_getter = secret_getter
+        self.version = 1
+        self.argocd_url = f"https://argocd.mgmt.stratos.prci.com/api/v{self.version}"
+        self.requests_wrapper = (
+            requests_wrapper
+            if requests_wrapper
+            else Async_Requests_Wrapper.get_shared_instance()
+        )
+
+    async def get_default_headers(self) -> Dict[str, str]:
+        # secret getters are blocking (boto3), keep them off the event loop
+        secret_result = await asyncio.to_thread(self.secret_getter.get_secret)
+        if is_ok(secret_result):
+            return {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {secret_result.ok_value.get_secret_value()}",
+            }
+        elif is_err(secret_result):
+            raise Exception(
+                "error getting secret for strator API: " + secret_result.err_value
+            )
+        else:
+            raise Exception("Unknown error getting secret for Stratos API")
+
+    async def call_api(
+        self,
+        http_method: Http_Method,
+        endpoint: str,
+        json_data=None,
+        data=None,
+        timeout: int = 15,
+        current_attempt_count: int = 1,
+        max_number_of_attempts: int = 3,
+        params=None,
+        **kwargs,
+    ) -> httpx.Response:
+        url = f"{self.argocd_url}/{endpoint}"
+
+        async def _call():
+            return await self.requests_wrapper.call_end_point(
+                http_method=http_method,
+                endpoint=url,
+                params=params,
+                data=data,
+                headers=await self.get_default_headers(),
+                json=json_data,
+                timeout=timeout,
+                attempt_count=current_attempt_count,
+                retries=max_number_of_attempts,
+                **kwargs,
+            )
+
+        response = await _call()
+        # the secret may have been rotated since it was cached
+        if response.status_code in (401, 403) and self.secret_getter.invalidate():
+            response = await _call()
+        return response
+
+    async def call_status_url_and_await(
+        self,
+        status_response_url,
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Result[httpx.Response, str]:
+        condition_to_meet = lambda status_response: status_response.json()["status"][
+            "health"
+        ]["status"]
+
+        async def _a():
+            return await self.call_api(
+                http_method=Http_Method.GET, endpoint=status_response_url
+            )
+
+        return await self.requests_wrapper.call_url_till_condition_is_met(
+            status_response_url, _a, condition_to_meet, wait_strategy, cancel_event
+        )
+
+
+class Async_Stratos_Api_Caller(object):
+    def __init__(
+        self,
+        secret_getter: Secret_Getter,
+        requests_wrapper: Optional[Async_Requests_Wrapper] = None,
+    ) -> None:
+        self.secret_getter = secret_getter
+        self.stratos_url = f"https://jetstreamapi.apps.stratos.prci.com/api/v1/stratos"
+        self.requests_wrapper = (
+            requests_wrapper
+            if requests_wrapper
+            else Async_Requests_Wrapper.get_shared_instance()
+        )
+
+    async def get_default_stratos_headers(self) -> Dict[str, str]:
+        secret_result = await asyncio.to_thread(self.secret_getter.get_secret)
+        if is_ok(secret_result):
+            return {
+                "accept": "application/json",
+                "access_token": secret_result.ok_value.get_secret_value(),
+                "Content-Type": "application/json",
+            }
+        elif is_err(secret_result):
+            raise Exception(
+                "error getting secret for strator API: " + secret_result.err_value
+            )
+        else:
+            raise Exception("Unknown error getting secret for Stratos API")
+
+    async def call_api(
+        self,
+        http_method: Http_Method,
+        endpoint: str,
+        json_data=None,
+        data=None,
+        timeout: int = 15,
+        current_attempt_count: int = 1,
+        max_number_of_attempts: int = 3,
+        params=None,
+        **kwargs,
+    ) -> httpx.Response:
+        url = f"{self.stratos_url}/{endpoint}"
+
+        async def _call():
+            return await self.requests_wrapper.call_end_point(
+                http_method=http_method,
+                endpoint=url,
+                params=params,
+                data=data,
+                headers=await self.get_default_stratos_headers(),
+                json=json_data,
+                timeout=timeout,
+                attempt_count=current_attempt_count,
+                retries=max_number_of_attempts,
+                **kwargs,
+            )
+
+        response = await _call()
+        # the secret may have been rotated since it was cached
+        if response.status_code in (401, 403) and self.secret_getter.invalidate():
+            response = await _call()
+        return response
+
+    async def call_status_url_and_await(
+        self,
+        status_response_url,
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Result[httpx.Response, str]:
+        condition_to_meet = (
+            lambda status_response: status_response.json()["build_status"]
+            == "completed"
+        )
+
+        async def _a():
+            return await self.call_api(
+                http_method=Http_Method.GET, endpoint=status_response_url
+            )
+
+        return await self.requests_wrapper.call_url_till_condition_is_met(
+            status_response_url, _a, condition_to_meet, wait_strategy, cancel_event
+        )
+
+
+@define
+class Async_Stratos_Api_V1_Util(object):
+    """
+    Same calls and Result contract as Stratos_Api_V1_Util, awaitable.
+    """
+
+    stratos_api_caller: Async_Stratos_Api_Caller = field()
+
+    async def _post_expecting_200(
+        self, endpoint: str, data, error_msg: str, exception_msg: str
+    ) -> Result[bool, str]:
+        try:
+            response = await self.stratos_api_caller.call_api(
+                http_method=Http_Method.POST,
+                endpoint=endpoint,
+                json_data=data,
+            )
+            if response.status_code == 200:
+                return Ok(True)
+            else:
+                print(
+                    f"{error_msg}. Status_Code {response.status_code}. Text: {response.text}"
+                )
+                return Err(
+                    f"{error_msg}. Status_Code {response.status_code}. Text: {response.text}"
+                )
+        except Exception as e:
+            return Err(f"{exception_msg}" + str(e))
+
+    async def deploy_helm_chart_and_values(
+        self, helm_deploy_request: Stratos_ContainerHelDeployRequest_V1
+    ) -> Result[bool, str]:
+        return await self._post_expecting_200(
+            "containerdeploy/helm/chart_and_values_yaml",
+            asdict(helm_deploy_request),
+            "Error while deploying helm data",
+            "Error while trying to deploy helm data: ",
+        )
+
+    async def deploy_helm_chart(
+        self, helm_deploy_request: Stratos_ContainerHelDeployRequest_V1
+    ) -> Result[bool, str]:
+        return await self._post_expecting_200(
+            "containerdeploy/helm/chart_yaml",
+            Stratos_Api_V1_Util._get_helm_chart_payload(helm_deploy_request),
+            "Error while deploying helm data",
+            "Error while trying to deploy helm data: ",
+        )
+
+    async def sync_argocd_application(
+        self,
+        app_sync_request: Stratos_AppSyncArgoRequest_V1,
+        stratos_call_success: bool = True,
+        attempt=1,
+    ) -> Result[bool, str]:
+        endpoint = "argocd/app-sync"
+        data = asdict(app_sync_request)
+        try:
+            response = await self.stratos_api_caller.call_api(
+                http_method=Http_Method.POST,
+                endpoint=endpoint,
+                json_data=data,
+            )
+            if response.status_code == 200:
+                print("isssued successful sync call")
+                return Ok(True)
+            elif (
+                stratos_call_success
+                and attempt <= 12
+                and Stratos_Api_V1_Util._is_argocd_app_not_yet_available(response)
+            ):
+                print(
+                    "app not yet available in argocd. will check again in 60 seconds..."
+                )
+                await asyncio.sleep(60)
+                return await self.sync_argocd_application(
+                    app_sync_request, stratos_call_success, attempt + 1
+                )
+            else:
+                print(
+                    f"Error while syncing argocd capp. Status_Code {response.status_code}. Text: {response.text}"
+                )
+                return Err(
+                    f"Error while syncing argocd capp. Status_Code {response.status_code}. Text: {response.text}"
+                )
+        except Exception as e:
+            return Err(f"Error while trying to deploy helm data: " + str(e))
+
+    async def check_if_argocd_project_exists_using_stratos_sdk(
+        self, project_metadata: Stratos_ProjectMetadata_V1
+    ) -> Result[bool, str]:
+        try:
+            response = await self.stratos_api_caller.call_api(
+                http_method=Http_Method.GET,
+                endpoint="argocd/projects",
+            )
+            if response.status_code == 200:
+                available_projects = response.json()
+                return Ok(project_metadata.rendered_project_name in available_projects)
+            else:
+                return Err(
+                    f"Error while trying to query ArgoCD project. Status_Code: {response.status_code}. Text: {response.text}"
+                )
+        except Exception as e:
+            return Err("Error while trying to query Stratos application " + str(e))
+
+    async def check_if_stratos_application_exists(
+        self, appowners_metadata: Stratos_AppOwnersMetadata_V1
+    ) -> Result[bool, str]:
+        params = {
+            "platform": appowners_metadata.platform,
+            "application_name": f"{appowners_metadata.application_name}",
+        }
+        try:
+            response = await self.stratos_api_caller.call_api(
+                http_method=Http_Method.GET,
+                endpoint="containerdeploy/application-owner",
+                params=params,
+            )
+            if response.status_code == 200:
+                return Ok(True)
+            if response.status_code == 500:
+                return Ok(False)
+            else:
+                return Err(
+                    f"Error while trying to query Stratos Application. Status_Code: {response.status_code}. Text: {response.text}"
+                )
+        except Exception as e:
+            return Err("Error while trying to query Stratos application " + str(e))
+
+    async def _create_argocd_project_using_stratos_sdk(
+        self, project_metadata: Stratos_ProjectMetadata_V1
+    ) -> Result[bool, str]:
+        return await self._post_expecting_200(
+            "argocd/projects",
+            asdict(project_metadata),
+            f"Error while creating ArgoCD Project {project_metadata.project_identifier}",
+            f"Error while trying to create ArgoCD Project {project_metadata.project_identifier}: ",
+        )
+
+    async def _create_k8s_namespace_using_stratos_sdk(
+        self, namespace_metadata: Stratos_NamespaceMetadata_V1
+    ) -> Result[bool, str]:
+        return await self._post_expecting_200(
+            "argocd/namespace",
+            asdict(namespace_metadata),
+            "Error while creating K8s Namespace",
+            f"Error while trying to create K8s Namespace. {namespace_metadata.namespace_identifier}: ",
+        )
+
+    async def _create_stratos_application(
+        self, appowners_metadata: Stratos_AppOwnersMetadata_V1
+    ) -> Result[bool, str]:
+        return await self._post_expecting_200(
+            "argocd/app-owners",
+            asdict(appowners_metadata),
+            "Error while creating Stratos Application",
+            f"Error while trying to create Stratos application {appowners_metadata.application_name}: ",
+        )
+
+    async def create_k8s_namespace_using_stratos_sdk(
+        self, namespace_metadata: Stratos_NamespaceMetadata_V1
+    ) -> Result[bool, str]:
+        return await self._create_k8s_namespace_using_stratos_sdk(namespace_metadata)
+
+    async def create_argocd_project_using_stratos_sdk(
+        self, project_metadata: Stratos_ProjectMetadata_V1
+    ) -> Result[bool, str]:
+        project_exists_result = (
+            await self.check_if_argocd_project_exists_using_stratos_sdk(
+                project_metadata
+            )
+        )
+        if is_ok(project_exists_result):
+            if project_exists_result.ok_value:
+                return Ok(True)
+            else:
+                return await self._create_argocd_project_using_stratos_sdk(
+                    project_metadata
+                )
+        else:
+            return project_exists_result
+
+    async def create_stratos_application(
+        self, appowners_metadata: Stratos_AppOwnersMetadata_V1
+    ) -> Result[bool, str]:
+        app_exists_result = await self.check_if_stratos_application_exists(
+            appowners_metadata
+        )
+        if is_ok(app_exists_result):
+            if app_exists_result.ok_value:
+                return Ok(True)
+            else:
+                return await self._create_stratos_application(appowners_metadata)
+        else:
+            return app_exists_result
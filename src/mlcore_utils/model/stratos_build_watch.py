@@ -0,0 +1,226 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+import requests
+from attrs import define, field
+from result import Err, Ok, Result, is_ok
+from typing import Callable, Dict, Iterator, List, Optional
+
+from mlcore_utils.model.common import Http_Method
+from mlcore_utils.model.stratos_api import Stratos_Api_Caller
+from mlcore_utils.model.wait_strategy import (
+    Exponential_Backoff_Wait_Strategy,
+    Wait_Strategy,
+)
+
+
+@define
+class _Build_Watch(object):
+    commit_sha: str = field()
+    future: Future = field()
+    wait_strategy: Wait_Strategy = field()
+    delays: Iterator[float] = field()
+    started_at: float = field()
+    next_poll_at: float = field()
+    in_flight: bool = field(default=False)
+
+
+@define
+class Stratos_Build_Watch_Scheduler(object):
+    """
+    Tracks many container builds from a single polling thread.
+
+    Each registered commit sha gets a Future that resolves to the final
+    run-status response (same Result contract as
+    Stratos_Api_Caller.call_status_url_and_await). Every build polls on its
+    own wait strategy schedule, and the scheduler never issues more than
+    `max_polls_per_second` status calls overall, at most `batch_size` at once.
+    """
+
+    stratos_api_caller: Stratos_Api_Caller = field()
+    wait_strategy_factory: Callable[[], Wait_Strategy] = field(
+        default=Exponential_Backoff_Wait_Strategy
+    )
+    batch_size: int = field(default=8)
+    max_polls_per_second: float = field(default=4.0)
+    idle_wait_seconds: float = field(default=30.0)
+    clock: Callable[[], float] = field(default=time.monotonic)
+    _watches: Dict[str, _Build_Watch] = field(init=False, factory=dict)
+    _lock: threading.Lock = field(init=False, factory=threading.Lock)
+    _wakeup: threading.Event = field(init=False, factory=threading.Event)
+    _stopped: bool = field(init=False, default=False)
+    _thread: Optional[threading.Thread] = field(init=False, default=None)
+    _executor: Optional[ThreadPoolExecutor] = field(init=False, default=None)
+    _poll_budget: float = field(init=False, default=0.0)
+    _budget_updated_at: Optional[float] = field(init=False, default=None)
+
+    def watch(
+        self, commit_sha: str, wait_strategy: Optional[Wait_Strategy] = None
+    ) -> Future:
+        with self._lock:
+            if self._stopped:
+                raise Exception("Build watch scheduler has been shut down")
+            existing = self._watches.get(commit_sha)
+            if existing:
+                return existing.future
+            strategy = wait_strategy if wait_strategy else self.wait_strategy_factory()
+            now = self.clock()
+            watch = _Build_Watch(
+                commit_sha=commit_sha,
+                future=Future(),
+                wait_strategy=strategy,
+                delays=iter(strategy.get_delays()),
+                started_at=now,
+                next_poll_at=now,
+            )
+            self._watches[commit_sha] = watch
+            self._ensure_started()
+        self._wakeup.set()
+        return watch.future
+
+    def get_number_of_pending_builds(self) -> int:
+        with self._lock:
+            return len(self._watches)
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+            for watch in self._watches.values():
+                watch.future.set_result(
+                    Err(f"Stopped watching build {watch.commit_sha}")
+                )
+            self._watches.clear()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.batch_size, thread_name_prefix="stratos-build-poll"
+            )
+            self._thread = threading.Thread(
+                target=self._run, name="stratos-build-watch", daemon=True
+            )
+            self._thread.start()
+
+    def _refill_budget(self, now: float):
+        if self._budget_updated_at is None:
+            self._poll_budget = float(self.batch_size)
+        else:
+            elapsed = now - self._budget_updated_at
+            self._poll_budget = min(
+                float(self.batch_size),
+                self._poll_budget + elapsed * self.max_polls_per_second,
+            )
+        self._budget_updated_at = now
+
+    def _take_due_watches(self, now: float) -> List[_Build_Watch]:
+        due = sorted(
+            (
+                w
+                for w in self._watches.values()
+                if not w.in_flight and w.next_poll_at <= now
+            ),
+            key=lambda w: w.next_poll_at,
+        )
+        batch = due[: min(self.batch_size, int(self._poll_budget))]
+        for watch in batch:
+            watch.in_flight = True
+        self._poll_budget = self._poll_budget - len(batch)
+        return batch
+
+    def _get_seconds_till_next_event(self, now: float) -> float:
+        waiting = [w.next_poll_at for w in self._watches.values() if not w.in_flight]
+        if not waiting:
+            return self.idle_wait_seconds
+        till_next_poll = max(0.0, min(waiting) - now)
+        if self._poll_budget < 1:
+            till_budget = (1 - self._poll_budget) / self.max_polls_per_second
+            till_next_poll = max(till_next_poll, till_budget)
+        return till_next_poll
+
+    def _poll(self, watch: _Build_Watch) -> Result[requests.Response, str]:
+        try:
+            return Ok(
+                self.stratos_api_caller.call_api(
+                    http_method=Http_Method.GET,
+                    endpoint=f"containerbuild/{watch.commit_sha}/run-status",
+                )
+            )
+        except Exception as e:
+            return Err(str(e))
+
+    def _complete(self, watch: _Build_Watch, result: Result[requests.Response, str]):
+        del self._watches[watch.commit_sha]
+        watch.future.set_result(result)
+
+    def _handle_poll_result(
+        self, watch: _Build_Watch, poll_result: Result[requests.Response, str]
+    ):
+        now = self.clock()
+        watch.in_flight = False
+        if watch.commit_sha not in self._watches:
+            return
+        if is_ok(poll_result):
+            response = poll_result.ok_value
+            if response.status_code == 200 and (
+                Stratos_Api_Caller.is_container_build_completed(response)
+            ):
+                self._complete(watch, Ok(response))
+                return
+        try:
+            delay = next(watch.delays)
+        except StopIteration:
+            self._complete(
+                watch,
+                Err(
+                    f"Build {watch.commit_sha} did not complete after {now - watch.started_at:.0f} seconds"
+                ),
+            )
+            return
+        deadline = watch.wait_strategy.get_deadline_seconds()
+        if deadline is not None:
+            remaining = deadline - (now - watch.started_at)
+            if remaining <= 0:
+                self._complete(
+                    watch,
+                    Err(
+                        f"Build {watch.commit_sha} did not complete before the deadline of {deadline} seconds"
+                    ),
+                )
+                return
+            delay = min(delay, remaining)
+        watch.next_poll_at = now + delay
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                if self._stopped:
+                    return
+                now = self.clock()
+                self._refill_budget(now)
+                batch = self._take_due_watches(now)
+            if batch:
+                futures = [(w, self._executor.submit(self._poll, w)) for w in batch]
+                for watch, poll_future in futures:
+                    poll_result = poll_future.result()
+                    with self._lock:
+                        try:
+                            self._handle_poll_result(watch, poll_result)
+                        except Exception as e:
+                            # e.g. a status body without build_status, the thread has to keep running
+                            if watch.commit_sha in self._watches:
+                                self._complete(
+                                    watch,
+                                    Err(
+                                        f"Reading the status of build {watch.commit_sha} failed with error {str(e)}"
+                                    ),
+                                )
+            with self._lock:
+                sleep_for = self._get_seconds_till_next_event(self.clock())
+            self._wakeup.wait(sleep_for)
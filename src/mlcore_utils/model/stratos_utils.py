@@ -1,21 +1,37 @@
+from concurrent.futures import Future
+import hashlib
+import threading
+import requests
+from typing import Dict, Hashable, List, Optional, Tuple
 from mlcore_utils.model.stratos_api import Stratos_Api_Caller, Stratos_Api_V1_Util
 from result import Err, Ok, Result, is_ok, is_err
 from attr import asdict, define, field
 from mlcore_utils.model.common import Http_Method
+from mlcore_utils.model.dag import Dag_Executor, Dag_Node
 from mlcore_utils.model.data import Blacklodge_Alias_Deployer_Data, Blacklodge_Namespace_Deployer_Data, Blacklodge_Pipeline_Deployer_Data, Stratos_Deployer_V1_Data_Interface
 from mlcore_utils.model.stratos_api import Stratos_Api_Caller
 from mlcore_utils.model.stratos_interface import Stratos_AppOwnersMetadata_V1, Stratos_AppSyncArgoRequest_V1, Stratos_ContainerBuild_Metadata_V1, Stratos_ContainerHelDeployRequest_V1, Stratos_NamespaceMetadata_V1, Stratos_ProjectMetadata_V1
+from mlcore_utils.model.stratos_build_watch import Stratos_Build_Watch_Scheduler
+from mlcore_utils.model.wait_strategy import Wait_Strategy
+
+# how often a build_container waiting on the scheduler looks at its cancel_event
+BUILD_CANCEL_CHECK_SECONDS = 0.5
+
 
 @define
 class Stratos_Util(object):
     stratos_api_caller: Stratos_Api_Caller = field()
     util : Stratos_Api_V1_Util = field(init=False)
+    build_watch_scheduler: Optional[Stratos_Build_Watch_Scheduler] = field(default=None)
+    dag_executor: Dag_Executor = field(factory=Dag_Executor)
 
     def __attrs_post_init__(self):
         self.util = Stratos_Api_V1_Util(self.stratos_api_caller)
 
 
-    def build_container(self, containerbuild_data: Stratos_ContainerBuild_Metadata_V1) -> Result[str, str]:
+    def _start_container_build(
+        self, containerbuild_data: Stratos_ContainerBuild_Metadata_V1
+    ) -> Result[str, str]:
         json_data = asdict(containerbuild_data)
         response = self.stratos_api_caller.call_api(
             http_method=Http_Method.POST,
@@ -23,28 +39,92 @@ class Stratos_Util(object):
             json_data=json_data,
         )
         if response.status_code == 200:
-            commit_sha = response.json()["commit_sha"]
+            return Ok(response.json()["commit_sha"])
+        else:
+            return Err(
+                f"Starting container build failed. Status_Code {response.status_code}. Text: {response.text}"
+            )
+
+    def _get_build_conclusion(
+        self, result: Result[requests.Response, str]
+    ) -> Result[str, str]:
+        if is_ok(result):
+            if result.ok_value.status_code == 200:
+                return Ok(result.ok_value.json()["conclusion"])
+            elif result.ok_value.status_code == 422:
+                return Err(f"Building container image failed with error {result.ok_value.json()['msg']}")
+            else:
+                return Err(f"Building container image failed with error {result.ok_value.text}")
+        elif is_err(result):
+            return Err(result.err_value)
+        else:
+            return Err("Building container image failed with unknown error")
+
+    def build_container(
+        self,
+        containerbuild_data: Stratos_ContainerBuild_Metadata_V1,
+        wait_strategy: Optional[Wait_Strategy] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Result[str, str]:
+        if self.build_watch_scheduler:
+            future_result = self.submit_container_build(containerbuild_data, wait_strategy)
+            if is_err(future_result):
+                return future_result
+            conclusion_future = future_result.ok_value
+            if cancel_event is not None:
+                # the scheduler keeps watching, other deploys may wait on the same build
+                while not conclusion_future.done():
+                    if cancel_event.wait(BUILD_CANCEL_CHECK_SECONDS):
+                        return Err("Waiting for container build was cancelled")
+            return conclusion_future.result()
+        commit_sha_result = self._start_container_build(containerbuild_data)
+        if is_ok(commit_sha_result):
+            commit_sha = commit_sha_result.ok_value
             # status_response_url = f"{self.stratos_api_caller.stratos_url}/containerbuild/{commit_sha}/run-status"
             status_response_url = f"containerbuild/{commit_sha}/run-status"
-            result = self.stratos_api_caller.call_status_url_and_await(status_response_url)
-            if is_ok(result):
-                if result.ok_value.status_code == 200:
-                    return Ok(result.ok_value.json()["conclusion"])
-                elif result.ok_value.status_code == 422:
-                    return Err(f"Building container image failed with error {result.ok_value.json()['msg']}")
-                else:
-                    return Err(f"Building container image failed with error {result.ok_value.text}")
-            elif is_err(result):
-                return Err(result.err_value)
-            else:
-                return Err("Building container image failed with unknown error")
+            result = self.stratos_api_caller.call_status_url_and_await(
+                status_response_url, wait_strategy, cancel_event
+            )
+            return self._get_build_conclusion(result)
+        else:
+            return commit_sha_result
+
+    def submit_container_build(
+        self,
+        containerbuild_data: Stratos_ContainerBuild_Metadata_V1,
+        wait_strategy: Optional[Wait_Strategy] = None,
+    ) -> Result[Future, str]:
+        """
+        Starts the build and hands its status polling to the shared build watch
+        scheduler. The returned future resolves to the build conclusion
+        Result, the same value build_container returns.
+        """
+        if not self.build_watch_scheduler:
+            return Err("Stratos_Util has no build_watch_scheduler to submit builds to")
+        commit_sha_result = self._start_container_build(containerbuild_data)
+        if is_err(commit_sha_result):
+            return commit_sha_result
+        status_future = self.build_watch_scheduler.watch(
+            commit_sha_result.ok_value, wait_strategy
+        )
+        conclusion_future: Future = Future()
+
+        def _set_conclusion(f: Future):
+            try:
+                conclusion = self._get_build_conclusion(f.result())
+            except Exception as e:
+                conclusion = Err(f"Reading the container build conclusion failed with error {str(e)}")
+            conclusion_future.set_result(conclusion)
+
+        status_future.add_done_callback(_set_conclusion)
+        return Ok(conclusion_future)
 
     def create_k8s_namespace(
         self, deployer_data: Stratos_Deployer_V1_Data_Interface, util: Stratos_Api_V1_Util
     ):
         print("handling k8s namespce....")
         namespace_metadata = deployer_data.get_stratos_namespacemetadata_v1()
-        util.create_k8s_namespace_using_stratos_sdk(namespace_metadata)
+        return util.create_k8s_namespace_using_stratos_sdk(namespace_metadata)
 
     def create_project(
         self, deployer_data: Stratos_Deployer_V1_Data_Interface, util: Stratos_Api_V1_Util
@@ -56,79 +136,186 @@ class Stratos_Util(object):
         )
         return argocd_proeject_result
 
-    def deploy_application(
-        self, deployer_data: Stratos_Deployer_V1_Data_Interface, 
-    ):
-        self.create_k8s_namespace(deployer_data, self.util)
-        argocd_proeject_result = self.create_project(deployer_data, self.util)
-        if is_ok(argocd_proeject_result):
-            if argocd_proeject_result.ok_value:
-                # now create a stratos appowners metadata object
-                print("handling s5s application....")
-                stratos_application_metadata = deployer_data.get_stratos_appownersmetadata_v1(deployer_data.get_stratos_application_name())
-                stratos_application_result = self.util.create_stratos_application(
-                    stratos_application_metadata
+    def _get_application_node_keys(
+        self, deployer_data: Stratos_Deployer_V1_Data_Interface
+    ) -> Dict[str, Tuple[str, ...]]:
+        application_name = deployer_data.get_stratos_application_name()
+        project_name = deployer_data.get_stratos_projectmetadata_v1().rendered_project_name
+        # targets of one run that push different charts or values are different steps
+        helm_data = deployer_data.get_stratos_containerheldeployrequest_v1()
+        helm_digest = hashlib.sha1(
+            f"{helm_data.base64_chart_yaml_contents}:{helm_data.base64_values_yaml_contents}".encode()
+        ).hexdigest()
+        return {
+            "namespace": ("k8s_namespace", project_name, deployer_data.get_stratos_namespace_name()),
+            "project": ("argocd_project", project_name),
+            "app_owner": ("app_owner", application_name),
+            "helm": ("helm", application_name, helm_digest),
+            "app_sync": ("app_sync", application_name, helm_digest),
+        }
+
+    def _get_application_nodes(
+        self,
+        deployer_data: Stratos_Deployer_V1_Data_Interface,
+        run_after: Optional[List[Hashable]] = None,
+    ) -> List[Dag_Node]:
+        """
+        The steps of deploy_application as a graph. namespace, project and
+        app-owner have no ordering between them; the helm push waits on all
+        three and runs after run_after whether those succeed or not, and the
+        app sync waits on the helm push.
+        """
+        keys = self._get_application_node_keys(deployer_data)
+        application_name = deployer_data.get_stratos_application_name()
+
+        def _namespace(_):
+            namespace_result = self.create_k8s_namespace(deployer_data, self.util)
+            if is_err(namespace_result):
+                # namespace creation errors (e.g. it already exists) never stopped a deploy
+                print(namespace_result.err_value)
+                return Ok(False)
+            return namespace_result
+
+        def _project(_):
+            argocd_proeject_result = self.create_project(deployer_data, self.util)
+            if is_ok(argocd_proeject_result) and not argocd_proeject_result.ok_value:
+                return Err(
+                    f"Unknown Error While Creating Stratos Project {deployer_data.get_stratos_project_identifier()}"
                 )
-                if is_ok(stratos_application_result):
-                    print("handling helm chart and values....")
-                    helm_data = deployer_data.get_stratos_containerheldeployrequest_v1()
-                    if helm_data.base64_values_yaml_contents:
-                        deploy_result = self.util.deploy_helm_chart_and_values(helm_data)
-                    else:
-                        deploy_result = self.util.deploy_helm_chart(helm_data)
-
-                    if is_ok(deploy_result):
-                        helm_deploy_success = deploy_result.ok_value
-                        if helm_deploy_success:
-                            print(f"handling argocd app sync...")
-                            app_sync_request = deployer_data.get_stratos_appsyncargorequest_v1()
-                            self.util.sync_argocd_application(app_sync_request)
-                        else:
-                            print("Stratos call to update helm chart/vales failed")
-                    elif is_err(deploy_result):
-                        print(
-                            "Stratos call to update helm chart/vales failed with "
-                            + deploy_result.err_value
-                        )
-                    else:
-                        print(
-                            "Stratos call to update helm chart/vales failed with unknown error"
-                        )
-                elif is_err(stratos_application_result):
-                    print(stratos_application_result.err_value)
-                else:
-                    print(
-                        f"Unknown Error While Creating Stratos Application {deployer_data.get_stratos_application_name()}"
-                    )
-        elif is_err(argocd_proeject_result):
-            print(argocd_proeject_result.err_value)
-        else:
+            return argocd_proeject_result
+
+        def _app_owner(_):
+            print("handling s5s application....")
+            stratos_application_metadata = deployer_data.get_stratos_appownersmetadata_v1(application_name)
+            return self.util.create_stratos_application(stratos_application_metadata)
+
+        def _helm(_):
+            print("handling helm chart and values....")
+            helm_data = deployer_data.get_stratos_containerheldeployrequest_v1()
+            if helm_data.base64_values_yaml_contents:
+                deploy_result = self.util.deploy_helm_chart_and_values(helm_data)
+            else:
+                deploy_result = self.util.deploy_helm_chart(helm_data)
+            if is_ok(deploy_result) and not deploy_result.ok_value:
+                return Err("Stratos call to update helm chart/vales failed")
+            return deploy_result
+
+        def _app_sync(_):
+            print(f"handling argocd app sync...")
+            app_sync_request = deployer_data.get_stratos_appsyncargorequest_v1()
+            return self.util.sync_argocd_application(app_sync_request)
+
+        return [
+            Dag_Node(keys["namespace"], _namespace),
+            Dag_Node(keys["project"], _project),
+            Dag_Node(keys["app_owner"], _app_owner),
+            Dag_Node(
+                keys["helm"],
+                _helm,
+                [keys["namespace"], keys["project"], keys["app_owner"]],
+                list(run_after or []),
+            ),
+            Dag_Node(keys["app_sync"], _app_sync, [keys["helm"]]),
+        ]
+
+    def _run_application_nodes(
+        self, deployer_data: Stratos_Deployer_V1_Data_Interface, nodes: List[Dag_Node]
+    ) -> Result[bool, str]:
+        results = self.dag_executor.run(nodes)
+        app_sync_key = self._get_application_node_keys(deployer_data)["app_sync"]
+        # a failed namespace application is reported but does not fail the target
+        for key, result in results.items():
+            if key[0] == "app_sync" and key != app_sync_key and is_err(result):
+                print(result.err_value)
+        result = results[app_sync_key]
+        if is_err(result):
+            print(result.err_value)
+        return result
+
+    def _get_namespace_deployer_data(
+        self, deployer_data: Stratos_Deployer_V1_Data_Interface
+    ) -> Blacklodge_Namespace_Deployer_Data:
+        if isinstance(deployer_data, Blacklodge_Namespace_Deployer_Data):
+            return deployer_data
+        return Blacklodge_Namespace_Deployer_Data(
+            blacklodge_image_for_stratos=deployer_data.blacklodge_image_for_stratos,
+            helmchart_version_getter=deployer_data.helmchart_version_getter,
+        )
+
+    def _get_nodes_with_namespace(
+        self, deployer_data: Stratos_Deployer_V1_Data_Interface
+    ) -> List[Dag_Node]:
+        namespace_data = self._get_namespace_deployer_data(deployer_data)
+        namespace_sync_key = self._get_application_node_keys(namespace_data)["app_sync"]
+        return self._get_application_nodes(namespace_data) + self._get_application_nodes(
+            deployer_data, run_after=[namespace_sync_key]
+        )
+
+    def _get_deploy_nodes(
+        self, deployer_data: Stratos_Deployer_V1_Data_Interface
+    ) -> List[Dag_Node]:
+        if isinstance(
+            deployer_data, (Blacklodge_Pipeline_Deployer_Data, Blacklodge_Alias_Deployer_Data)
+        ):
+            return self._get_nodes_with_namespace(deployer_data)
+        return self._get_application_nodes(deployer_data)
+
+    def deploy_applications(
+        self,
+        deployer_data_list: List[Stratos_Deployer_V1_Data_Interface],
+        max_concurrency: Optional[int] = 4,
+    ) -> Dict[str, Result[bool, str]]:
+        """
+        Deploys many applications as one graph. Namespace, project and
+        app-owner steps that several targets share are run once, and at most
+        max_concurrency steps are in flight at a time. Returns the sync result
+        of every target keyed by its application name.
+        """
+        nodes: List[Dag_Node] = []
+        for deployer_data in deployer_data_list:
             print(
-                f"Unknown Error While Creating Stratos Project {deployer_data.get_stratos_project_identifier()}"
+                f"Deploying ArgoCD Application {deployer_data.get_stratos_application_name()}..."
             )
+            nodes.extend(self._get_deploy_nodes(deployer_data))
+        results = self.dag_executor.run(nodes, max_running=max_concurrency)
 
-    def deploy_pipeline(self, deployer_data : Blacklodge_Pipeline_Deployer_Data):
-        self.deploy_namespace(deployer_data)
+        deploy_results: Dict[str, Result[bool, str]] = {}
+        for deployer_data in deployer_data_list:
+            application_name = deployer_data.get_stratos_application_name()
+            result = results[self._get_application_node_keys(deployer_data)["app_sync"]]
+            if is_err(result):
+                print(f"{application_name}: {result.err_value}")
+            deploy_results[application_name] = result
+        return deploy_results
+
+    def deploy_application(
+        self, deployer_data: Stratos_Deployer_V1_Data_Interface,
+    ) -> Result[bool, str]:
+        return self._run_application_nodes(
+            deployer_data, self._get_application_nodes(deployer_data)
+        )
 
+    def deploy_pipeline(self, deployer_data : Blacklodge_Pipeline_Deployer_Data) -> Result[bool, str]:
         print(
             f"Deploying ArgoCD Application for Pipeline {deployer_data.get_stratos_application_name()}..."
         )
-        self.deploy_application(deployer_data)
-
-
-    def deploy_alias(self, deployer_data : Blacklodge_Alias_Deployer_Data):
-        self.deploy_namespace(deployer_data)
+        return self._run_application_nodes(
+            deployer_data, self._get_nodes_with_namespace(deployer_data)
+        )
 
+    def deploy_alias(self, deployer_data : Blacklodge_Alias_Deployer_Data) -> Result[bool, str]:
         print(
             f"Deploying ArgoCD Application for Alias {deployer_data.get_stratos_application_name()}..."
         )
-        self.deploy_application(deployer_data)
+        return self._run_application_nodes(
+            deployer_data, self._get_nodes_with_namespace(deployer_data)
+        )
 
-    def deploy_namespace(self, deployer_data: Blacklodge_Namespace_Deployer_Data):
+    def deploy_namespace(self, deployer_data: Blacklodge_Namespace_Deployer_Data) -> Result[bool, str]:
         print(
             f"Deploying ArgoCD Application for Namespace {deployer_data.get_stratos_application_name()}..."
         )
-        self.deploy_application(deployer_data)
+        return self.deploy_application(deployer_data)
 
     def deploy_alias_v2(self, deployer_data : Blacklodge_Alias_Deployer_Data):
         self.deploy_namespace(deployer_data)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import asyncio
+import random
+import threading
+import time
+from attrs import define, field
+from result import Err, Ok, Result, is_err
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+
+class Wait_Strategy(ABC):
+    @abstractmethod
+    def get_delays(self) -> Iterator[float]:
+        """
+        Seconds to wait after each unsuccessful attempt. The waiter gives up
+        once the iterator is exhausted.
+        """
+        pass
+
+    def get_deadline_seconds(self) -> Optional[float]:
+        return None
+
+
+@define
+class Fixed_Interval_Wait_Strategy(Wait_Strategy):
+    interval_seconds: float = field(default=60)
+    max_attempts: int = field(default=31)
+
+    def get_delays(self) -> Iterator[float]:
+        for _ in range(self.max_attempts - 1):
+            yield self.interval_seconds
+
+
+@define
+class Exponential_Backoff_Wait_Strategy(Wait_Strategy):
+    initial_interval_seconds: float = field(default=2)
+    multiplier: float = field(default=2.0)
+    max_interval_seconds: float = field(default=60)
+    jitter_ratio: float = field(default=0.2)
+    deadline_seconds: Optional[float] = field(default=1800)
+    max_attempts: Optional[int] = field(default=None)
+    random_source: random.Random = field(factory=random.Random)
+
+    @jitter_ratio.validator
+    def validate_jitter_ratio(self, attribute, value):
+        if value < 0 or value > 1:
+            raise ValueError("jitter_ratio should be between 0 and 1")
+
+    def get_deadline_seconds(self) -> Optional[float]:
+        return self.deadline_seconds
+
+    def get_delays(self) -> Iterator[float]:
+        interval = self.initial_interval_seconds
+        attempt = 1
+        while self.max_attempts is None or attempt < self.max_attempts:
+            jitter = interval * self.jitter_ratio
+            yield max(
+                0.0, self.random_source.uniform(interval - jitter, interval + jitter)
+            )
+            interval = min(interval * self.multiplier, self.max_interval_seconds)
+            attempt = attempt + 1
+
+
+@define
+class Condition_Waiter(object):
+    """
+    Calls an action until its response meets a condition, sleeping between
+    attempts as the wait strategy dictates. Stops early on the strategy's
+    deadline or when the cancel event is set.
+    """
+
+    wait_strategy: Wait_Strategy = field(factory=Exponential_Backoff_Wait_Strategy)
+    clock: Callable[[], float] = field(default=time.monotonic)
+
+    def _get_next_delay(
+        self, delays: Iterator[float], started_at: float, description: str
+    ) -> Result[float, str]:
+        try:
+            delay = next(delays)
+        except StopIteration:
+            return Err(
+                f"Condition not met for {description} after {self.clock() - started_at:.0f} seconds"
+            )
+        deadline = self.wait_strategy.get_deadline_seconds()
+        if deadline is not None:
+            remaining = deadline - (self.clock() - started_at)
+            if remaining <= 0:
+                return Err(
+                    f"Condition not met for {description} before the deadline of {deadline} seconds"
+                )
+            delay = min(delay, remaining)
+        return Ok(delay)
+
+    def wait_till_condition_is_met(
+        self,
+        action_to_perform: Callable[[], Any],
+        condition_to_meet: Callable[[Any], bool],
+        description: str = "",
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Result[Any, str]:
+        started_at = self.clock()
+        delays = iter(self.wait_strategy.get_delays())
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return Err(f"Waiting for {description} was cancelled")
+            response = action_to_perform()
+            if response.status_code == 200 and condition_to_meet(response):
+                return Ok(response)
+            delay_result = self._get_next_delay(delays, started_at, description)
+            if is_err(delay_result):
+                return delay_result
+            if cancel_event is not None:
+                if cancel_event.wait(delay_result.ok_value):
+                    return Err(f"Waiting for {description} was cancelled")
+            else:
+                time.sleep(delay_result.ok_value)
+
+    async def wait_till_condition_is_met_async(
+        self,
+        action_to_perform: Callable[[], Awaitable[Any]],
+        condition_to_meet: Callable[[Any], bool],
+        description: str = "",
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Result[Any, str]:
+        started_at = self.clock()
+        delays = iter(self.wait_strategy.get_delays())
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return Err(f"Waiting for {description} was cancelled")
+            response = await action_to_perform()
+            if response.status_code == 200 and condition_to_meet(response):
+                return Ok(response)
+            delay_result = self._get_next_delay(delays, started_at, description)
+            if is_err(delay_result):
+                return delay_result
+            if cancel_event is not None:
+                try:
+                    await asyncio.wait_for(
+                        cancel_event.wait(), timeout=delay_result.ok_value
+                    )
+                    return Err(f"Waiting for {description} was cancelled")
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(delay_result.ok_value)
@@ -0,0 +1,264 @@
+from datetime import datetime, timedelta
+import logging
+import pytest
+from botocore.config import Config
+from dateutil import tz
+from result import Ok, is_ok
+
+pytest.importorskip("pgraws")
+
+from mlcore_utils.model.aws import (
+    AWS_S3_Util,
+    AWS_STS_Credentials,
+    AWS_System_Manager,
+    PGR_STS_Credentials,
+)
+from mlcore_utils.model.common import MLCore_Secret
+
+
+class Fake_Credentials(object):
+    def __init__(self, client):
+        self.client = client
+
+    def get_client(self, service, region=None, config=None):
+        return Ok(self.client)
+
+
+class Fake_S3_Object_Client(object):
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise Exception("404")
+        return self.objects[(Bucket, Key)]
+
+    def put_object(self, Bucket, Key, Body, Metadata=None):
+        etag = f'"{len(self.objects)}"'
+        self.objects[(Bucket, Key)] = {"ETag": etag, "Metadata": Metadata or {}}
+        return {"ETag": etag}
+
+
+class Fake_Tarball(object):
+    source_directory = "archive"
+
+    def __init__(self):
+        self.writes = 0
+
+    def write_to(self, fileobj):
+        self.writes = self.writes + 1
+        fileobj.write(b"tarball")
+        return Ok("sha")
+
+
+def test_unchanged_tarballs_are_not_uploaded_again():
+    client = Fake_S3_Object_Client()
+    s3_util = AWS_S3_Util(Fake_Credentials(client), logging.getLogger(__name__))
+    tarball = Fake_Tarball()
+    upload = lambda digest: s3_util.upload_tarball_of_folder(
+        tarball=tarball, bucket="bucket", key="pipeline.tar.gz", content_digest=digest
+    )
+
+    first = upload("digest-1")
+    assert is_ok(first)
+    assert is_ok(upload("digest-1"))
+    assert tarball.writes == 1
+    assert upload("digest-1").ok_value == first.ok_value
+
+    assert is_ok(upload("digest-2"))
+    assert tarball.writes == 2
+
+
+class Fake_Paginator(object):
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class Fake_SSM_Client(object):
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.calls = []
+
+    def get_parameters(self, Names, WithDecryption):
+        if len(Names) > 10:
+            raise Exception("ValidationException: at most 10 names")
+        self.calls.append(list(Names))
+        return {
+            "Parameters": [
+                {"Name": n, "Value": self.parameters[n]}
+                for n in Names
+                if n in self.parameters
+            ],
+            "InvalidParameters": [n for n in Names if n not in self.parameters],
+        }
+
+    def get_paginator(self, name):
+        items = [{"Name": n, "Value": v} for n, v in sorted(self.parameters.items())]
+        return Fake_Paginator(
+            [{"Parameters": items[i : i + 10]} for i in range(0, len(items), 10)]
+        )
+
+
+def _get_system_manager(parameters, cache=None):
+    client = Fake_SSM_Client(parameters)
+    return client, AWS_System_Manager(
+        Fake_Credentials(client), logging.getLogger(__name__), cache
+    )
+
+
+def test_parameters_are_fetched_in_batches_of_ten():
+    parameters = {f"/blacklodge/p{i}": str(i) for i in range(23)}
+    client, ssm = _get_system_manager(parameters)
+    names = list(parameters) + ["/blacklodge/missing", "/blacklodge/p0"]
+    results = ssm.get_parameters(names)
+
+    assert [len(call) for call in client.calls] == [10, 10, 4]
+    assert results["/blacklodge/p7"].ok_value == "7"
+    assert "not found" in results["/blacklodge/missing"].err_value
+
+    # cached values are not asked for again, unknown names are
+    client.calls.clear()
+    ssm.get_parameters(["/blacklodge/p1", "/blacklodge/missing"])
+    assert client.calls == [["/blacklodge/missing"]]
+
+
+class Expiring_Cache(object):
+    """
+    Every entry expires right after contains() has seen it.
+    """
+
+    def contains(self, key):
+        return True
+
+    def get(self, key, default=None):
+        return default
+
+    def set_many(self, values, ttl_seconds=None):
+        pass
+
+
+def test_parameters_expiring_during_the_lookup_are_refetched():
+    client, ssm = _get_system_manager({"/blacklodge/p": "v"}, Expiring_Cache())
+    assert ssm.get_parameter_value("/blacklodge/p").ok_value == "v"
+    assert client.calls == [["/blacklodge/p"]]
+
+
+def test_parameters_by_path_read_every_page():
+    parameters = {f"/blacklodge/p{i:02}": str(i) for i in range(25)}
+    client, ssm = _get_system_manager(parameters)
+    result = ssm.get_parameters_by_path("/blacklodge")
+    assert result.ok_value == parameters
+    # and they are cached for single lookups
+    assert ssm.get_parameter_value("/blacklodge/p24").ok_value == "24"
+    assert client.calls == []
+
+
+class Fake_PGR_STS_Credentials(PGR_STS_Credentials):
+    """
+    Hands out key-1, key-2, ... each living the next of lifetimes seconds.
+    """
+
+    def __init__(self, lifetimes, duration=900, refresh_ahead_seconds=300):
+        super().__init__(
+            aws_account="123456789012",
+            role="role",
+            username="user",
+            password=MLCore_Secret("password"),
+            duration=duration,
+            logger=logging.getLogger(__name__),
+            refresh_ahead_seconds=refresh_ahead_seconds,
+        )
+        self.lifetimes = list(lifetimes)
+        self.fetches = 0
+
+    def get_creds_from_pgraws(self):
+        self.fetches = self.fetches + 1
+        return {
+            "AccessKeyId": f"key-{self.fetches}",
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": datetime.now(tz.UTC)
+            + timedelta(seconds=self.lifetimes.pop(0)),
+        }
+
+
+def test_sessions_refresh_expiring_pgr_sts_credentials():
+    credentials = Fake_PGR_STS_Credentials([100, 3600])
+    credentials.stop_refresh()
+    session = credentials.get_aws_session().ok_value
+    # key-1 is already inside botocore's refresh window, so it asks for key-2
+    frozen = session.get_credentials().get_frozen_credentials()
+    assert frozen.access_key == "key-2"
+    assert credentials.fetches == 2
+    assert session.get_credentials().method == "pgr-sts"
+
+
+def test_pgr_sts_credentials_are_renewed_ahead_of_expiry():
+    credentials = Fake_PGR_STS_Credentials([3600, 3600])
+    session = credentials.get_aws_session().ok_value
+    try:
+        # due refresh_ahead_seconds before the credentials expire
+        assert 3290 < credentials._refresh_timer.interval <= 3300
+        assert credentials.fetches == 1
+
+        credentials._credentials["Expiration"] = datetime.now(tz.UTC) + timedelta(
+            seconds=200
+        )
+        credentials._refresh_in_background()
+        assert credentials.fetches == 2
+        assert credentials.get_credentials()["AccessKeyId"] == "key-2"
+        assert 3290 < credentials._refresh_timer.interval <= 3300
+        # botocore gets them from the credentials without another exchange
+        assert session.get_credentials().get_frozen_credentials().secret_key
+        assert credentials.fetches == 2
+    finally:
+        credentials.stop_refresh()
+
+
+def test_short_pgr_sts_sessions_do_not_refresh_in_a_loop():
+    # refresh_ahead_seconds is longer than the whole session
+    credentials = Fake_PGR_STS_Credentials(
+        [600, 600, 30, 600], duration=600, refresh_ahead_seconds=900
+    )
+    credentials.get_aws_session()
+    try:
+        # half the duration ahead, not immediately
+        assert 290 < credentials._refresh_timer.interval <= 300
+        credentials._refresh_in_background()
+        assert credentials.fetches == 1
+
+        credentials._credentials["Expiration"] = datetime.now(tz.UTC) + timedelta(
+            seconds=200
+        )
+        credentials._refresh_in_background()
+        assert credentials.fetches == 2
+        assert 290 < credentials._refresh_timer.interval <= 300
+
+        # STS handing out less than asked for still waits a little
+        credentials._credentials["Expiration"] = datetime.now(tz.UTC)
+        credentials._refresh_in_background()
+        assert credentials.fetches == 3
+        assert (
+            credentials._refresh_timer.interval
+            == PGR_STS_Credentials.MIN_REFRESH_DELAY_SECONDS
+        )
+    finally:
+        credentials.stop_refresh()
+
+
+def test_clients_are_shared_by_equal_configs():
+    credentials = AWS_STS_Credentials(
+        "key", "secret", "token", logging.getLogger(__name__)
+    )
+    get_client = lambda config: credentials.get_client(
+        "s3", "us-east-1", config
+    ).ok_value
+
+    client = get_client(Config(max_pool_connections=20))
+    assert get_client(Config(max_pool_connections=20)) is client
+    assert get_client(Config(max_pool_connections=30)) is not client
+    assert get_client(None) is get_client(None)
+    assert len(credentials._clients) == 3
@@ -0,0 +1,133 @@
+from result import is_ok
+
+from mlcore_utils.model.cache import TTL_Cache
+from mlcore_utils.model.stratos_api import Stratos_Api_V1_Util
+from mlcore_utils.model.stratos_interface import (
+    Stratos_AppOwnersMetadata_V1,
+    Stratos_ProjectMetadata_V1,
+)
+
+
+class Fake_Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Fake_Response(object):
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = ""
+
+    def json(self):
+        return self.body
+
+
+class Fake_Stratos_Api_Caller(object):
+    stratos_url = "https://stratos.test"
+
+    def __init__(self, projects):
+        self.projects = projects
+        self.calls = []
+
+    def call_api(self, http_method, endpoint, json_data=None, params=None):
+        self.calls.append((http_method.name, endpoint))
+        if endpoint == "argocd/projects" and http_method.name == "GET":
+            return Fake_Response(200, self.projects)
+        if endpoint == "containerdeploy/application-owner":
+            return Fake_Response(200)
+        return Fake_Response(200)
+
+
+def test_entries_expire():
+    clock = Fake_Clock()
+    cache = TTL_Cache(ttl_seconds=10, clock=clock)
+    cache.set("a", False)
+    assert cache.contains("a")
+    assert cache.get("a", "missing") is False
+    clock.now += 11
+    assert cache.get("a", "missing") == "missing"
+
+
+def test_store_is_shared_between_instances(tmp_path):
+    store_path = str(tmp_path / "cache.json")
+    TTL_Cache(store_path=store_path).set("project", True)
+    assert TTL_Cache(store_path=store_path).get("project") is True
+    TTL_Cache(store_path=store_path).invalidate("project")
+    assert TTL_Cache(store_path=store_path).get("project") is None
+
+
+def test_processes_sharing_a_store_keep_each_others_entries(tmp_path):
+    store_path = str(tmp_path / "cache.json")
+    first = TTL_Cache(store_path=store_path)
+    second = TTL_Cache(store_path=store_path)
+    first.set("a", 1)
+    second.set("b", 2)
+    assert TTL_Cache(store_path=store_path).get("a") == 1
+    # a miss picks up what the other one stored since it started
+    assert first.get("b") == 2
+
+
+def _set_keys(store_path, prefix):
+    cache = TTL_Cache(store_path=store_path)
+    for i in range(20):
+        cache.set(f"{prefix}-{i}", i)
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    import multiprocessing
+
+    store_path = str(tmp_path / "cache.json")
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_set_keys, args=(store_path, f"p{n}")) for n in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    cache = TTL_Cache(store_path=store_path)
+    assert all(cache.contains(f"p{n}-{i}") for n in range(4) for i in range(20))
+
+
+def _project(identifier):
+    return Stratos_ProjectMetadata_V1(
+        environment_name=type("Env", (), {"value": "nonprod"})(),
+        application_name="app",
+        project_identifier=identifier,
+    )
+
+
+def test_projects_are_listed_once():
+    caller = Fake_Stratos_Api_Caller(["eds-team-nonprod"])
+    util = Stratos_Api_V1_Util(caller, existence_cache=TTL_Cache())
+    assert util.check_if_argocd_project_exists_using_stratos_sdk(
+        _project("team")
+    ).ok_value
+    assert not util.check_if_argocd_project_exists_using_stratos_sdk(
+        _project("other")
+    ).ok_value
+    assert caller.calls == [("GET", "argocd/projects")]
+
+    assert is_ok(util.create_argocd_project_using_stratos_sdk(_project("other")))
+    assert util.check_if_argocd_project_exists_using_stratos_sdk(
+        _project("other")
+    ).ok_value
+    assert caller.calls == [("GET", "argocd/projects"), ("POST", "argocd/projects")]
+
+
+def test_existing_app_owners_are_remembered():
+    caller = Fake_Stratos_Api_Caller([])
+    util = Stratos_Api_V1_Util(caller, existence_cache=TTL_Cache())
+    metadata = Stratos_AppOwnersMetadata_V1(
+        repository="repo",
+        repository_url="https://github.test/repo",
+        application_contact="team",
+        application_name="app",
+    )
+    for _ in range(3):
+        assert util.create_stratos_application(metadata).ok_value
+    assert caller.calls == [("GET", "containerdeploy/application-owner")]
@@ -0,0 +1,89 @@
+import threading
+import time
+import pytest
+from result import is_ok
+
+from mlcore_utils.model.cache import TTL_Cache
+from mlcore_utils.model.gh import Commit_Sha_Resolver, GitHub_Repo
+
+
+class Fake_Response(object):
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+
+class Fake_GitHub(object):
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, http_method, endpoint, headers=None):
+        with self._lock:
+            self.calls.append((endpoint, headers))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+        sha = f"sha-of-{endpoint.split('/')[5]}"
+        etag = f'"etag-{sha}"'
+        if headers and headers.get("If-None-Match") == etag:
+            return Fake_Response(304)
+        return Fake_Response(200, {"commit": {"sha": sha}}, {"ETag": etag})
+
+
+@pytest.fixture
+def fake_github(monkeypatch):
+    fake = Fake_GitHub()
+    monkeypatch.setattr(
+        GitHub_Repo,
+        "_call_github_api",
+        lambda self, *args, **kwargs: fake(*args, **kwargs),
+    )
+    return fake
+
+
+def _get_repo(name: str) -> GitHub_Repo:
+    return GitHub_Repo(
+        git_repo_url=f"https://github.com/PCDST/{name}",
+        git_repo_name=name,
+        git_repo_branch="main",
+        git_repo_path=None,
+        commit_sha=None,
+        tag=None,
+    )
+
+
+def test_a_deploy_asks_for_each_sha_once(fake_github):
+    resolver = Commit_Sha_Resolver(etag_cache=TTL_Cache())
+    repos = [_get_repo("containers"), _get_repo("customer"), _get_repo("charts")]
+    results = resolver.resolve_many(repos)
+
+    assert [r.ok_value for r in results] == [
+        "sha-of-containers",
+        "sha-of-customer",
+        "sha-of-charts",
+    ]
+    assert fake_github.max_in_flight == 3
+
+    repos[0].sha_resolver = resolver
+    for _ in range(3):
+        assert repos[0].get_commit_sha().ok_value == "sha-of-containers"
+    assert is_ok(resolver.resolve(_get_repo("customer")))
+    assert len(fake_github.calls) == 3
+
+
+def test_later_deploys_make_conditional_requests(fake_github):
+    etag_cache = TTL_Cache()
+    Commit_Sha_Resolver(etag_cache=etag_cache).resolve(_get_repo("customer"))
+
+    result = Commit_Sha_Resolver(etag_cache=etag_cache).resolve(_get_repo("customer"))
+    assert result.ok_value == "sha-of-customer"
+    assert fake_github.calls[-1][1] == {"If-None-Match": '"etag-sha-of-customer"'}
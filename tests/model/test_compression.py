@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+import pytest
+from result import is_ok
+
+from mlcore_utils.model.compression import Compression_Format, Parallel_Gzip_Writer
+from mlcore_utils.model.file import Tarball
+
+
+def _compressible_bytes(size: int) -> bytes:
+    words = [os.urandom(4).hex() for _ in range(512)]
+    out = io.BytesIO()
+    i = 0
+    while out.tell() < size:
+        out.write(words[(i * 7919) % len(words)].encode() + b" ")
+        i += 1
+    return out.getvalue()[:size]
+
+
+@pytest.mark.parametrize("size", [0, 10, 3 * 1024 * 1024 + 17])
+def test_parallel_gzip_is_plain_gzip(size):
+    data = _compressible_bytes(size)
+    out = io.BytesIO()
+    writer = Parallel_Gzip_Writer(out, threads=4, block_size=256 * 1024)
+    writer.write(data)
+    writer.close()
+    assert gzip.decompress(out.getvalue()) == data
+    assert not out.closed
+
+
+def test_priming_keeps_the_ratio_close_to_gzip():
+    data = _compressible_bytes(4 * 1024 * 1024)
+    out = io.BytesIO()
+    writer = Parallel_Gzip_Writer(out, compression_level=6, block_size=128 * 1024)
+    writer.write(data)
+    writer.close()
+    assert len(out.getvalue()) < 1.05 * len(gzip.compress(data, 6))
+
+
+def test_tarball_create_with_parallel_gzip(tmp_path):
+    source = tmp_path / "repo"
+    source.mkdir()
+    (source / "weights.bin").write_bytes(_compressible_bytes(2 * 1024 * 1024))
+    (source / "pipeline.py").write_text("print('hi')")
+
+    result = Tarball(str(source), "pipeline", str(tmp_path)).create(
+        compression_threads=4, compression_level=1
+    )
+    assert is_ok(result)
+    with tarfile.open(tmp_path / "pipeline.tar.gz", "r:gz") as tar:
+        assert sorted(tar.getnames()) == ["pipeline.py", "weights.bin"]
+
+
+def test_tarball_create_with_zstd(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    source = tmp_path / "repo"
+    source.mkdir()
+    (source / "pipeline.py").write_text("print('hi')")
+
+    tarball = Tarball(str(source), "pipeline", str(tmp_path))
+    assert is_ok(tarball.create(compression=Compression_Format.ZSTD))
+    with open(tmp_path / "pipeline.tar.zst", "rb") as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert tar.getnames() == ["pipeline.py"]
+
+
+def test_reproducible_tarball_ignores_checkout_metadata(tmp_path):
+    digests = []
+    for i, name in enumerate(["first", "second"]):
+        source = tmp_path / name / "repo"
+        (source / "src").mkdir(parents=True)
+        files = ["b.py", "a.py"] if i else ["a.py", "b.py"]
+        for file_name in files:
+            (source / "src" / file_name).write_text(file_name)
+            os.utime(source / "src" / file_name, (i, i))
+        (source / "README.md").write_text("readme")
+        (source / "README.md").chmod(0o664 if i else 0o644)
+
+        tarball = Tarball(
+            str(source), "pipeline", str(tmp_path / name), reproducible=True
+        )
+        assert is_ok(tarball.create())
+        digests.append(tarball.digest)
+        data = (tmp_path / name / "pipeline.tar.gz").read_bytes()
+        assert hashlib.sha256(data).hexdigest() == tarball.digest
+
+    assert digests[0] == digests[1]
+    with tarfile.open(tmp_path / "first" / "pipeline.tar.gz") as tar:
+        assert tar.getnames() == ["README.md", "src", "src/a.py", "src/b.py"]
+        assert {m.mtime for m in tar.getmembers()} == {0}
+
+
+def test_reproducible_tarball_honours_compression_level_zero(tmp_path):
+    source = tmp_path / "repo"
+    source.mkdir()
+    (source / "weights.bin").write_bytes(_compressible_bytes(1024 * 1024))
+
+    tarball = Tarball(str(source), "pipeline", str(tmp_path), reproducible=True)
+    assert is_ok(tarball.create(compression_level=0))
+    # level 0 only stores, it must not fall back to level 9
+    assert (tmp_path / "pipeline.tar.gz").stat().st_size > 1024 * 1024
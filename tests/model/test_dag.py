@@ -0,0 +1,160 @@
+import threading
+import time
+from result import Ok, Err, is_ok, is_err
+
+from mlcore_utils.model.dag import Dag_Executor, Dag_Node
+
+
+class Call_Recorder(object):
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def action(self, name, result=None, sleep_seconds=0.0):
+        def _action(dependency_values):
+            time.sleep(sleep_seconds)
+            with self._lock:
+                self.calls.append(name)
+            return result if result is not None else Ok(name)
+
+        return _action
+
+
+def test_independent_nodes_run_concurrently():
+    recorder = Call_Recorder()
+    executor = Dag_Executor(max_workers=4)
+    nodes = [
+        Dag_Node(name, recorder.action(name, sleep_seconds=0.2))
+        for name in ["namespace", "project", "app_owner"]
+    ]
+    nodes.append(
+        Dag_Node("helm", recorder.action("helm"), ["namespace", "project", "app_owner"])
+    )
+    started = time.monotonic()
+    results = executor.run(nodes)
+    assert time.monotonic() - started < 0.5
+    assert all(is_ok(r) for r in results.values())
+    assert recorder.calls[-1] == "helm"
+
+
+def test_dependency_values_are_passed_on():
+    executor = Dag_Executor()
+    results = executor.run(
+        [
+            Dag_Node("a", lambda _: Ok(1)),
+            Dag_Node("b", lambda deps: Ok(deps["a"] + 1), ["a"]),
+        ]
+    )
+    assert results["b"] == Ok(2)
+
+
+def test_failed_dependency_skips_dependents():
+    recorder = Call_Recorder()
+    executor = Dag_Executor()
+    results = executor.run(
+        [
+            Dag_Node("project", recorder.action("project", Err("boom"))),
+            Dag_Node("helm", recorder.action("helm"), ["project"]),
+        ]
+    )
+    assert is_err(results["helm"])
+    assert "boom" in results["helm"].err_value
+    assert recorder.calls == ["project"]
+
+
+def test_run_after_orders_without_propagating_failure():
+    recorder = Call_Recorder()
+    executor = Dag_Executor()
+    results = executor.run(
+        [
+            Dag_Node("helm", recorder.action("helm"), run_after=["namespace"]),
+            Dag_Node(
+                "namespace",
+                recorder.action("namespace", Err("boom"), sleep_seconds=0.1),
+            ),
+        ]
+    )
+    assert is_err(results["namespace"])
+    assert results["helm"] == Ok("helm")
+    assert recorder.calls == ["namespace", "helm"]
+
+
+def test_shared_nodes_run_once_per_run():
+    recorder = Call_Recorder()
+    executor = Dag_Executor()
+    nodes = [
+        Dag_Node("namespace", recorder.action("namespace")),
+        Dag_Node("namespace", recorder.action("namespace")),
+        Dag_Node("pipeline", recorder.action("pipeline"), ["namespace"]),
+    ]
+    results = executor.run(nodes)
+    assert is_ok(results["pipeline"])
+    assert recorder.calls == ["namespace", "pipeline"]
+
+    # a reused executor deploys again
+    executor.run(nodes)
+    assert recorder.calls == ["namespace", "pipeline", "namespace", "pipeline"]
+
+
+def test_concurrent_runs_share_in_flight_nodes():
+    recorder = Call_Recorder()
+    executor = Dag_Executor()
+    node = Dag_Node("namespace", recorder.action("namespace", sleep_seconds=0.2))
+    threads = [threading.Thread(target=executor.run, args=([node],)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert recorder.calls == ["namespace"]
+
+
+def test_failed_nodes_are_retried_on_next_run():
+    attempts = []
+
+    def _flaky(_):
+        attempts.append(1)
+        return Err("flaky") if len(attempts) == 1 else Ok(True)
+
+    executor = Dag_Executor()
+    assert is_err(executor.run([Dag_Node("a", _flaky)])["a"])
+    assert is_ok(executor.run([Dag_Node("a", _flaky)])["a"])
+
+
+def test_exceptions_and_cycles_become_errs():
+    executor = Dag_Executor()
+
+    def _raises(_):
+        raise ValueError("bad")
+
+    results = executor.run(
+        [
+            Dag_Node("raises", _raises),
+            Dag_Node("x", lambda _: Ok(1), ["y"]),
+            Dag_Node("y", lambda _: Ok(1), ["x"]),
+            Dag_Node("z", lambda _: Ok(1), ["missing"]),
+        ]
+    )
+    assert is_err(results["raises"])
+    assert is_err(results["x"])
+    assert is_err(results["y"])
+    assert is_err(results["z"])
+
+
+def test_max_running_bounds_concurrency():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def _action(_):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        return Ok(True)
+
+    executor = Dag_Executor(max_workers=8)
+    results = executor.run([Dag_Node(i, _action) for i in range(10)], max_running=2)
+    assert all(is_ok(r) for r in results.values())
+    assert max(peak) <= 2
@@ -0,0 +1,170 @@
+import os
+import shutil
+import subprocess
+import pytest
+from result import is_err, is_ok
+
+from mlcore_utils.model.dvc_utils import (
+    DVC_Fetch_Options,
+    DVC_Fetcher,
+    DVC_Outputs_Index,
+    find_dvc_marker,
+)
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def dvc_origin(tmp_path):
+    from dvc.repo import Repo
+
+    path = tmp_path / "origin"
+    path.mkdir()
+    _git(path, "init", "-b", "main")
+    _git(path, "config", "user.email", "dev@example.com")
+    _git(path, "config", "user.name", "dev")
+    try:
+        repo = Repo.init(str(path))
+    except ImportError as e:
+        # dvc pins an older pathspec than some environments have installed
+        pytest.skip(f"dvc is not importable here: {e}")
+    with repo.config.edit() as conf:
+        conf["remote"]["storage"] = {"url": str(tmp_path / "remote")}
+        conf["core"]["remote"] = "storage"
+    (path / "model.bin").write_bytes(os.urandom(64 * 1024))
+    repo.add(str(path / "model.bin"))
+    repo.push()
+    repo.close()
+    _git(path, "add", "-A")
+    _git(path, "commit", "-m", "model")
+    return path
+
+
+@pytest.fixture
+def dvc_subdir_origin(tmp_path):
+    from dvc.repo import Repo
+
+    path = tmp_path / "origin"
+    project = path / "models" / "bert"
+    project.mkdir(parents=True)
+    _git(path, "init", "-b", "main")
+    _git(path, "config", "user.email", "dev@example.com")
+    _git(path, "config", "user.name", "dev")
+    try:
+        repo = Repo.init(str(project), subdir=True)
+    except ImportError as e:
+        pytest.skip(f"dvc is not importable here: {e}")
+    with repo.config.edit() as conf:
+        conf["remote"]["storage"] = {"url": str(tmp_path / "remote")}
+        conf["core"]["remote"] = "storage"
+    (project / "weights.bin").write_bytes(os.urandom(1024))
+    repo.add(str(project / "weights.bin"))
+    repo.push()
+    repo.close()
+    _git(path, "add", "-A")
+    _git(path, "commit", "-m", "model")
+    return path
+
+
+def _clone(origin, to_path):
+    _git(origin.parent, "clone", "-q", str(origin), str(to_path))
+    return str(to_path)
+
+
+def test_pull_reuses_the_shared_cache(dvc_origin, tmp_path):
+    options = DVC_Fetch_Options(jobs=2, cache_directory=str(tmp_path / "cache"))
+
+    first = DVC_Fetcher(_clone(dvc_origin, tmp_path / "v1"), options)
+    assert first.has_tracked_outputs()
+    result = first.pull()
+    first.close()
+    assert is_ok(result)
+    assert result.ok_value["fetched"] == 1
+
+    # a later registration of the same data does not download it again
+    shutil.rmtree(tmp_path / "remote")
+    second = DVC_Fetcher(_clone(dvc_origin, tmp_path / "v2"), options)
+    result = second.pull()
+    second.close()
+    assert is_ok(result)
+    assert result.ok_value["fetched"] == 0
+    assert (tmp_path / "v2" / "model.bin").read_bytes() == (
+        dvc_origin / "model.bin"
+    ).read_bytes()
+    assert not os.path.exists(tmp_path / "v2" / ".dvc" / "cache" / "files")
+
+
+def test_subdir_projects_are_pulled(dvc_subdir_origin, tmp_path):
+    options = DVC_Fetch_Options(cache_directory=str(tmp_path / "cache"))
+    fetcher = DVC_Fetcher(_clone(dvc_subdir_origin, tmp_path / "clone"), options)
+    assert fetcher.has_tracked_outputs()
+    result = fetcher.pull()
+    fetcher.close()
+    assert is_ok(result)
+    assert result.ok_value["fetched"] == 1
+    assert (tmp_path / "clone" / "models" / "bert" / "weights.bin").exists()
+
+
+def test_unreadable_dvc_files_fail_the_pull(tmp_path):
+    (tmp_path / "weights.bin.dvc").write_text("outs: [unclosed")
+    fetcher = DVC_Fetcher(str(tmp_path))
+    assert fetcher.has_tracked_outputs()
+    result = fetcher.pull()
+    assert is_err(result)
+    assert "weights.bin.dvc is not valid yaml" in result.err_value
+
+
+def test_repos_without_dvc_are_skipped(tmp_path):
+    fetcher = DVC_Fetcher(str(tmp_path))
+    assert not fetcher.has_tracked_outputs()
+    assert fetcher.pull().ok_value == {"fetched": 0}
+
+
+def test_nested_dvc_files_are_detected(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "x.dvc").write_text("")
+    assert find_dvc_marker(str(tmp_path)) is None
+
+    (tmp_path / "models" / "bert").mkdir(parents=True)
+    (tmp_path / "models" / "bert" / "weights.dvc").write_text("outs: []")
+    assert find_dvc_marker(str(tmp_path)).endswith("weights.dvc")
+
+
+def test_index_knows_what_a_pull_will_fetch(tmp_path):
+    (tmp_path / "models").mkdir()
+    (tmp_path / "models" / "weights.bin.dvc").write_text(
+        "outs:\n- md5: aa11\n  size: 100\n  hash: md5\n  path: weights.bin\n"
+    )
+    (tmp_path / "dvc.lock").write_text(
+        "schema: '2.0'\n"
+        "stages:\n"
+        "  train:\n"
+        "    outs:\n"
+        "    - path: data\n"
+        "      md5: bb22.dir\n"
+        "      size: 300\n"
+        "      nfiles: 2\n"
+        "      hash: md5\n"
+    )
+    index = DVC_Outputs_Index.from_folder(str(tmp_path))
+    assert sorted(o.path for o in index.outputs) == ["data", "models/weights.bin"]
+    assert index.total_size == 400
+    assert index.number_of_files == 3
+
+    cache = tmp_path / "cache" / "files" / "md5"
+    (cache / "aa").mkdir(parents=True)
+    (cache / "aa" / "11").write_text("weights")
+    assert index.get_bytes_to_fetch(str(tmp_path / "cache")) == 300
+
+    (cache / "bb").mkdir()
+    (cache / "bb" / "22.dir").write_text(
+        '[{"md5": "cc33", "relpath": "a.csv"}, {"md5": "dd44", "relpath": "b.csv"}]'
+    )
+    (cache / "cc").mkdir()
+    (cache / "cc" / "33").write_text("a")
+    assert index.get_bytes_to_fetch(str(tmp_path / "cache")) == 300
+    (cache / "dd").mkdir()
+    (cache / "dd" / "44").write_text("b")
+    assert index.get_bytes_to_fetch(str(tmp_path / "cache")) == 0
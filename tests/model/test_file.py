@@ -0,0 +1,35 @@
+import io
+import os
+
+from mlcore_utils.model.file import Generator_To_FileLike
+
+
+def test_generator_of_str_and_bytes_reads_back_whole():
+    stream = Generator_To_FileLike(iter(["line one\n", b"line ", "two\n", "", "end"]))
+    assert stream.readline() == b"line one\n"
+    assert stream.readline() == b"line two\n"
+    assert stream.read() == b"end"
+    assert stream.read() == b""
+
+
+def test_reads_are_full_sized_across_chunks():
+    payload = os.urandom(5 * 1024 * 1024 + 7)
+    chunks = (payload[i : i + 1000] for i in range(0, len(payload), 1000))
+    stream = Generator_To_FileLike(chunks)
+    parts = []
+    while True:
+        part = stream.read(1024 * 1024)
+        if not part:
+            break
+        parts.append(part)
+    assert [len(p) for p in parts] == [1024 * 1024] * 5 + [7]
+    assert b"".join(parts) == payload
+    assert not stream.seekable()
+
+
+def test_readinto_fills_the_callers_buffer():
+    stream = Generator_To_FileLike(iter([b"abc", b"defg"]), buffer_size=2)
+    buffer = bytearray(6)
+    assert stream.readinto(buffer) == 6
+    assert bytes(buffer) == b"abcdef"
+    assert isinstance(stream, io.BufferedIOBase)
@@ -0,0 +1,157 @@
+import os
+import subprocess
+import pytest
+from result import Ok, is_ok
+
+from mlcore_utils.model.common import MLCore_Secret
+from mlcore_utils.model.gh import (
+    Git_Clone_Options,
+    Git_Partial_Clone_Filter,
+    GitHub_Repo,
+)
+from mlcore_utils.model.git_mirror_cache import Git_Mirror_Cache
+
+
+def _git(cwd, *args):
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def origin(tmp_path):
+    path = tmp_path / "origin"
+    path.mkdir()
+    _git(path, "init", "-b", "main")
+    _git(path, "config", "user.email", "dev@example.com")
+    _git(path, "config", "user.name", "dev")
+    _git(path, "config", "uploadpack.allowFilter", "true")
+    _git(path, "config", "uploadpack.allowAnySHA1InWant", "true")
+    for i in range(3):
+        (path / "pipeline").mkdir(exist_ok=True)
+        (path / "pipeline" / "main.py").write_text(f"print({i})")
+        (path / "other").mkdir(exist_ok=True)
+        (path / "other" / "data.csv").write_text(f"{i}")
+        (path / "requirements.txt").write_text("attrs")
+        _git(path, "add", "-A")
+        _git(path, "commit", "-m", f"commit {i}")
+    return path
+
+
+def _get_repo(origin, tmp_path, **kwargs) -> GitHub_Repo:
+    repo = GitHub_Repo(
+        git_repo_url=f"https://github.com/PCDST/{origin.name}",
+        git_repo_name="clone",
+        git_repo_branch="main",
+        local_path_to_clone_into=str(tmp_path),
+        **kwargs,
+    )
+    repo.repo_url_with_auth = Ok(MLCore_Secret(f"file://{origin}"))
+    return repo
+
+
+def test_default_clone_is_shallow(origin, tmp_path):
+    repo = _get_repo(origin, tmp_path, git_repo_path=None, commit_sha=None, tag=None)
+    repo.clone_repo_and_checkout()
+
+    folder = repo.get_local_repo_folder()
+    assert _git(folder, "rev-list", "--count", "HEAD") == "1"
+    assert open(os.path.join(folder, "pipeline", "main.py")).read() == "print(2)"
+
+
+def test_clone_of_a_commit(origin, tmp_path):
+    first_commit = _git(origin, "rev-list", "--max-parents=0", "HEAD")
+    repo = _get_repo(
+        origin, tmp_path, git_repo_path=None, commit_sha=first_commit, tag=None
+    )
+    repo.clone_repo_and_checkout()
+
+    folder = repo.get_local_repo_folder()
+    assert _git(folder, "rev-parse", "HEAD") == first_commit
+    assert open(os.path.join(folder, "pipeline", "main.py")).read() == "print(0)"
+
+
+def test_sparse_blobless_clone_only_checks_out_the_pipeline(origin, tmp_path):
+    repo = _get_repo(
+        origin,
+        tmp_path,
+        git_repo_path="pipeline",
+        commit_sha=None,
+        tag=None,
+        clone_options=Git_Clone_Options(
+            filter=Git_Partial_Clone_Filter.BLOBLESS, sparse_checkout=True
+        ),
+    )
+    assert is_ok(repo.clone_repo())
+
+    folder = repo.get_local_repo_folder()
+    assert sorted(os.listdir(folder)) == [".git", "pipeline", "requirements.txt"]
+    assert open(os.path.join(folder, "pipeline", "main.py")).read() == "print(2)"
+
+
+def test_clones_reuse_the_mirror(origin, tmp_path):
+    cache = Git_Mirror_Cache(cache_directory=str(tmp_path / "mirrors"))
+    repo = _get_repo(
+        origin,
+        tmp_path,
+        git_repo_path=None,
+        commit_sha=None,
+        tag=None,
+        mirror_cache=cache,
+    )
+    repo.clone_repo_and_checkout()
+
+    mirror = cache.get_mirror_path("pcdst_clone")
+    assert _git(mirror, "rev-parse", "main") == _git(origin, "rev-parse", "main")
+    # a shallow clone only brings the requested branch into the mirror, shallow too
+    assert _git(mirror, "for-each-ref", "--format=%(refname)") == "refs/heads/main"
+    assert _git(mirror, "rev-list", "--count", "main") == "1"
+    assert str(origin) not in open(os.path.join(mirror, "config")).read()
+    assert _git(repo.get_local_repo_folder(), "remote", "get-url", "origin") == (
+        f"file://{mirror}"
+    )
+
+    (origin / "pipeline" / "main.py").write_text("print(3)")
+    _git(origin, "commit", "-am", "commit 3")
+    repo = _get_repo(
+        origin,
+        tmp_path,
+        git_repo_path=None,
+        commit_sha=None,
+        tag=None,
+        mirror_cache=cache,
+        clone_options=Git_Clone_Options.full(),
+    )
+    repo.clone_repo_and_checkout()
+    folder = repo.get_local_repo_folder()
+    assert open(os.path.join(folder, "pipeline", "main.py")).read() == "print(3)"
+
+
+def test_commits_are_cloned_through_the_mirror(origin, tmp_path):
+    cache = Git_Mirror_Cache(cache_directory=str(tmp_path / "mirrors"))
+    first_commit = _git(origin, "rev-list", "--max-parents=0", "HEAD")
+    repo = _get_repo(
+        origin,
+        tmp_path,
+        git_repo_path=None,
+        commit_sha=first_commit,
+        tag=None,
+        mirror_cache=cache,
+    )
+    repo.clone_repo_and_checkout()
+
+    folder = repo.get_local_repo_folder()
+    assert _git(folder, "rev-parse", "HEAD") == first_commit
+    assert open(os.path.join(folder, "pipeline", "main.py")).read() == "print(0)"
+
+
+def test_least_recently_used_mirrors_are_evicted(origin, tmp_path):
+    cache = Git_Mirror_Cache(cache_directory=str(tmp_path / "mirrors"))
+    for key in ["a", "b"]:
+        with cache.open_mirror(key, f"file://{origin}") as mirror_result:
+            assert is_ok(mirror_result)
+
+    cache.max_size_bytes = 1
+    assert cache.evict(keep=["b"]) == ["a"]
+    assert not os.path.exists(cache.get_mirror_path("a"))
+    assert os.path.exists(cache.get_mirror_path("b"))
@@ -0,0 +1,146 @@
+import io
+import tarfile
+import pytest
+from result import Ok, is_ok
+
+from mlcore_utils.model.gh import GitHub_Repo
+
+
+class Fake_Archive_Response(object):
+    def __init__(self, data: bytes):
+        self.raw = io.BytesIO(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.raw.close()
+
+
+def _make_github_archive() -> bytes:
+    # GitHub puts everything under <org>-<repo>-<short sha>/
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode="w:gz", format=tarfile.PAX_FORMAT) as tar:
+        tar.pax_headers = {"comment": "abc123"}
+        for name, data in [
+            ("PCDST-repo-abc123/", None),
+            ("PCDST-repo-abc123/.github/", None),
+            ("PCDST-repo-abc123/.github/ci.yml", b"ci"),
+            ("PCDST-repo-abc123/requirements.txt", b"attrs"),
+            ("PCDST-repo-abc123/pipelines/", None),
+            ("PCDST-repo-abc123/pipelines/a/", None),
+            ("PCDST-repo-abc123/pipelines/a/main.py", b"print('a')"),
+            ("PCDST-repo-abc123/pipelines/b/", None),
+            ("PCDST-repo-abc123/pipelines/b/main.py", b"print('b')"),
+        ]:
+            info = tarfile.TarInfo(name)
+            if data is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+
+@pytest.fixture
+def github_repo(monkeypatch, tmp_path):
+    archive = _make_github_archive()
+    monkeypatch.setattr(
+        GitHub_Repo, "open_archive", lambda self, ref: Fake_Archive_Response(archive)
+    )
+    monkeypatch.setattr(GitHub_Repo, "get_commit_sha", lambda self: Ok("abc123"))
+    return GitHub_Repo(
+        git_repo_url="https://github.com/PCDST/repo",
+        git_repo_name="repo",
+        git_repo_branch="main",
+        git_repo_path="pipelines/a",
+        commit_sha=None,
+        tag=None,
+        local_path_to_clone_into=str(tmp_path),
+    )
+
+
+def test_archive_is_repacked_relative_to_the_repo_root(github_repo):
+    out = io.BytesIO()
+    result = github_repo.get_archive_tar_ball().write_to(out)
+    assert is_ok(result)
+    assert result.ok_value == "abc123"
+
+    with tarfile.open(fileobj=io.BytesIO(out.getvalue()), mode="r:gz") as tar:
+        assert tar.getnames() == [
+            "requirements.txt",
+            "pipelines",
+            "pipelines/a",
+            "pipelines/a/main.py",
+        ]
+        assert tar.extractfile("pipelines/a/main.py").read() == b"print('a')"
+
+
+def test_archive_is_extracted_without_a_clone(github_repo):
+    result = github_repo.download_archive()
+    assert is_ok(result)
+    folder = result.ok_value
+    assert open(f"{folder}/pipelines/a/main.py").read() == "print('a')"
+    assert open(f"{folder}/requirements.txt").read() == "attrs"
+
+
+def test_clone_and_archive_package_the_same_tree(github_repo, tmp_path):
+    from mlcore_utils.model.incremental_tarball import Incremental_Tarball
+
+    folder = github_repo.download_archive().ok_value
+    (tmp_path / "cache").mkdir()
+    clone_tarball = Incremental_Tarball(
+        folder,
+        "pipeline",
+        cache_directory=str(tmp_path / "cache"),
+        repo_path=github_repo.git_repo_path,
+    )
+    archive_out, clone_out = io.BytesIO(), io.BytesIO()
+    github_repo.get_archive_tar_ball().write_to(archive_out)
+    clone_tarball.write_to(clone_out)
+
+    def _names(data):
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+            return sorted(tar.getnames())
+
+    assert _names(clone_out.getvalue()) == _names(archive_out.getvalue())
+
+
+class Fake_Tree_Response(object):
+    status_code = 200
+
+    def __init__(self, paths, truncated=False):
+        self._body = {"tree": [{"path": p} for p in paths], "truncated": truncated}
+
+    def json(self):
+        return self._body
+
+
+def _has_dvc_config(monkeypatch, github_repo, paths, truncated=False):
+    monkeypatch.setattr(
+        GitHub_Repo,
+        "_call_github_api",
+        lambda self, *args, **kwargs: Fake_Tree_Response(paths, truncated),
+    )
+    return github_repo.has_dvc_config().ok_value
+
+
+def test_dvc_is_found_at_the_root_and_under_the_pipeline(monkeypatch, github_repo):
+    plain = ["requirements.txt", "pipelines", "pipelines/a", "pipelines/a/main.py"]
+    assert not _has_dvc_config(monkeypatch, github_repo, plain)
+    assert _has_dvc_config(monkeypatch, github_repo, plain + [".dvc", ".dvc/config"])
+    # dvc init --subdir
+    assert _has_dvc_config(
+        monkeypatch,
+        github_repo,
+        plain + ["pipelines/a/.dvc", "pipelines/a/.dvc/config"],
+    )
+    assert _has_dvc_config(
+        monkeypatch, github_repo, plain + ["pipelines/a/data/weights.bin.dvc"]
+    )
+    # dvc data of another pipeline is not packaged
+    assert not _has_dvc_config(
+        monkeypatch, github_repo, plain + ["pipelines/b/.dvc", "pipelines/b/x.dvc"]
+    )
+    assert _has_dvc_config(monkeypatch, github_repo, plain, truncated=True)
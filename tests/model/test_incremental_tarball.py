@@ -0,0 +1,183 @@
+import io
+import os
+import tarfile
+import zlib
+from result import is_ok
+
+from mlcore_utils.model.incremental_tarball import Incremental_Tarball, crc32_combine
+
+
+def _make_repo(root):
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "pipeline.py").write_text("print('v1')")
+    (root / "src" / "model.bin").write_bytes(os.urandom(256 * 1024))
+    (root / "README.md").write_text("readme")
+    (root / ".git").mkdir()
+    (root / ".git" / "HEAD").write_text("ref: refs/heads/main")
+
+
+def _build(tarball):
+    out = io.BytesIO()
+    result = tarball.write_to(out)
+    assert is_ok(result)
+    return result.ok_value, out.getvalue()
+
+
+def test_archive_is_a_valid_tar_gz(tmp_path):
+    _make_repo(tmp_path / "repo")
+    tarball = Incremental_Tarball(
+        str(tmp_path / "repo"), "pipeline", cache_directory=str(tmp_path / "cache")
+    )
+    summary, data = _build(tarball)
+
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        assert tar.getnames() == [
+            "README.md",
+            "src",
+            "src/model.bin",
+            "src/pipeline.py",
+        ]
+        assert tar.extractfile("src/pipeline.py").read() == b"print('v1')"
+        assert all(m.mtime == 0 and m.uid == 0 for m in tar.getmembers())
+    assert summary.new_chunks == 4
+
+
+def test_archive_is_a_single_gzip_member(tmp_path):
+    _make_repo(tmp_path / "repo")
+    for i in range(20):
+        (tmp_path / "repo" / "src" / f"part_{i}.py").write_text(f"part = {i}\n" * i)
+    tarball = Incremental_Tarball(
+        str(tmp_path / "repo"), "pipeline", cache_directory=str(tmp_path / "cache")
+    )
+    _build(tarball)
+    _, data = _build(tarball)
+
+    # a stream reader stops after the first gzip member
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r|gz") as tar:
+        names = [member.name for member in tar]
+    assert len(names) == 24 and names[-1] == "src/pipeline.py"
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    decompressor.decompress(data)
+    assert decompressor.eof and decompressor.unused_data == b""
+
+
+def test_crc32_combine_matches_zlib():
+    a, b = os.urandom(1000), os.urandom(70000)
+    assert crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b)) == zlib.crc32(a + b)
+    assert crc32_combine(zlib.crc32(a), zlib.crc32(b""), 0) == zlib.crc32(a)
+
+
+def test_files_changed_after_the_scan_fail_the_build(tmp_path):
+    _make_repo(tmp_path / "repo")
+    tarball = Incremental_Tarball(
+        str(tmp_path / "repo"), "pipeline", cache_directory=str(tmp_path / "cache")
+    )
+    scan = tarball.scan().ok_value
+    # grown by more than a block, and same size with other contents
+    model = tmp_path / "repo" / "src" / "model.bin"
+    model.write_bytes(model.read_bytes() + os.urandom(4 * 1024 * 1024))
+    (tmp_path / "repo" / "src" / "pipeline.py").write_text("print('v3')")
+
+    result = tarball.write_to(io.BytesIO(), scan)
+    assert "changed while it was archived" in result.err_value
+    chunks = os.listdir(tmp_path / "cache" / "pipeline" / "chunks")
+    assert len(chunks) == 2 and all(c.endswith(".deflate") for c in chunks)
+
+    # the next build packages what is on disk now
+    _, data = _build(tarball)
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r|gz") as tar:
+        for member in tar:
+            if member.name == "src/pipeline.py":
+                assert tar.extractfile(member).read() == b"print('v3')"
+
+
+def test_only_changed_files_are_compressed(tmp_path):
+    _make_repo(tmp_path / "repo")
+    tarball = Incremental_Tarball(
+        str(tmp_path / "repo"), "pipeline", cache_directory=str(tmp_path / "cache")
+    )
+    first, _ = _build(tarball)
+
+    (tmp_path / "repo" / "src" / "pipeline.py").write_text("print('v2')")
+    second, data = _build(tarball)
+    assert second.new_chunks == 1
+    assert second.reused_chunks == 3
+    assert second.digest != first.digest
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        assert tar.extractfile("src/pipeline.py").read() == b"print('v2')"
+
+
+def test_digest_only_depends_on_contents(tmp_path):
+    # a fresh clone of the same commit gets new mtimes but the same digest
+    _make_repo(tmp_path / "a")
+    _make_repo(tmp_path / "b")
+    (tmp_path / "b" / "src" / "model.bin").write_bytes(
+        (tmp_path / "a" / "src" / "model.bin").read_bytes()
+    )
+    os.utime(tmp_path / "b" / "README.md", (1, 1))
+    cache = str(tmp_path / "cache")
+    a = Incremental_Tarball(str(tmp_path / "a"), "pipeline", cache_directory=cache)
+    b = Incremental_Tarball(str(tmp_path / "b"), "pipeline", cache_directory=cache)
+    assert a.scan().ok_value.digest == b.scan().ok_value.digest
+
+    _build(a)
+    summary, _ = _build(b)
+    assert summary.new_chunks == 0
+
+
+def test_branches_sharing_a_cache_keep_their_chunks(tmp_path):
+    _make_repo(tmp_path / "main")
+    _make_repo(tmp_path / "feature")
+    (tmp_path / "feature" / "src" / "pipeline.py").write_text("print('feature')")
+    cache = str(tmp_path / "cache")
+    main = Incremental_Tarball(
+        str(tmp_path / "main"), "pipeline", cache_directory=cache
+    )
+    feature = Incremental_Tarball(
+        str(tmp_path / "feature"), "pipeline", cache_directory=cache
+    )
+    _build(main)
+    _build(feature)
+    summary, _ = _build(main)
+    assert summary.new_chunks == 0
+
+    # chunks nobody used within max_unused_chunk_seconds are pruned
+    main.max_unused_chunk_seconds = -1
+    _build(main)
+    assert len(os.listdir(tmp_path / "cache" / "pipeline" / "chunks")) == 4
+
+
+def test_chunks_are_not_pruned_while_another_build_runs(tmp_path):
+    _make_repo(tmp_path / "repo")
+    tarball = Incremental_Tarball(
+        str(tmp_path / "repo"),
+        "pipeline",
+        cache_directory=str(tmp_path / "cache"),
+        max_unused_chunk_seconds=-1,
+    )
+    _build(tarball)
+    (tmp_path / "repo" / "src" / "pipeline.py").write_text("print('v2')")
+    with tarball._lock(exclusive=False):
+        _build(tarball)
+    assert len(os.listdir(tmp_path / "cache" / "pipeline" / "chunks")) == 5
+
+
+def test_repo_path_limits_the_packaged_tree(tmp_path):
+    _make_repo(tmp_path / "repo")
+    (tmp_path / "repo" / "other").mkdir()
+    (tmp_path / "repo" / "other" / "big.bin").write_bytes(b"x")
+    tarball = Incremental_Tarball(
+        str(tmp_path / "repo"),
+        "pipeline",
+        cache_directory=str(tmp_path / "cache"),
+        repo_path="src",
+    )
+    _, data = _build(tarball)
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        assert tar.getnames() == [
+            "README.md",
+            "other",
+            "src",
+            "src/model.bin",
+            "src/pipeline.py",
+        ]
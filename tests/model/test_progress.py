@@ -0,0 +1,95 @@
+import threading
+
+from mlcore_utils.model.progress import MiB, Progress_Reporter
+
+
+class Fake_Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_reports_are_rate_limited_and_carry_throughput():
+    clock = Fake_Clock()
+    snapshots = []
+    reporter = Progress_Reporter(
+        tag="model.tar.gz Upload",
+        total_bytes=100 * MiB,
+        metrics_sink=snapshots.append,
+        report_interval_seconds=5,
+        report_every_percent=50,
+        clock=clock,
+    )
+    # many small callbacks within the interval and below the threshold report nothing
+    for _ in range(100):
+        clock.now = clock.now + 0.01
+        reporter(100 * 1024)
+    assert snapshots == []
+
+    clock.now = 10.0
+    reporter(0)
+    assert len(snapshots) == 1
+    # 10 240 000 bytes in 10s
+    assert snapshots[0].bytes_per_second == 1024000
+    assert snapshots[0].eta_seconds == (100 * MiB - 10240000) / 1024000
+
+    # crossing report_every_percent reports before the interval is up
+    clock.now = 11.0
+    reporter(60 * MiB)
+    assert len(snapshots) == 2
+    assert snapshots[1].percentage > 60
+
+    final = reporter.finish()
+    assert final.is_final and snapshots[-1] is final
+    assert final.bytes_done == 60 * MiB + 100 * 100 * 1024
+
+
+def test_bytes_from_every_thread_are_counted():
+    reporter = Progress_Reporter(tag="upload", report_interval_seconds=3600)
+
+    def upload_parts():
+        for _ in range(1000):
+            reporter(7)
+
+    threads = [threading.Thread(target=upload_parts) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert reporter.bytes_done == 8 * 1000 * 7
+    assert reporter.finish().percentage is None
+
+
+def test_the_threshold_counts_the_bytes_of_every_thread():
+    snapshots = []
+    reporter = Progress_Reporter(
+        tag="upload",
+        total_bytes=1000,
+        metrics_sink=snapshots.append,
+        report_interval_seconds=3600,
+        report_every_percent=10,
+    )
+
+    def upload_part(bytes_amount):
+        thread = threading.Thread(target=reporter, args=(bytes_amount,))
+        thread.start()
+        thread.join()
+
+    for _ in range(4):
+        upload_part(10)
+    assert snapshots == []
+    # no thread counted 10% on its own, but 20 bytes on each of 5 threads would
+    upload_part(20)
+    assert len(snapshots) == 1
+    assert snapshots[0].bytes_done == 60
+
+
+def test_a_failing_sink_does_not_fail_the_upload():
+    def broken_sink(snapshot):
+        raise RuntimeError("metrics endpoint down")
+
+    reporter = Progress_Reporter(tag="upload", total_bytes=10, metrics_sink=broken_sink)
+    reporter(10)
+    assert reporter.finish().bytes_done == 10
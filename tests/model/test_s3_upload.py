@@ -0,0 +1,343 @@
+import hashlib
+import os
+import threading
+import time
+import pytest
+from result import is_err, is_ok
+
+from mlcore_utils.model.s3_upload import (
+    MiB,
+    S3_MAX_NUMBER_OF_PARTS,
+    S3_UPLOAD_MAX_PART_SIZE,
+    S3_Multipart_Uploader,
+    S3_Upload_Plan,
+)
+
+
+class Fake_Paginator(object):
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        yield self.method(**kwargs)
+
+
+class Fake_S3_Client(object):
+    """
+    In memory stand in for the multipart calls of a boto3 s3 client.
+    """
+
+    def __init__(self, failing_parts=None, latency_seconds=0.01):
+        self.latency_seconds = latency_seconds
+        self.uploads = {}
+        self.objects = {}
+        self.failing_parts = set(failing_parts or [])
+        self.failing_once = set()
+        self.uploaded_part_numbers = []
+        self.max_parallel = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_paginator(self, name):
+        return Fake_Paginator(getattr(self, name))
+
+    def list_multipart_uploads(self, Bucket, Prefix):
+        return {
+            "Uploads": [
+                {"Key": key, "UploadId": upload_id, "Initiated": i}
+                for i, (upload_id, (key, _)) in enumerate(self.uploads.items())
+                if key.startswith(Prefix)
+            ]
+        }
+
+    def list_parts(self, Bucket, Key, UploadId):
+        return {
+            "Parts": [
+                {"PartNumber": n, "Size": len(body), "ETag": self._etag(body)}
+                for n, body in self.uploads[UploadId][1].items()
+            ]
+        }
+
+    @staticmethod
+    def _etag(body):
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = (Key, {})
+        return {"UploadId": upload_id}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        Body = bytes(Body) if isinstance(Body, (bytes, bytearray)) else Body.read()
+        with self._lock:
+            self._in_flight += 1
+            self.max_parallel = max(self.max_parallel, self._in_flight)
+        time.sleep(self.latency_seconds)
+        with self._lock:
+            self._in_flight -= 1
+            if PartNumber in self.failing_parts:
+                raise Exception("connection reset")
+            if PartNumber in self.failing_once:
+                self.failing_once.remove(PartNumber)
+                raise Exception("connection reset")
+            self.uploaded_part_numbers.append(PartNumber)
+            self.uploads[UploadId][1][PartNumber] = Body
+        return {"ETag": self._etag(Body)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        key, parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        self.objects[key] = b"".join(parts[n] for n in numbers)
+        return {"ETag": '"multipart"'}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = (
+            bytes(Body) if isinstance(Body, (bytes, bytearray)) else Body.read()
+        )
+        return {"ETag": self._etag(self.objects[Key])}
+
+
+@pytest.fixture
+def payload_file(tmp_path):
+    path = tmp_path / "pipeline.tar.gz"
+    path.write_bytes(os.urandom(10 * MiB + 123))
+    return str(path)
+
+
+def test_plan_scales_with_file_size():
+    small = S3_Upload_Plan.create(3 * MiB)
+    assert not small.is_multipart
+
+    medium = S3_Upload_Plan.create(300 * MiB)
+    assert medium.is_multipart
+    assert medium.concurrency == 16
+    assert medium.number_of_parts >= medium.concurrency
+
+    # parts stay small enough that the workers do not hold gigabytes
+    large = S3_Upload_Plan.create(10 * 1024 * MiB)
+    assert large.part_size == S3_UPLOAD_MAX_PART_SIZE
+
+    # unless the part count limit forces bigger ones
+    huge = S3_Upload_Plan.create(2000 * 1024 * MiB)
+    assert huge.number_of_parts <= S3_MAX_NUMBER_OF_PARTS
+    assert huge.part_size > S3_UPLOAD_MAX_PART_SIZE
+    assert huge.part_size % MiB == 0
+
+
+def test_parts_are_uploaded_in_parallel(payload_file):
+    client = Fake_S3_Client()
+    plan = S3_Upload_Plan(
+        file_size=os.path.getsize(payload_file), part_size=1 * MiB, concurrency=4
+    )
+    result = S3_Multipart_Uploader(client).upload_file(
+        payload_file, "bucket", "key", plan=plan
+    )
+    assert is_ok(result)
+    with open(payload_file, "rb") as f:
+        assert client.objects["key"] == f.read()
+    assert client.max_parallel > 1
+
+
+def test_parallel_parts_beat_a_single_connection(payload_file):
+    # every part pays one round trip, as it would over the network
+    timings = {}
+    for concurrency in [1, 4]:
+        client = Fake_S3_Client(latency_seconds=0.05)
+        plan = S3_Upload_Plan(
+            file_size=os.path.getsize(payload_file),
+            part_size=1 * MiB,
+            concurrency=concurrency,
+        )
+        started = time.monotonic()
+        assert is_ok(
+            S3_Multipart_Uploader(client).upload_file(
+                payload_file, "bucket", "key", plan=plan
+            )
+        )
+        timings[concurrency] = time.monotonic() - started
+    assert timings[4] < timings[1] / 2
+
+
+def test_failed_upload_is_resumed(payload_file):
+    client = Fake_S3_Client(failing_parts=[3])
+    plan = S3_Upload_Plan(
+        file_size=os.path.getsize(payload_file), part_size=1 * MiB, concurrency=4
+    )
+    uploader = S3_Multipart_Uploader(client, retry_wait_seconds=0)
+    first = uploader.upload_file(payload_file, "bucket", "key", plan=plan, resume=True)
+    assert is_err(first)
+    assert "resume" in first.err_value
+
+    client.failing_parts.clear()
+    client.uploaded_part_numbers.clear()
+    second = uploader.upload_file(payload_file, "bucket", "key", plan=plan, resume=True)
+    assert is_ok(second)
+    assert client.uploaded_part_numbers == [3]
+    with open(payload_file, "rb") as f:
+        assert client.objects["key"] == f.read()
+
+
+def test_failed_upload_is_aborted_by_default(payload_file):
+    client = Fake_S3_Client(failing_parts=[3])
+    plan = S3_Upload_Plan(
+        file_size=os.path.getsize(payload_file), part_size=1 * MiB, concurrency=4
+    )
+    result = S3_Multipart_Uploader(client, retry_wait_seconds=0).upload_file(
+        payload_file, "bucket", "key", plan=plan
+    )
+    assert is_err(result)
+    assert "aborted" in result.err_value
+    assert client.uploads == {}
+
+
+def test_parts_of_a_different_file_are_not_reused(payload_file, tmp_path):
+    client = Fake_S3_Client(failing_parts=[1])
+    plan = S3_Upload_Plan(
+        file_size=os.path.getsize(payload_file), part_size=1 * MiB, concurrency=4
+    )
+    uploader = S3_Multipart_Uploader(client, retry_wait_seconds=0)
+    assert is_err(
+        uploader.upload_file(payload_file, "bucket", "key", plan=plan, resume=True)
+    )
+
+    with open(payload_file, "wb") as f:
+        f.write(os.urandom(10 * MiB + 123))
+    client.failing_parts.clear()
+    client.uploaded_part_numbers.clear()
+    assert is_ok(
+        uploader.upload_file(payload_file, "bucket", "key", plan=plan, resume=True)
+    )
+    assert len(client.uploaded_part_numbers) == plan.number_of_parts
+
+
+def test_multipart_upload_against_moto(tmp_path):
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    path = tmp_path / "model.tar.gz"
+    path.write_bytes(os.urandom(64 * MiB))
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="registry")
+        result = S3_Multipart_Uploader(client).upload_file(
+            str(path), "registry", "multipart"
+        )
+        assert is_ok(result)
+        body = client.get_object(Bucket="registry", Key="multipart")["Body"].read()
+        assert body == path.read_bytes()
+
+
+def test_streaming_writer_uploads_a_tarball_without_staging(tmp_path):
+    import io
+    import tarfile
+    from mlcore_utils.model.file import Tarball
+    from mlcore_utils.model.s3_upload import S3_Streaming_Multipart_Writer
+
+    source = tmp_path / "repo"
+    source.mkdir()
+    (source / "model.bin").write_bytes(os.urandom(12 * MiB))
+    (source / "pipeline.py").write_text("print('hi')")
+
+    client = Fake_S3_Client()
+    writer = S3_Streaming_Multipart_Writer(
+        client, "bucket", "pipeline.tar.gz", part_size=5 * MiB, max_in_flight_parts=2
+    )
+    assert is_ok(Tarball(str(source), "pipeline").write_to(writer))
+    writer.finish()
+
+    assert len(client.uploaded_part_numbers) == 3
+    assert not list(tmp_path.glob("*.tar.gz"))
+    with tarfile.open(fileobj=io.BytesIO(client.objects["pipeline.tar.gz"])) as tar:
+        assert sorted(tar.getnames()) == ["model.bin", "pipeline.py"]
+        assert (
+            tar.extractfile("model.bin").read() == (source / "model.bin").read_bytes()
+        )
+
+
+def test_an_abandoned_streaming_writer_aborts_its_upload():
+    from concurrent.futures import wait
+    import gc
+    from mlcore_utils.model.s3_upload import S3_Streaming_Multipart_Writer
+
+    client = Fake_S3_Client()
+    writer = S3_Streaming_Multipart_Writer(client, "bucket", "key", part_size=5 * MiB)
+    writer.write(os.urandom(6 * MiB))
+    assert len(client.uploads) == 1
+    # parts in flight keep the writer alive, once they are done it can be collected
+    wait(writer._futures)
+    # e.g. the caller raised before finish()
+    del writer
+    for _ in range(100):
+        # the pool thread drops its reference just after the future is done
+        gc.collect()
+        if not client.uploads:
+            break
+        time.sleep(0.01)
+    assert client.uploads == {}
+    assert "key" not in client.objects
+
+
+def test_a_failed_part_surfaces_its_s3_error():
+    from mlcore_utils.model.s3_upload import S3_Streaming_Multipart_Writer
+
+    client = Fake_S3_Client(failing_parts=[1])
+    writer = S3_Streaming_Multipart_Writer(
+        client, "bucket", "key", part_size=5 * MiB, max_part_attempts=1
+    )
+    writer.write(os.urandom(6 * MiB))
+    with pytest.raises(IOError, match="connection reset"):
+        writer.finish()
+    assert client.uploads == {}
+
+
+def _generate(payload, chunk_size=100 * 1024):
+    for i in range(0, len(payload), chunk_size):
+        yield payload[i : i + chunk_size]
+
+
+def test_generator_parts_upload_in_parallel_with_retries():
+    from mlcore_utils.model.s3_upload import S3_Generator_Uploader
+
+    payload = os.urandom(23 * MiB)
+    client = Fake_S3_Client()
+    client.failing_once = {2}
+    result = S3_Generator_Uploader(
+        client, part_size=5 * MiB, max_concurrency=3, retry_wait_seconds=0
+    ).upload(_generate(payload), "bucket", "scores.csv")
+
+    assert is_ok(result)
+    assert client.objects["scores.csv"] == payload
+    assert sorted(client.uploaded_part_numbers) == [1, 2, 3, 4, 5]
+    assert 1 < client.max_parallel <= 3
+
+
+def test_small_generator_output_is_a_single_put():
+    from mlcore_utils.model.s3_upload import S3_Generator_Uploader
+
+    client = Fake_S3_Client()
+    result = S3_Generator_Uploader(client).upload(
+        iter(["id,score\n", "1,0.5\n"]), "bucket", "scores.csv"
+    )
+    assert is_ok(result)
+    assert client.objects["scores.csv"] == b"id,score\n1,0.5\n"
+    assert not client.uploaded_part_numbers
+
+
+def test_failing_generator_aborts_the_upload():
+    from mlcore_utils.model.s3_upload import S3_Generator_Uploader
+
+    def broken():
+        yield os.urandom(6 * MiB)
+        raise ValueError("scoring failed")
+
+    client = Fake_S3_Client()
+    result = S3_Generator_Uploader(client, part_size=5 * MiB).upload(
+        broken(), "bucket", "scores.csv"
+    )
+    assert is_err(result)
+    assert "scoring failed" in result.err_value
+    assert not client.uploads
+    assert "scores.csv" not in client.objects
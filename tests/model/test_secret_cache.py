@@ -0,0 +1,111 @@
+import threading
+import time
+from result import Err, Ok, is_err, is_ok
+
+from mlcore_utils.model.common import (
+    Caching_Secret_Getter,
+    MLCore_Secret,
+    Secret_Getter,
+)
+
+
+class Fake_Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Counting_Secret_Getter(Secret_Getter):
+    def __init__(self, sleep_seconds: float = 0.0):
+        self.calls = 0
+        self.sleep_seconds = sleep_seconds
+        self.fail = False
+        self.rotate = True
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def get_secret(self):
+        time.sleep(self.sleep_seconds)
+        with self._lock:
+            self.calls += 1
+            if self.rotate:
+                self.version = self.calls
+            version = self.version
+        if self.fail:
+            return Err("secrets manager is down")
+        return Ok(MLCore_Secret(f"secret-{version}"))
+
+
+def test_secret_is_cached_within_ttl():
+    clock = Fake_Clock()
+    getter = Counting_Secret_Getter()
+    cache = Caching_Secret_Getter(getter, ttl_seconds=10, clock=clock)
+    assert cache.get_secret().ok_value.get_secret_value() == "secret-1"
+    clock.now = 9
+    assert cache.get_secret().ok_value.get_secret_value() == "secret-1"
+    assert getter.calls == 1
+
+
+def test_stale_secret_is_served_while_refreshing():
+    clock = Fake_Clock()
+    getter = Counting_Secret_Getter(sleep_seconds=0.1)
+    cache = Caching_Secret_Getter(getter, ttl_seconds=10, stale_seconds=10, clock=clock)
+    cache.get_secret()
+    clock.now = 15
+    started = time.monotonic()
+    assert cache.get_secret().ok_value.get_secret_value() == "secret-1"
+    assert time.monotonic() - started < 0.05
+    time.sleep(0.2)
+    assert cache.get_secret().ok_value.get_secret_value() == "secret-2"
+    assert getter.calls == 2
+
+
+def test_concurrent_fetches_are_deduplicated():
+    getter = Counting_Secret_Getter(sleep_seconds=0.1)
+    cache = Caching_Secret_Getter(getter)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_secret()))
+        for _ in range(10)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(is_ok(r) for r in results)
+    assert getter.calls == 1
+
+
+def test_invalidate_reports_only_rotated_secrets():
+    clock = Fake_Clock()
+    getter = Counting_Secret_Getter()
+    cache = Caching_Secret_Getter(getter, clock=clock, min_invalidate_seconds=60)
+    cache.get_secret()
+    assert cache.invalidate()
+    assert cache.get_secret().ok_value.get_secret_value() == "secret-2"
+    assert getter.calls == 2
+
+    # within min_invalidate_seconds nothing is fetched
+    clock.now = 30
+    assert not cache.invalidate()
+    assert getter.calls == 2
+
+    # an unchanged secret means the request was rejected for another reason
+    clock.now = 100
+    getter.rotate = False
+    assert not cache.invalidate()
+    assert getter.calls == 3
+
+
+def test_errors_are_not_cached():
+    clock = Fake_Clock()
+    getter = Counting_Secret_Getter()
+    cache = Caching_Secret_Getter(getter, clock=clock)
+    cache.get_secret()
+    getter.fail = True
+    assert not cache.invalidate()
+    assert is_err(cache.get_secret())
+    getter.fail = False
+    assert cache.get_secret().ok_value.get_secret_value() == "secret-4"
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+import httpx
+from result import Err, Ok, is_err
+
+from mlcore_utils.model import stratos_api_async
+from mlcore_utils.model.common import Http_Method, MLCore_Secret, Secret_Getter
+from mlcore_utils.model.stratos_api_async import (
+    Async_Requests_Wrapper,
+    Async_Stratos_Api_Caller,
+    Async_Stratos_Api_V1_Util,
+)
+from mlcore_utils.model.stratos_interface import Stratos_AppOwnersMetadata_V1
+from mlcore_utils.model.wait_strategy import Fixed_Interval_Wait_Strategy
+
+
+class Rotating_Secret_Getter(Secret_Getter):
+    def __init__(self):
+        self.generation = 1
+
+    def get_secret(self):
+        return Ok(MLCore_Secret(f"token-{self.generation}"))
+
+    def invalidate(self) -> bool:
+        self.generation = self.generation + 1
+        return True
+
+
+class Failing_Secret_Getter(Secret_Getter):
+    def get_secret(self):
+        return Err("vault is down")
+
+
+def _get_util(handler, secret_getter=None):
+    requests = []
+
+    def record(request):
+        requests.append(request)
+        return handler(request)
+
+    wrapper = Async_Requests_Wrapper(
+        transport=httpx.MockTransport(record),
+        wait_strategy=Fixed_Interval_Wait_Strategy(interval_seconds=0, max_attempts=5),
+    )
+    caller = Async_Stratos_Api_Caller(
+        secret_getter or Rotating_Secret_Getter(), requests_wrapper=wrapper
+    )
+    return requests, wrapper, Async_Stratos_Api_V1_Util(caller)
+
+
+def _get_appowners():
+    return Stratos_AppOwnersMetadata_V1(
+        repository="repo",
+        repository_url="https://github.com/org/repo",
+        application_contact="dev@example.com",
+        application_name="model",
+    )
+
+
+def test_clients_are_closed_with_their_event_loop():
+    _, wrapper, _ = _get_util(lambda request: httpx.Response(200))
+    clients = []
+
+    async def call():
+        await wrapper.call_end_point(Http_Method.GET, "https://stratos/ping")
+        clients.append(await wrapper.get_client())
+
+    asyncio.run(call())
+    asyncio.run(call())
+    assert clients[0] is not clients[1]
+    assert clients[0].is_closed and clients[1].is_closed
+
+
+def test_loops_on_different_threads_keep_their_own_client():
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200)
+
+    wrapper = Async_Requests_Wrapper(transport=httpx.MockTransport(handler))
+    both_started = threading.Barrier(2)
+    results = []
+
+    async def call():
+        client = await wrapper.get_client()
+        await asyncio.to_thread(both_started.wait)
+        response = await wrapper.call_end_point(Http_Method.GET, "https://stratos/ping")
+        results.append((client, response.status_code, client.is_closed))
+
+    threads = [threading.Thread(target=asyncio.run, args=(call(),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [(status, closed) for _, status, closed in results] == [
+        (200, False),
+        (200, False),
+    ]
+    assert results[0][0] is not results[1][0]
+    assert all(client.is_closed for client, _, _ in results)
+
+
+def test_threads_share_one_shared_instance(monkeypatch):
+    monkeypatch.setattr(stratos_api_async, "_shared_async_requests_wrapper", None)
+    all_started = threading.Barrier(8)
+    instances = []
+
+    def get_instance():
+        all_started.wait()
+        instances.append(Async_Requests_Wrapper.get_shared_instance())
+
+    threads = [threading.Thread(target=get_instance) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(instance) for instance in instances}) == 1
+
+
+def test_missing_applications_are_created():
+    def handler(request):
+        if request.method == "GET":
+            return httpx.Response(500)
+        return httpx.Response(200)
+
+    requests, _, util = _get_util(handler)
+    result = asyncio.run(util.create_stratos_application(_get_appowners()))
+    assert result.ok_value is True
+    assert [(r.method, r.url.path) for r in requests] == [
+        ("GET", "/api/v1/stratos/containerdeploy/application-owner"),
+        ("POST", "/api/v1/stratos/argocd/app-owners"),
+    ]
+    assert requests[0].url.params["application_name"] == "model"
+    assert json.loads(requests[1].content)["application_name"] == "model"
+
+
+def test_rejected_secrets_are_fetched_again():
+    def handler(request):
+        if request.headers["access_token"] == "token-1":
+            return httpx.Response(401)
+        return httpx.Response(200)
+
+    requests, _, util = _get_util(handler)
+    result = asyncio.run(util.create_stratos_application(_get_appowners()))
+    assert result.ok_value is True
+    assert [r.headers["access_token"] for r in requests] == ["token-1", "token-2"]
+
+
+def test_errors_are_returned_not_raised():
+    _, _, util = _get_util(lambda request: httpx.Response(200), Failing_Secret_Getter())
+    result = asyncio.run(util.create_stratos_application(_get_appowners()))
+    assert is_err(result)
+    assert "vault is down" in result.err_value
+
+    _, _, util = _get_util(lambda request: httpx.Response(503, text="maintenance"))
+    result = asyncio.run(util.create_stratos_application(_get_appowners()))
+    assert "Status_Code: 503. Text: maintenance" in result.err_value
+
+
+def test_build_status_is_polled_until_completed():
+    statuses = iter(["queued", "running", "completed"])
+    requests, _, util = _get_util(
+        lambda request: httpx.Response(200, json={"build_status": next(statuses)})
+    )
+    result = asyncio.run(
+        util.stratos_api_caller.call_status_url_and_await("containerbuild/status/7")
+    )
+    assert result.ok_value.json() == {"build_status": "completed"}
+    assert len(requests) == 3
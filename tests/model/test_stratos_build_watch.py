@@ -0,0 +1,146 @@
+import threading
+import pytest
+from result import is_ok, is_err
+
+from mlcore_utils.model.stratos_build_watch import Stratos_Build_Watch_Scheduler
+from mlcore_utils.model.wait_strategy import (
+    Exponential_Backoff_Wait_Strategy,
+    Fixed_Interval_Wait_Strategy,
+)
+
+
+class Fake_Status_Response(object):
+    def __init__(self, completed: bool):
+        self.status_code = 200
+        self.completed = completed
+
+    def json(self):
+        return {
+            "build_status": "completed" if self.completed else "in_progress",
+            "conclusion": "success",
+        }
+
+
+class Fake_Stratos_Api_Caller(object):
+    def __init__(self, polls_till_completed: int):
+        self.polls_till_completed = polls_till_completed
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def call_api(self, http_method, endpoint):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            return Fake_Status_Response(
+                self.calls[endpoint] >= self.polls_till_completed
+            )
+
+
+@pytest.fixture
+def fast_strategy_factory():
+    return lambda: Exponential_Backoff_Wait_Strategy(
+        initial_interval_seconds=0.01, jitter_ratio=0, deadline_seconds=10
+    )
+
+
+def test_many_builds_share_one_scheduler(fast_strategy_factory):
+    caller = Fake_Stratos_Api_Caller(polls_till_completed=3)
+    scheduler = Stratos_Build_Watch_Scheduler(
+        caller,
+        wait_strategy_factory=fast_strategy_factory,
+        max_polls_per_second=1000,
+    )
+    futures = [scheduler.watch(f"sha{i}") for i in range(50)]
+    results = [f.result(timeout=10) for f in futures]
+    scheduler.shutdown()
+
+    assert all(is_ok(r) for r in results)
+    assert len(caller.calls) == 50
+    assert all(count == 3 for count in caller.calls.values())
+
+
+def test_duplicate_registrations_share_a_future(fast_strategy_factory):
+    caller = Fake_Stratos_Api_Caller(polls_till_completed=2)
+    scheduler = Stratos_Build_Watch_Scheduler(
+        caller, wait_strategy_factory=fast_strategy_factory
+    )
+    first = scheduler.watch("abc")
+    second = scheduler.watch("abc")
+    assert first is second
+    assert is_ok(first.result(timeout=10))
+    scheduler.shutdown()
+    assert caller.calls == {"containerbuild/abc/run-status": 2}
+
+
+def test_builds_that_never_finish_get_an_err():
+    caller = Fake_Stratos_Api_Caller(polls_till_completed=100)
+    scheduler = Stratos_Build_Watch_Scheduler(
+        caller,
+        wait_strategy_factory=lambda: Fixed_Interval_Wait_Strategy(
+            interval_seconds=0.01, max_attempts=3
+        ),
+    )
+    result = scheduler.watch("abc").result(timeout=10)
+    scheduler.shutdown()
+    assert is_err(result)
+    assert caller.calls == {"containerbuild/abc/run-status": 3}
+
+
+def test_shutdown_resolves_pending_builds():
+    caller = Fake_Stratos_Api_Caller(polls_till_completed=100)
+    scheduler = Stratos_Build_Watch_Scheduler(
+        caller,
+        wait_strategy_factory=lambda: Fixed_Interval_Wait_Strategy(interval_seconds=60),
+    )
+    future = scheduler.watch("abc")
+    scheduler.shutdown()
+    assert is_err(future.result(timeout=1))
+
+
+class Malformed_Status_Response(object):
+    status_code = 200
+
+    def json(self):
+        return {"message": "no build_status here"}
+
+
+class Malformed_Stratos_Api_Caller(object):
+    def call_api(self, http_method, endpoint):
+        return Malformed_Status_Response()
+
+
+def test_a_malformed_status_fails_only_that_build(fast_strategy_factory):
+    scheduler = Stratos_Build_Watch_Scheduler(
+        Malformed_Stratos_Api_Caller(), wait_strategy_factory=fast_strategy_factory
+    )
+    result = scheduler.watch("abc").result(timeout=10)
+    assert is_err(result)
+    assert "build_status" in result.err_value
+
+    # the polling thread survived and still serves new builds
+    scheduler.stratos_api_caller = Fake_Stratos_Api_Caller(polls_till_completed=1)
+    assert is_ok(scheduler.watch("def").result(timeout=10))
+    scheduler.shutdown()
+
+
+def test_build_container_can_be_cancelled_while_the_scheduler_waits(monkeypatch):
+    pytest.importorskip("pgraws")
+    from result import Ok
+    from mlcore_utils.model import stratos_utils
+    from mlcore_utils.model.stratos_utils import Stratos_Util
+
+    monkeypatch.setattr(stratos_utils, "BUILD_CANCEL_CHECK_SECONDS", 0.01)
+    monkeypatch.setattr(
+        Stratos_Util, "_start_container_build", lambda self, data: Ok("abc")
+    )
+    caller = Fake_Stratos_Api_Caller(polls_till_completed=100)
+    scheduler = Stratos_Build_Watch_Scheduler(
+        caller,
+        wait_strategy_factory=lambda: Fixed_Interval_Wait_Strategy(interval_seconds=60),
+    )
+    util = Stratos_Util(caller, build_watch_scheduler=scheduler)
+    cancel_event = threading.Event()
+    threading.Timer(0.05, cancel_event.set).start()
+    result = util.build_container(None, cancel_event=cancel_event)
+    scheduler.shutdown()
+    assert is_err(result)
+    assert "cancelled" in result.err_value
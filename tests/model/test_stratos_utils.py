@@ -0,0 +1,285 @@
+import threading
+import time
+import pytest
+from attrs import define
+from result import Err, Ok, is_err
+
+pytest.importorskip("pgraws")
+
+from mlcore_utils.model.blacklodge import Environment, Pipeline_Alias
+from mlcore_utils.model.data import (
+    Blacklodge_Alias_Deployer_Data,
+    Blacklodge_Namespace_Deployer_Data,
+    Blacklodge_Pipeline_Deployer_Data,
+    HelmChart_Version_Hardcoded_Getter,
+)
+from mlcore_utils.model.stratos_utils import Stratos_Util
+
+
+class Fake_Object(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _get_image(model_name="churn"):
+    user = Fake_Object(get_namespace=lambda: "mlcore", get_teamname=lambda: "mlcore")
+    return Fake_Object(
+        blacklodge_model=Fake_Object(
+            name=model_name,
+            version=3,
+            git_repo=Fake_Object(
+                git_repo_name="churn", git_repo_url="https://github.com/org/churn"
+            ),
+            user_email=["dev@example.com"],
+        ),
+        blacklodge_user=user,
+        stratos_application_values=Fake_Object(
+            get_environment=lambda: Environment.DEVELOPMENT,
+            helm_repositry="oci://charts",
+        ),
+        get_namespace=user.get_namespace,
+    )
+
+
+def _get_versions():
+    getter = HelmChart_Version_Hardcoded_Getter()
+    getter.get_chart_versions()
+    return getter
+
+
+@define
+class Fake_Pipeline_Deployer_Data(Blacklodge_Pipeline_Deployer_Data):
+    def get_value_yaml_contents(self):
+        return "cGlwZWxpbmU="
+
+
+@define
+class Fake_Alias_Deployer_Data(Blacklodge_Alias_Deployer_Data):
+    def get_value_yaml_contents(self):
+        return "YWxpYXM="
+
+
+def _get_pipeline_data(model_name="churn"):
+    return Fake_Pipeline_Deployer_Data(
+        blacklodge_image_for_stratos=_get_image(model_name),
+        helmchart_version_getter=_get_versions(),
+    )
+
+
+def _get_alias_data():
+    return Fake_Alias_Deployer_Data(
+        blacklodge_image_for_stratos=_get_image(),
+        pipeline_alias=Pipeline_Alias(version=3, alias="live"),
+        helmchart_version_getter=_get_versions(),
+    )
+
+
+class Fake_Stratos_V1_Util(object):
+    """
+    Records (step, application name) for every call, failing the given ones.
+    """
+
+    def __init__(self, failing=(), sleep_seconds=0.0):
+        self.calls = []
+        self.failing = set(failing)
+        self.sleep_seconds = sleep_seconds
+        self.running = 0
+        self.peak_running = 0
+        self._lock = threading.Lock()
+
+    def _record(self, step, application_name):
+        with self._lock:
+            self.calls.append((step, application_name))
+            self.running = self.running + 1
+            self.peak_running = max(self.peak_running, self.running)
+        time.sleep(self.sleep_seconds)
+        with self._lock:
+            self.running = self.running - 1
+        if (step, application_name) in self.failing:
+            return Err(f"{step} of {application_name} was rejected")
+        return Ok(True)
+
+    def create_k8s_namespace_using_stratos_sdk(self, metadata):
+        return self._record("namespace", metadata.application_name)
+
+    def create_argocd_project_using_stratos_sdk(self, metadata):
+        return self._record("project", metadata.application_name)
+
+    def create_stratos_application(self, metadata):
+        return self._record("app_owner", metadata.application_name)
+
+    def deploy_helm_chart_and_values(self, helm_data):
+        return self._record("helm", helm_data.application_name)
+
+    def deploy_helm_chart(self, helm_data):
+        return self._record("helm", helm_data.application_name)
+
+    def sync_argocd_application(self, app_sync_request):
+        return self._record("app_sync", app_sync_request.application_name)
+
+
+def _get_namespace_data():
+    return Blacklodge_Namespace_Deployer_Data(
+        blacklodge_image_for_stratos=_get_image(),
+        helmchart_version_getter=_get_versions(),
+    )
+
+
+def _get_stratos_util(failing=(), sleep_seconds=0.0):
+    stratos_util = Stratos_Util(stratos_api_caller=None)
+    stratos_util.util = Fake_Stratos_V1_Util(failing, sleep_seconds)
+    return stratos_util
+
+
+@pytest.mark.parametrize(
+    "deploy, deployer_data, application_name",
+    [
+        (Stratos_Util.deploy_pipeline, _get_pipeline_data, "churn-3"),
+        (Stratos_Util.deploy_alias, _get_alias_data, "churn-live"),
+    ],
+)
+def test_targets_are_deployed_after_their_namespace(
+    deploy, deployer_data, application_name
+):
+    stratos_util = _get_stratos_util()
+    assert deploy(stratos_util, deployer_data()).ok_value is True
+
+    calls = stratos_util.util.calls
+    # the k8s namespace and argocd project are shared, so they are created once
+    assert sorted(step for step, _ in calls) == sorted(
+        ["namespace", "project"] + ["app_owner", "helm", "app_sync"] * 2
+    )
+    for step in ["app_owner", "helm", "app_sync"]:
+        assert (step, "mlcore-ns") in calls and (step, application_name) in calls
+    # the target's chart is pushed once the namespace application is synced
+    assert calls.index(("app_sync", "mlcore-ns")) < calls.index(
+        ("helm", application_name)
+    )
+    assert calls.index(("helm", application_name)) < calls.index(
+        ("app_sync", application_name)
+    )
+
+
+def test_deploy_application_runs_only_its_own_steps():
+    stratos_util = _get_stratos_util()
+    assert stratos_util.deploy_application(_get_namespace_data()).ok_value is True
+    assert [step for step, _ in stratos_util.util.calls][-2:] == ["helm", "app_sync"]
+    assert len(stratos_util.util.calls) == 5
+
+
+def test_a_reused_stratos_util_deploys_again():
+    stratos_util = _get_stratos_util()
+    stratos_util.deploy_pipeline(_get_pipeline_data())
+    stratos_util.deploy_pipeline(_get_pipeline_data())
+    assert stratos_util.util.calls.count(("helm", "churn-3")) == 2
+    assert stratos_util.util.calls.count(("app_sync", "mlcore-ns")) == 2
+
+
+def test_a_failed_step_stops_its_dependents():
+    stratos_util = _get_stratos_util(failing=[("helm", "churn-3")])
+    result = stratos_util.deploy_pipeline(_get_pipeline_data())
+    assert is_err(result)
+    assert "helm of churn-3 was rejected" in result.err_value
+    assert ("app_sync", "churn-3") not in stratos_util.util.calls
+
+
+def _get_release():
+    # what app.deploy_blacklodge_pipeline deploys: the pipeline, its aliases
+    # and the namespace application they all need
+    return [
+        _get_pipeline_data(),
+        _get_alias_data(),
+        Fake_Alias_Deployer_Data(
+            blacklodge_image_for_stratos=_get_image(),
+            pipeline_alias=Pipeline_Alias(version=2, alias="canary"),
+            helmchart_version_getter=_get_versions(),
+        ),
+        _get_namespace_data(),
+    ]
+
+
+def test_shared_steps_of_many_applications_run_once():
+    stratos_util = _get_stratos_util()
+    results = stratos_util.deploy_applications(_get_release())
+
+    assert set(results) == {"churn-3", "churn-live", "churn-canary", "mlcore-ns"}
+    assert all(result.ok_value is True for result in results.values())
+    calls = stratos_util.util.calls
+    assert [step for step, _ in calls].count("namespace") == 1
+    assert [step for step, _ in calls].count("project") == 1
+    assert calls.count(("helm", "mlcore-ns")) == 1
+    assert calls.count(("app_sync", "mlcore-ns")) == 1
+    assert len(calls) == 2 + 3 * 4
+
+
+def test_deploy_applications_respects_max_concurrency():
+    stratos_util = _get_stratos_util(sleep_seconds=0.02)
+    results = stratos_util.deploy_applications(_get_release(), max_concurrency=2)
+    assert all(result.ok_value is True for result in results.values())
+    assert stratos_util.util.peak_running == 2
+
+
+def test_each_application_gets_its_own_error():
+    stratos_util = _get_stratos_util(failing=[("helm", "churn-live")])
+    results = stratos_util.deploy_applications(_get_release())
+    assert "helm of churn-live was rejected" in results["churn-live"].err_value
+    assert results["churn-3"].ok_value is True
+    assert results["churn-canary"].ok_value is True
+    assert results["mlcore-ns"].ok_value is True
+
+    # a failed namespace application only delays what is deployed into it
+    stratos_util = _get_stratos_util(failing=[("app_sync", "mlcore-ns")])
+    results = stratos_util.deploy_applications(_get_release())
+    assert "app_sync of mlcore-ns was rejected" in results["mlcore-ns"].err_value
+    assert results["churn-3"].ok_value is True
+    assert results["churn-canary"].ok_value is True
+
+
+@pytest.mark.parametrize(
+    "deploy, deployer_data, application_name",
+    [
+        (Stratos_Util.deploy_pipeline, _get_pipeline_data, "churn-3"),
+        (Stratos_Util.deploy_alias, _get_alias_data, "churn-live"),
+    ],
+)
+def test_a_failed_namespace_sync_does_not_stop_the_target(
+    deploy, deployer_data, application_name, capsys
+):
+    stratos_util = _get_stratos_util(failing=[("app_sync", "mlcore-ns")])
+    assert deploy(stratos_util, deployer_data()).ok_value is True
+    calls = stratos_util.util.calls
+    # still only pushed once the namespace sync has finished
+    assert calls.index(("app_sync", "mlcore-ns")) < calls.index(
+        ("helm", application_name)
+    )
+    assert "app_sync of mlcore-ns was rejected" in capsys.readouterr().out
+
+
+def test_pipelines_are_released_as_one_graph(monkeypatch):
+    from mlcore_utils import app
+
+    class Fake_Stratos_Util(object):
+        deployed = []
+
+        def __init__(self, stratos_api_caller):
+            pass
+
+        def deploy_applications(self, deployer_data_list):
+            self.deployed.extend(deployer_data_list)
+            return {}
+
+    image = _get_image()
+    image.blacklodge_model.aliases = [
+        Pipeline_Alias(version=3, alias="live"),
+        Pipeline_Alias(version=2, alias="canary"),
+    ]
+    monkeypatch.setattr(app, "Stratos_Util", Fake_Stratos_Util)
+    app.deploy_blacklodge_pipeline(image, None)
+    assert [
+        data.get_stratos_application_name() for data in Fake_Stratos_Util.deployed
+    ] == [
+        "churn-3",
+        "churn-live",
+        "churn-canary",
+        "mlcore-ns",
+    ]
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from result import is_ok, is_err
+
+from mlcore_utils.model.wait_strategy import (
+    Condition_Waiter,
+    Exponential_Backoff_Wait_Strategy,
+    Fixed_Interval_Wait_Strategy,
+)
+
+
+class Fake_Response(object):
+    def __init__(self, status_code: int, done: bool):
+        self.status_code = status_code
+        self.done = done
+
+
+class Fake_Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fixed_interval_matches_legacy_schedule():
+    delays = list(Fixed_Interval_Wait_Strategy().get_delays())
+    assert delays == [60] * 30
+
+
+def test_exponential_backoff_grows_and_caps():
+    strategy = Exponential_Backoff_Wait_Strategy(
+        initial_interval_seconds=1,
+        multiplier=2,
+        max_interval_seconds=10,
+        jitter_ratio=0,
+        max_attempts=7,
+    )
+    assert list(strategy.get_delays()) == [1, 2, 4, 8, 10, 10]
+
+
+def test_exponential_backoff_jitter_stays_in_bounds():
+    strategy = Exponential_Backoff_Wait_Strategy(
+        initial_interval_seconds=10, multiplier=1, jitter_ratio=0.5, max_attempts=50
+    )
+    for delay in strategy.get_delays():
+        assert 5 <= delay <= 15
+
+
+def test_waiter_returns_as_soon_as_condition_is_met(monkeypatch):
+    slept = []
+    monkeypatch.setattr("time.sleep", lambda s: slept.append(s))
+    responses = iter(
+        [Fake_Response(500, False), Fake_Response(200, False), Fake_Response(200, True)]
+    )
+    waiter = Condition_Waiter(
+        Exponential_Backoff_Wait_Strategy(initial_interval_seconds=1, jitter_ratio=0)
+    )
+    result = waiter.wait_till_condition_is_met(
+        lambda: next(responses), lambda r: r.done
+    )
+    assert is_ok(result)
+    assert slept == [1, 2]
+
+
+def test_waiter_stops_at_deadline(monkeypatch):
+    clock = Fake_Clock()
+
+    def _sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr("time.sleep", _sleep)
+    waiter = Condition_Waiter(
+        Exponential_Backoff_Wait_Strategy(
+            initial_interval_seconds=4, jitter_ratio=0, deadline_seconds=20
+        ),
+        clock=clock,
+    )
+    result = waiter.wait_till_condition_is_met(
+        lambda: Fake_Response(200, False), lambda r: r.done, "build"
+    )
+    assert is_err(result)
+    assert "deadline" in result.err_value
+    assert clock.now == 20
+
+
+def test_waiter_can_be_cancelled():
+    cancel_event = threading.Event()
+    cancel_event.set()
+    waiter = Condition_Waiter(Fixed_Interval_Wait_Strategy(interval_seconds=60))
+    result = waiter.wait_till_condition_is_met(
+        lambda: Fake_Response(200, False), lambda r: r.done, cancel_event=cancel_event
+    )
+    assert is_err(result)
+    assert "cancelled" in result.err_value
+
+
+def test_async_waiter_can_be_cancelled_while_sleeping():
+    async def _run():
+        cancel_event = asyncio.Event()
+
+        async def _action():
+            return Fake_Response(200, False)
+
+        waiter = Condition_Waiter(Fixed_Interval_Wait_Strategy(interval_seconds=60))
+        task = asyncio.create_task(
+            waiter.wait_till_condition_is_met_async(
+                _action, lambda r: r.done, cancel_event=cancel_event
+            )
+        )
+        await asyncio.sleep(0.01)
+        cancel_event.set()
+        return await asyncio.wait_for(task, timeout=1)
+
+    result = asyncio.run(_run())
+    assert is_err(result)
+    assert "cancelled" in result.err_value